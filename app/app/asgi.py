@@ -0,0 +1,29 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``. Besides the Django application it serves the
+server-sent event streams at EVENTS_PATH, which only work under ASGI.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+django_application = get_asgi_application()
+
+# Needs the apps loaded by get_asgi_application()
+from core.events import event_stream  # noqa: E402
+
+EVENTS_PATH = '/api/recipe/events/'
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await event_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,15 +77,180 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _conn_max_age():
+    max_age = _env_int('DB_CONN_MAX_AGE', 60)
+    return None if max_age < 0 else max_age
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+# Connections are kept open between requests for DB_CONN_MAX_AGE seconds
+# (0 closes them after every request, -1 keeps them forever) and are
+# pinged before being reused when DB_CONN_HEALTH_CHECKS is enabled.
+# Setting DB_POOL_MAX_SIZE enables an in-process connection pool, it
+# must be at least the number of threads serving requests per process:
+# a request finding every connection taken fails with OperationalError.
+DB_POOL_MAX_SIZE = _env_int('DB_POOL_MAX_SIZE', 0)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': _conn_max_age(),
+        'CONN_HEALTH_CHECKS': _env_bool('DB_CONN_HEALTH_CHECKS', True),
+        'POOL': {
+            'MIN_SIZE': _env_int('DB_POOL_MIN_SIZE', 1),
+            'MAX_SIZE': DB_POOL_MAX_SIZE,
+        } if DB_POOL_MAX_SIZE else None,
     }
 }
+# Read replicas share the primary credentials, one alias per host
+for index, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')),
+        start=1):
+    DATABASES[f'replica_{index}'] = dict(
+        DATABASES['default'],
+        HOST=host.strip(),
+        TEST={'MIRROR': 'default'},
+    )
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Replicas lagging more than DB_REPLICA_MAX_LAG seconds are skipped, and a
+# user's reads stay on the primary for DB_READ_YOUR_WRITES_WINDOW seconds
+# after a write
+REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+REPLICA_LAG_CHECK_INTERVAL = 5
+READ_YOUR_WRITES_WINDOW = _env_int('DB_READ_YOUR_WRITES_WINDOW', 5)
+
+
+def _cache(url):
+    """Return the cache settings of a redis:// URL"""
+    if not url.startswith(('redis://', 'rediss://', 'unix://')):
+        raise ValueError(f'Unsupported CACHE_URL: {url}')
+    return {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': url}
+
+
+# The read-your-writes pins, the rollup and feed caches and their
+# invalidations only reach every process through a shared cache, set
+# CACHE_URL to a Redis server once the app runs more than one. Without
+# it each process keeps its own.
+CACHE_URL = os.environ.get('CACHE_URL', '')
+CACHES = {
+    'default': _cache(CACHE_URL) if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.TokenBucketThrottle',
+    ],
+}
+
+TEST_RUNNER = 'core.tests.runner.TestRunner'
+
+# Every client, by token, user or address, gets a bucket of THROTTLE_BURST
+# tokens refilled at THROTTLE_RATE per second, requests spend their cost.
+# Set THROTTLE_BACKEND to core.throttling.CacheBucket to share the buckets
+# between processes through the cache in THROTTLE_BACKEND_OPTIONS.
+# The test runner turns it off, see core.tests.runner.
+THROTTLE_ENABLED = _env_bool('THROTTLE_ENABLED', True)
+THROTTLE_BACKEND = os.environ.get('THROTTLE_BACKEND',
+                                  'core.throttling.LocalMemoryBucket')
+THROTTLE_BACKEND_OPTIONS = {}
+THROTTLE_RATE = float(os.environ.get('THROTTLE_RATE', 5))
+THROTTLE_BURST = _env_int('THROTTLE_BURST', 100)
+THROTTLE_COSTS = {
+    'filter': 5,
+    'upload_image': 10,
+    'plan': 10,
+}
+
+# Fraction of requests measured by the request metrics middleware
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 0.05))
+# Bearer token scrapers send to read /metrics, staff users can read it
+# without one
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Responses of at least COMPRESSION_MIN_SIZE bytes are compressed with
+# brotli when it is installed and accepted, gzip otherwise
+COMPRESSION_MIN_SIZE = _env_int('COMPRESSION_MIN_SIZE', 1024)
+COMPRESSION_GZIP_LEVEL = _env_int('COMPRESSION_GZIP_LEVEL', 6)
+COMPRESSION_BROTLI_QUALITY = _env_int('COMPRESSION_BROTLI_QUALITY', 4)
+
+# Every Nth recipe version stores the full state instead of a delta
+RECIPE_HISTORY_CHECKPOINT_INTERVAL = _env_int(
+    'RECIPE_HISTORY_CHECKPOINT_INTERVAL', 20
+)
+
+# Hours a deleted recipe stays restorable before purge_deleted_recipes
+# removes it
+RECIPE_PURGE_AFTER_HOURS = _env_int('RECIPE_PURGE_AFTER_HOURS', 24)
+
+# Seconds a feed page stays cached, pages are also dropped when a
+# followed author publishes
+FEED_CACHE_TIMEOUT = _env_int('FEED_CACHE_TIMEOUT', 300)
+
+# Seconds the nutrition and cost rollup of a recipe stays cached, rollups
+# are also dropped when its ingredients, their data or the units change
+NUTRITION_CACHE_TIMEOUT = _env_int('NUTRITION_CACHE_TIMEOUT', 3600)
+
+# Hours the response of an Idempotency-Key is replayed to retries before
+# expire_idempotency_keys removes it
+IDEMPOTENCY_KEY_TTL_HOURS = _env_int('IDEMPOTENCY_KEY_TTL_HOURS', 24)
+# Seconds a request holds its key before a retry may take it over, for
+# when the worker running it died
+IDEMPOTENCY_CLAIM_TIMEOUT = _env_int('IDEMPOTENCY_CLAIM_TIMEOUT', 60)
+
+# Days compact_change_log keeps the tombstones of the sync change log,
+# clients that have not synced for longer must download everything again
+SYNC_TOMBSTONE_DAYS = _env_int('SYNC_TOMBSTONE_DAYS', 30)
+
+# The event streams are served by app.asgi under an ASGI server, e.g.
+# uvicorn, while the writes may be served by other processes such as
+# WSGI workers. With a shared cache (CACHE_URL) the changes are published
+# through it by core.events.CacheBroker so every process streams them,
+# without one core.events.LocalBroker only reaches the streams of the
+# process that made the change.
+EVENTS_BACKEND = os.environ.get(
+    'EVENTS_BACKEND',
+    'core.events.CacheBroker' if CACHE_URL else 'core.events.LocalBroker'
+)
+EVENTS_BACKEND_OPTIONS = {}
+# Seconds between the comments keeping idle event streams open
+EVENTS_KEEPALIVE_SECONDS = float(
+    os.environ.get('EVENTS_KEEPALIVE_SECONDS', 15)
+)
+
+# Caps on the search of a meal plan. The steps, meals placed, give
+# the same outcome for the same seed on any machine, the time limit in
+# milliseconds only bounds slow ones.
+MEAL_PLAN_MAX_STEPS = _env_int('MEAL_PLAN_MAX_STEPS', 2000)
+MEAL_PLAN_TIME_LIMIT_MS = _env_int('MEAL_PLAN_TIME_LIMIT_MS', 500)
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -0,0 +1,19 @@
+"""
+Settings for running the tests without a PostgreSQL server, e.g.
+python manage.py test --settings=app.test_settings
+"""
+
+import os
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import BASE_DIR, DATABASES
+
+DATABASES = {
+    'default': dict(
+        DATABASES['default'],
+        ENGINE='core.backends.sqlite3',
+        NAME=os.path.join(BASE_DIR, 'db.sqlite3'),
+        POOL=None,
+    ),
+}
+DATABASE_REPLICAS = []
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Keep the denormalized recipe summaries in sync
+        from core import signals  # noqa: F401
+        from core import checks  # noqa: F401
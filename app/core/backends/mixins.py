@@ -0,0 +1,37 @@
+class HealthCheckMixin:
+    """
+    Ping a persistent connection before it is reused by a new request
+
+    Django only checks a connection after an error occurred, so a
+    connection dropped by the server while idle between requests fails
+    the next query. With CONN_HEALTH_CHECKS enabled the first cursor of
+    every request runs a cheap liveness check and reconnects if needed.
+    """
+
+    health_check_done = False
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        """Close the connection if it is no longer usable"""
+        if (self.connection is None or not self.health_check_enabled or
+                self.health_check_done or self.in_atomic_block):
+            return
+
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
@@ -0,0 +1,90 @@
+import threading
+
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+from psycopg2 import pool as pg_pool
+
+from core.backends.mixins import HealthCheckMixin
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, conn_params, min_size, max_size):
+    """Return the process wide connection pool for a database alias"""
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = pg_pool.ThreadedConnectionPool(
+                min_size, max_size, **conn_params
+            )
+        return _pools[alias]
+
+
+def close_pools():
+    """Close every pooled connection, used on shutdown and in tests"""
+    with _pools_lock:
+        for connection_pool in _pools.values():
+            connection_pool.closeall()
+        _pools.clear()
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+    """
+    PostgreSQL backend with connection health checks and an optional
+    in-process connection pool
+
+    The pool is enabled by a POOL entry in the database settings, e.g.
+    {'MIN_SIZE': 1, 'MAX_SIZE': 10}. Closing the connection returns it
+    to the pool instead of tearing down the socket. Connecting while
+    MAX_SIZE connections are taken raises OperationalError, so the pool
+    needs one connection per thread serving requests.
+    """
+
+    @property
+    def pool_options(self):
+        return self.settings_dict.get('POOL') or None
+
+    def get_new_connection(self, conn_params):
+        options = self.pool_options
+        if not options:
+            return super().get_new_connection(conn_params)
+
+        connection_pool = get_pool(
+            self.alias,
+            conn_params,
+            options.get('MIN_SIZE', 1),
+            options['MAX_SIZE'],
+        )
+        try:
+            connection = connection_pool.getconn()
+            if connection.closed:
+                connection_pool.putconn(connection, close=True)
+                connection = connection_pool.getconn()
+        except pg_pool.PoolError as error:
+            raise OperationalError(
+                f'The connection pool of {self.alias} is exhausted, all '
+                f"{options['MAX_SIZE']} connections are in use."
+            ) from error
+
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        base.psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None or not self.pool_options:
+            return super()._close()
+
+        connection_pool = _pools.get(self.alias)
+        if connection_pool is None:
+            return super()._close()
+
+        with self.wrap_database_errors:
+            connection_pool.putconn(
+                self.connection, close=bool(self.errors_occurred)
+            )
@@ -0,0 +1,7 @@
+from django.db.backends.sqlite3 import base
+
+from core.backends.mixins import HealthCheckMixin
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+    """SQLite backend with connection health checks"""
@@ -0,0 +1,60 @@
+import gzip
+import time
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - exercised without brotli
+    brotli = None
+
+
+def codecs():
+    """Return the compression settings worth comparing"""
+    candidates = {
+        f'gzip-{level}': lambda body, level=level: gzip.compress(
+            body, compresslevel=level, mtime=0
+        )
+        for level in (1, 6, 9)
+    }
+    if brotli is not None:
+        candidates.update({
+            f'br-{quality}': lambda body, quality=quality: brotli.compress(
+                body, quality=quality
+            )
+            for quality in (1, 4, 11)
+        })
+    return candidates
+
+
+def measure(bodies, repeat=10):
+    """
+    Compress every named body with every codec
+
+    Returns rows of (body name, codec, bytes on the wire, ratio, ms per
+    compression), 'identity' being the uncompressed body.
+    """
+    rows = []
+    for body_name, body in bodies.items():
+        rows.append((body_name, 'identity', len(body), 1.0, 0.0))
+        for codec_name, codec in codecs().items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                compressed = codec(body)
+            elapsed = (time.perf_counter() - start) * 1000 / repeat
+            rows.append((
+                body_name, codec_name, len(compressed),
+                round(len(compressed) / len(body), 3), round(elapsed, 3),
+            ))
+    return rows
+
+
+def format_table(rows):
+    lines = [
+        f"{'response':<24}{'codec':<10}{'bytes':>10}{'ratio':>8}"
+        f"{'cpu ms':>9}"
+    ]
+    for body_name, codec, size, ratio, elapsed in rows:
+        lines.append(
+            f'{body_name:<24}{codec:<10}{size:>10}{ratio:>8.3f}'
+            f'{elapsed:>9.3f}'
+        )
+    return '\n'.join(lines)
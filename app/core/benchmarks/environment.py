@@ -0,0 +1,27 @@
+import tempfile
+from contextlib import contextmanager
+
+from django.test.utils import setup_databases, teardown_databases, \
+    override_settings
+
+
+@contextmanager
+def benchmark_environment(in_place=False):
+    """
+    Run the block against a throwaway test database (unless in_place)
+    with a temporary MEDIA_ROOT, the test client host allowed and
+    throttling off
+    """
+    old_config = None
+    if not in_place:
+        old_config = setup_databases(verbosity=0, interactive=False,
+                                     aliases={'default'})
+    try:
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, DEBUG=False,
+                                  ALLOWED_HOSTS=['testserver'],
+                                  THROTTLE_ENABLED=False):
+            yield
+    finally:
+        if old_config is not None:
+            teardown_databases(old_config, verbosity=0)
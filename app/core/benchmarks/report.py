@@ -0,0 +1,78 @@
+import json
+import math
+
+
+def percentile(values, pct):
+    """Return the pct percentile of values using linear interpolation"""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize(durations, queries):
+    """Summarize the samples of one scenario, durations in milliseconds"""
+    return {
+        'requests': len(durations),
+        'p50': round(percentile(durations, 50), 3),
+        'p95': round(percentile(durations, 95), 3),
+        'p99': round(percentile(durations, 99), 3),
+        'queries': round(sum(queries) / len(queries), 2) if queries else 0,
+    }
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Return the regressions of results against a baseline
+
+    A scenario regresses when its p95 grew more than tolerance or when
+    it runs more queries per request than before.
+    """
+    regressions = []
+    for scenario, current in results.items():
+        previous = baseline.get(scenario)
+        if previous is None:
+            continue
+
+        if current['p95'] > previous['p95'] * (1 + tolerance):
+            regressions.append(
+                f"{scenario}: p95 {current['p95']}ms > "
+                f"baseline {previous['p95']}ms"
+            )
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f"{scenario}: {current['queries']} queries/request > "
+                f"baseline {previous['queries']}"
+            )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write('\n')
+
+
+def format_table(results):
+    """Return the results as a plain text table"""
+    lines = [
+        f"{'scenario':<20}{'reqs':>6}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'queries':>9}"
+    ]
+    for scenario, row in results.items():
+        lines.append(
+            f"{scenario:<20}{row['requests']:>6}{row['p50']:>10.2f}"
+            f"{row['p95']:>10.2f}{row['p99']:>10.2f}{row['queries']:>9}"
+        )
+    return '\n'.join(lines)
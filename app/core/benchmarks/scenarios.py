@@ -0,0 +1,149 @@
+import io
+import random
+import time
+from contextlib import ExitStack
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.benchmarks.report import summarize
+from core.benchmarks.seed import BENCH_PASSWORD
+from core.metrics import RequestMetrics
+
+
+class BenchmarkError(Exception):
+    """Raised when a scenario request does not succeed"""
+
+
+class UserContext:
+    """Authenticated client and the ids owned by one benchmark user"""
+
+    def __init__(self, user):
+        self.user = user
+        self.client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.recipe_ids = list(
+            user.recipe_set.order_by('id').values_list('id', flat=True)
+        )
+        self.tag_ids = list(
+            user.tag_set.order_by('id').values_list('id', flat=True)
+        )
+        self.ingredient_ids = list(
+            user.ingredient_set.order_by('id').values_list('id', flat=True)
+        )
+
+
+def _ids(rng, ids, count=2):
+    return ','.join(str(i) for i in rng.sample(ids, min(count, len(ids))))
+
+
+def _jpeg():
+    image_file = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+    return image_file.getvalue()
+
+
+JPEG = _jpeg()
+
+
+def list_recipes(ctx, rng):
+    return ctx.client.get(reverse('recipe:recipe-list'))
+
+
+def filter_by_tags(ctx, rng):
+    return ctx.client.get(reverse('recipe:recipe-list'),
+                          {'tags': _ids(rng, ctx.tag_ids)})
+
+
+def filter_by_ingredients(ctx, rng):
+    return ctx.client.get(reverse('recipe:recipe-list'),
+                          {'ingredients': _ids(rng, ctx.ingredient_ids)})
+
+
+def recipe_detail(ctx, rng):
+    return ctx.client.get(
+        reverse('recipe:recipe-detail', args=[rng.choice(ctx.recipe_ids)])
+    )
+
+
+def create_recipe(ctx, rng):
+    return ctx.client.post(reverse('recipe:recipe-list'), {
+        'title': 'Benchmark Recipe',
+        'time_minutes': rng.randint(5, 180),
+        'price': '9.99',
+        'tags': rng.sample(ctx.tag_ids, min(3, len(ctx.tag_ids))),
+        'ingredients': rng.sample(
+            ctx.ingredient_ids, min(8, len(ctx.ingredient_ids))
+        ),
+    }, format='json')
+
+
+def upload_image(ctx, rng):
+    return ctx.client.post(
+        reverse('recipe:recipe-upload-image',
+                args=[rng.choice(ctx.recipe_ids)]),
+        {'image': SimpleUploadedFile('bench.jpg', JPEG, 'image/jpeg')},
+        format='multipart'
+    )
+
+
+def token_auth(ctx, rng):
+    return APIClient().post(reverse('user:token'), {
+        'email': ctx.user.email,
+        'password': BENCH_PASSWORD,
+    })
+
+
+SCENARIOS = {
+    'list': list_recipes,
+    'filter_tags': filter_by_tags,
+    'filter_ingredients': filter_by_ingredients,
+    'detail': recipe_detail,
+    'create': create_recipe,
+    'upload_image': upload_image,
+    'token_auth': token_auth,
+}
+
+
+def run_scenario(scenario, contexts, iterations, warmup=5, seed_value=0):
+    """Run one scenario and return its latency and query summary"""
+    rng = random.Random(seed_value)
+    durations = []
+    queries = []
+
+    for iteration in range(warmup + iterations):
+        ctx = contexts[iteration % len(contexts)]
+        request_metrics = RequestMetrics()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(
+                    request_metrics.record_query
+                ))
+            start = time.perf_counter()
+            response = scenario(ctx, rng)
+            elapsed = time.perf_counter() - start
+
+        if response.status_code >= 400:
+            raise BenchmarkError(
+                f'{scenario.__name__} returned {response.status_code}'
+            )
+        if iteration >= warmup:
+            durations.append(elapsed * 1000)
+            queries.append(request_metrics.queries)
+
+    return summarize(durations, queries)
+
+
+def run_benchmarks(users, names=None, iterations=50, warmup=5, seed_value=0):
+    """Run the named scenarios (all by default) for the seeded users"""
+    contexts = [UserContext(user) for user in users]
+    return {
+        name: run_scenario(SCENARIOS[name], contexts, iterations, warmup,
+                           seed_value)
+        for name in (names or SCENARIOS)
+    }
@@ -0,0 +1,119 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+
+from core.models import Tag, Ingredient, Recipe, Change
+from core.seeding import password_hash
+from core.summaries import refresh_summaries
+from core.usage import refresh_usage
+
+BENCH_PASSWORD = 'benchpass123'
+
+SCALES = {
+    'tiny': {'users': 2, 'recipes': 20, 'tags': 5, 'ingredients': 10},
+    'small': {'users': 10, 'recipes': 100, 'tags': 20, 'ingredients': 50},
+    'medium': {'users': 50, 'recipes': 500, 'tags': 50, 'ingredients': 200},
+    'large': {'users': 200, 'recipes': 2000, 'tags': 100,
+              'ingredients': 500},
+}
+
+
+def bench_email(index):
+    return f'bench{index}@bench.com'
+
+
+def _ids(model, user):
+    return list(
+        model.objects.filter(user=user).order_by('id')
+        .values_list('id', flat=True)
+    )
+
+
+def seed(users, recipes, tags, ingredients, tags_per_recipe=3,
+         ingredients_per_recipe=8, seed_value=0):
+    """
+    Create a deterministic data set of users x recipes x tags x
+    ingredients, recipes, tags and ingredients being counts per user
+
+    The same arguments always produce the same rows, so benchmark runs
+    are comparable. Returns the created users.
+    """
+    rng = random.Random(seed_value)
+    get_user_model().objects.bulk_create(
+        get_user_model()(
+            email=bench_email(index),
+            password=password_hash(BENCH_PASSWORD),
+            name=f'Bench User {index}'
+        )
+        for index in range(users)
+    )
+    created_users = list(
+        get_user_model().objects.filter(
+            email__in=[bench_email(index) for index in range(users)]
+        ).order_by('id')
+    )
+
+    recipe_tags = Recipe.tags.through
+    recipe_ingredients = Recipe.ingredients.through
+
+    for user in created_users:
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f'Tag {index}',
+                normalized_name=f'tag {index}')
+            for index in range(tags)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'Ingredient {index}',
+                       normalized_name=f'ingredient {index}')
+            for index in range(ingredients)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f'Recipe {index}',
+                time_minutes=rng.randint(5, 180),
+                price=Decimal(rng.randint(100, 99999)) / 100,
+                link=f'https://example.com/recipe/{index}',
+            )
+            for index in range(recipes)
+        )
+
+        # Not every backend returns the primary keys from bulk_create
+        tag_ids = _ids(Tag, user)
+        ingredient_ids = _ids(Ingredient, user)
+        recipe_tags.objects.bulk_create(
+            recipe_tags(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in _ids(Recipe, user)
+            for tag_id in rng.sample(tag_ids, min(tags_per_recipe, tags))
+        )
+        recipe_ingredients.objects.bulk_create(
+            recipe_ingredients(recipe_id=recipe_id, ingredient_id=item_id)
+            for recipe_id in _ids(Recipe, user)
+            for item_id in rng.sample(
+                ingredient_ids, min(ingredients_per_recipe, ingredients)
+            )
+        )
+
+    # bulk_create bypasses the signals maintaining the summaries, usage
+    # counters and sync change logs
+    refresh_summaries(
+        Recipe.objects.filter(user__in=created_users)
+        .values_list('id', flat=True)
+    )
+    for model, through, field in ((Tag, recipe_tags, 'tag'),
+                                  (Ingredient, recipe_ingredients,
+                                   'ingredient')):
+        refresh_usage(model, through, field, model.objects.filter(
+            user__in=created_users
+        ).values('id'))
+    for model, kind in ((Tag, Change.TAG), (Ingredient, Change.INGREDIENT),
+                        (Recipe, Change.RECIPE)):
+        Change.objects.bulk_create(
+            Change(user_id=user_id, kind=kind, object_id=pk)
+            for pk, user_id in model.objects.filter(
+                user__in=created_users
+            ).order_by('id').values_list('id', 'user_id')
+        )
+
+    return created_users
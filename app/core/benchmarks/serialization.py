@@ -0,0 +1,52 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmarks.report import summarize
+from core.metrics import RequestMetrics
+
+
+def time_serializer(serializer_class, queryset, repeat=20):
+    """
+    Serialize and render queryset repeat times, returning the latency
+    summary and the rendered bytes of the last run
+    """
+    renderer = JSONRenderer()
+    durations = []
+    queries = []
+    content = b''
+
+    for _ in range(repeat):
+        request_metrics = RequestMetrics()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(
+                    request_metrics.record_query
+                ))
+            start = time.perf_counter()
+            content = renderer.render(
+                serializer_class(queryset.all(), many=True).data
+            )
+            durations.append((time.perf_counter() - start) * 1000)
+        queries.append(request_metrics.queries)
+
+    return summarize(durations, queries), content
+
+
+def compare_serializers(candidates, repeat=20):
+    """
+    Time every named (serializer class, queryset) candidate
+
+    Returns the summaries and whether all of them rendered the same
+    bytes.
+    """
+    results = {}
+    outputs = set()
+    for name, (serializer_class, queryset) in candidates.items():
+        results[name], content = time_serializer(
+            serializer_class, queryset, repeat
+        )
+        outputs.add(content)
+    return results, len(outputs) == 1
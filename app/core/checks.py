@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Replicas need a cache shared by all processes, a write pins the
+    user's reads to the primary in every process through it
+    """
+    if settings.DATABASE_REPLICAS and \
+            isinstance(caches['default'], LocMemCache):
+        return [Error(
+            'DATABASE_REPLICAS needs a cache shared between processes.',
+            hint='Set CACHE_URL to a Redis server.',
+            id='core.E001',
+        )]
+    return []
+
+
+@register(Tags.caches, deploy=True)
+def check_deployed_cache(app_configs, **kwargs):
+    """
+    Deployments need a shared cache, the nutrition rollups, feed pages
+    and unit graphs are invalidated through it after a write in any
+    process
+    """
+    if isinstance(caches['default'], LocMemCache):
+        return [Error(
+            'The cache is kept per process, other processes serve stale '
+            'nutrition rollups and feed pages after a write.',
+            hint='Set CACHE_URL to a Redis server.',
+            id='core.E002',
+        )]
+    return []
@@ -0,0 +1,119 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+_state = threading.local()
+_lag_cache = {}
+
+
+def pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_to_primary(user):
+    """Keep the user's reads on the primary for the read-your-writes window"""
+    if user is not None and user.is_authenticated:
+        cache.set(pin_key(user.pk), True, settings.READ_YOUR_WRITES_WINDOW)
+
+
+def is_pinned(user):
+    """Return True if the user wrote recently"""
+    return cache.get(pin_key(user.pk), False)
+
+
+def measure_replica_lag(alias):
+    """Return the replication lag of a database in seconds"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT CASE WHEN pg_is_in_recovery() THEN COALESCE('
+            'EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0'
+            ') ELSE 0 END'
+        )
+        return float(cursor.fetchone()[0])
+
+
+def replica_lag(alias):
+    """
+    Return the lag of a replica, measured at most once every
+    REPLICA_LAG_CHECK_INTERVAL seconds. Unreachable replicas report an
+    infinite lag so they are skipped.
+    """
+    now = time.monotonic()
+    checked_at, lag = _lag_cache.get(alias, (None, None))
+    if checked_at is not None and \
+            now - checked_at < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return lag
+
+    try:
+        lag = measure_replica_lag(alias)
+    except DatabaseError:
+        lag = float('inf')
+    _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def healthy_replicas():
+    """Return the replicas that are within the allowed lag"""
+    return [
+        alias for alias in settings.DATABASE_REPLICAS
+        if replica_lag(alias) <= settings.REPLICA_MAX_LAG
+    ]
+
+
+class ReplicaRouter:
+    """
+    Send reads to a replica while a replica-enabled view handles a safe
+    request, everything else goes to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'use_replica', False):
+            return None
+
+        replicas = healthy_replicas()
+        if not replicas:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin routing safe requests to the read replicas
+
+    Writes pin the user to the primary for READ_YOUR_WRITES_WINDOW
+    seconds so the next reads see them.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        safe = request.method in SAFE_METHODS
+        self.pinned_user = None if safe else request.user
+        _state.use_replica = (
+            safe and
+            bool(settings.DATABASE_REPLICAS) and
+            not is_pinned(request.user)
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        self.pinned_user = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _state.use_replica = False
+            pin_to_primary(self.pinned_user)
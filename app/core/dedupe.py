@@ -0,0 +1,112 @@
+from collections import defaultdict
+
+from django.db import router, transaction
+from django.db.models import Case, Value, When
+
+from core import nutrition
+from core.models import normalize_name
+
+
+def _merge_into(model, through, field, replacements, using):
+    """
+    Move the recipe links of the rows in replacements, {id: id of the
+    row replacing it}, and delete the rows
+
+    Links are repointed in place so the columns they carry, like the
+    quantities of ingredients, are kept. A recipe linked to a duplicate
+    and its keeper keeps the keeper's link. Returns the ids of the
+    recipes whose links changed.
+    """
+    links = through._base_manager.using(using)
+    column = f'{field}_id'
+    moved = list(links.filter(**{f'{column}__in': list(replacements)})
+                 .order_by('id').values_list('id', 'recipe_id', column))
+    recipes = {recipe_id for _, recipe_id, _ in moved}
+    linked = set(links.filter(
+        recipe_id__in=recipes,
+        **{f'{column}__in': set(replacements.values())}
+    ).values_list('recipe_id', column))
+    colliding = []
+    for pk, recipe_id, target_id in moved:
+        key = (recipe_id, replacements[target_id])
+        if key in linked:
+            colliding.append(pk)
+        else:
+            linked.add(key)
+    links.filter(id__in=colliding)._raw_delete(using)
+    if len(colliding) < len(moved):
+        links.filter(**{f'{column}__in': list(replacements)}).update(**{
+            column: Case(*(
+                When(**{column: pk}, then=Value(keeper))
+                for pk, keeper in replacements.items()
+            ))
+        })
+    model._base_manager.using(using).filter(
+        id__in=list(replacements)
+    )._raw_delete(using)
+    nutrition.invalidate_rollups(recipes)
+    return recipes
+
+
+def merge_duplicates(model, through, field, batch_size=500, using=None):
+    """
+    Bring the normalized names of model up to date and merge the rows of
+    a user whose names normalize alike into the oldest one, moving their
+    links in the through table of the recipe relation whose foreign key
+    to model is field
+
+    Rows are read in id order in batches, each fixed in its own
+    transaction. Yields ({id: user id} of the rows merged away, rows
+    renamed, ids of the recipes whose links changed) per batch.
+    """
+    using = using or router.db_for_write(model)
+    rows = model._base_manager.using(using)
+    last_id = 0
+    while True:
+        batch = list(rows.filter(id__gt=last_id).order_by('id').values_list(
+            'id', 'user_id', 'name', 'normalized_name'
+        )[:batch_size])
+        if not batch:
+            return
+        last_id = batch[-1][0]
+
+        groups = defaultdict(set)
+        stale = set()
+        for pk, user_id, name, stored in batch:
+            if normalize_name(name) != stored:
+                groups[(user_id, normalize_name(name))].add(pk)
+                stale.add(pk)
+        if not groups:
+            continue
+
+        with transaction.atomic(using=using):
+            # Rows already holding one of the names take part too
+            for pk, user_id, stored in rows.filter(
+                    user_id__in={user_id for user_id, _ in groups},
+                    normalized_name__in={name for _, name in groups},
+            ).values_list('id', 'user_id', 'normalized_name'):
+                if (user_id, stored) in groups:
+                    groups[(user_id, stored)].add(pk)
+
+            keepers = {key: min(ids) for key, ids in groups.items()}
+            replacements = {
+                pk: keepers[key]
+                for key, ids in groups.items() for pk in ids
+                if pk != keepers[key]
+            }
+            owners = {
+                pk: user_id
+                for (user_id, _), ids in groups.items() for pk in ids
+                if pk in replacements
+            }
+            recipes = set()
+            if replacements:
+                recipes = _merge_into(model, through, field, replacements,
+                                      using)
+
+            renamed = [
+                model(id=keeper, normalized_name=name)
+                for (_, name), keeper in keepers.items() if keeper in stale
+            ]
+            rows.bulk_update(renamed, ['normalized_name'])
+        yield owners, len(renamed), sorted(recipes)
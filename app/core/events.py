@@ -0,0 +1,351 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+from rest_framework.authtoken.models import Token
+
+logger = logging.getLogger(__name__)
+
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+
+
+def coalesce(events):
+    """
+    Keep the last event of each object, a created object updated
+    before the client heard of it is still reported as created
+    """
+    latest = {}
+    for event in events:
+        key = (event['kind'], event['id'])
+        previous = latest.pop(key, None)
+        if previous and previous['event'] == CREATED and \
+                event['event'] == UPDATED:
+            event = previous
+        latest[key] = event
+    return list(latest.values())
+
+
+class Subscription:
+    """Events waiting for one stream, only touched on its event loop"""
+
+    def __init__(self, user_id, loop, max_events):
+        self.user_id = user_id
+        self.loop = loop
+        self.max_events = max_events
+        self.overflowed = False
+        self._events = deque()
+        self._ready = asyncio.Event()
+
+    def put(self, events):
+        """Queue events, events None meaning some were lost"""
+        if events is None or \
+                len(self._events) + len(events) > self.max_events:
+            # A client this far behind resyncs instead
+            self.overflowed = True
+            self._events.clear()
+        elif not self.overflowed:
+            self._events.extend(events)
+        self._ready.set()
+
+    async def get(self):
+        """Wait for events and return them all, coalesced"""
+        await self._ready.wait()
+        self._ready.clear()
+        events = coalesce(self._events)
+        self._events.clear()
+        return events
+
+
+class LocalBroker:
+    """
+    Publishes events to the streams of this process, so the process
+    serving the streams must also serve the writes. Any thread may
+    publish, the events reach each stream on its own event loop.
+    """
+
+    def __init__(self, max_events=1000):
+        self.max_events = max_events
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Start a stream of the user's events, called on its event loop"""
+        subscription = Subscription(user_id, asyncio.get_running_loop(),
+                                    self.max_events)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            streams = self._subscriptions.get(subscription.user_id, set())
+            streams.discard(subscription)
+            if not streams:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, user_id, events):
+        self.deliver(user_id, events)
+
+    def deliver(self, user_id, events):
+        """Hand events to the streams of the user in this process"""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put,
+                                                       events)
+            except RuntimeError:
+                # The loop closed before the stream unsubscribed
+                self.unsubscribe(subscription)
+
+    def subscribed_users(self):
+        with self._lock:
+            return list(self._subscriptions)
+
+
+class CacheBroker(LocalBroker):
+    """
+    Publishes events through a Django cache shared by all processes,
+    e.g. Redis or Memcached, so writes served by any process reach the
+    streams of every other
+
+    Each user's events get a sequence number in the cache, a thread per
+    process polls the numbers of the users it streams to every interval
+    seconds and fetches the events it has not seen. Events published
+    while a stream connects may be missed, clients sync once connected.
+    """
+
+    def __init__(self, max_events=1000, alias='default', interval=1.0,
+                 timeout=300):
+        super().__init__(max_events)
+        self.cache = caches[alias]
+        self.interval = interval
+        self.timeout = timeout
+        self._seen = {}
+        # {user id: (first sequence number not stored yet, since when)}
+        self._waiting = {}
+        self._poller = None
+
+    def _key(self, user_id, seq='seq'):
+        return f'events:{user_id}:{seq}'
+
+    def publish(self, user_id, events):
+        key = self._key(user_id)
+        self.cache.add(key, 0, None)
+        try:
+            seq = self.cache.incr(key)
+        except ValueError:
+            # Evicted since the add, start over
+            self.cache.add(key, 0, None)
+            seq = self.cache.incr(key)
+        self.cache.set(self._key(user_id, seq), events, self.timeout)
+
+    def subscribe(self, user_id):
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll_forever,
+                                                daemon=True)
+                self._poller.start()
+        return super().subscribe(user_id)
+
+    def poll(self):
+        """
+        Deliver the events published since the last poll, up to the
+        first batch not stored yet
+
+        publish() stores a batch right after taking its sequence number,
+        a batch still missing is fetched again by the next polls until
+        it has been missing for longer than the batches are kept.
+        """
+        users = self.subscribed_users()
+        for user_id in set(self._seen) - set(users):
+            del self._seen[user_id]
+            self._waiting.pop(user_id, None)
+        if not users:
+            return
+
+        seqs = self.cache.get_many([self._key(user_id) for user_id in users])
+        wanted = {}
+        for user_id in users:
+            seq = seqs.get(self._key(user_id), 0)
+            last = self._seen.setdefault(user_id, seq)
+            if seq - last > self.max_events:
+                self._seen[user_id] = seq
+                self._waiting.pop(user_id, None)
+                self.deliver(user_id, None)
+            elif seq > last:
+                wanted[user_id] = range(last + 1, seq + 1)
+
+        found = self.cache.get_many([
+            self._key(user_id, seq)
+            for user_id, seqs in wanted.items() for seq in seqs
+        ])
+        now = time.monotonic()
+        for user_id, seqs in wanted.items():
+            events = []
+            for seq in seqs:
+                batch = found.get(self._key(user_id, seq))
+                if batch is None:
+                    break
+                events.extend(batch)
+                self._seen[user_id] = seq
+            else:
+                self._waiting.pop(user_id, None)
+                self.deliver(user_id, events)
+                continue
+
+            missing, since = self._waiting.get(user_id, (None, None))
+            if missing != seq:
+                self._waiting[user_id] = (seq, now)
+            elif now - since > self.timeout:
+                # Expired or evicted, the stream resyncs
+                self._seen[user_id] = seqs[-1]
+                del self._waiting[user_id]
+                self.deliver(user_id, None)
+                continue
+            if events:
+                self.deliver(user_id, events)
+
+    def _poll_forever(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Polling the events cache failed')
+
+
+_brokers = {}
+
+
+def get_broker():
+    """Return the broker configured by the EVENTS_BACKEND settings"""
+    if settings.EVENTS_BACKEND not in _brokers:
+        options = dict(settings.EVENTS_BACKEND_OPTIONS)
+        _brokers[settings.EVENTS_BACKEND] = import_string(
+            settings.EVENTS_BACKEND
+        )(**options)
+    return _brokers[settings.EVENTS_BACKEND]
+
+
+def publish_on_commit(events_by_user, using=None):
+    """
+    Publish {user id: events} once the transaction commits, events of
+    changes rolled back are never sent
+    """
+    if not events_by_user:
+        return
+
+    def publish():
+        broker = get_broker()
+        for user_id, events in events_by_user.items():
+            broker.publish(user_id, events)
+    transaction.on_commit(publish, using=using)
+
+
+def format_event(event):
+    data = json.dumps({'kind': event['kind'], 'id': event['id']})
+    return f'event: {event["event"]}\ndata: {data}\n\n'.encode()
+
+
+def _token_user_id(key):
+    close_old_connections()
+    try:
+        return Token.objects.filter(
+            key=key, user__is_active=True
+        ).values_list('user_id', flat=True).first()
+    finally:
+        close_old_connections()
+
+
+async def _authenticate(scope):
+    """Return the id of the user of the request's token, if any"""
+    headers = dict(scope.get('headers', ()))
+    parts = headers.get(b'authorization', b'').decode('latin-1').split()
+    if len(parts) != 2 or parts[0].lower() != 'token':
+        return None
+    return await sync_to_async(_token_user_id)(parts[1])
+
+
+async def _respond(send, code, detail, headers=()):
+    await send({
+        'type': 'http.response.start', 'status': code,
+        'headers': [(b'content-type', b'application/json'), *headers],
+    })
+    await send({'type': 'http.response.body',
+                'body': json.dumps({'detail': detail}).encode()})
+
+
+async def _disconnected(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def event_stream(scope, receive, send):
+    """
+    ASGI application streaming the created, updated and deleted recipes,
+    tags and ingredients of the token's user as server-sent events
+
+    Idle streams only hold a coroutine, not a worker. A comment is sent
+    every EVENTS_KEEPALIVE_SECONDS to keep proxies from closing them. A
+    stream falling too far behind gets an overflow event and is closed,
+    the client then catches up through the sync endpoint.
+    """
+    if scope['method'] != 'GET':
+        return await _respond(send, 405, 'Method not allowed.',
+                              [(b'allow', b'GET')])
+    user_id = await _authenticate(scope)
+    if user_id is None:
+        return await _respond(send, 401, 'Invalid token.',
+                              [(b'www-authenticate', b'Token')])
+
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+    disconnect = asyncio.ensure_future(_disconnected(receive))
+    pending = None
+    try:
+        await send({
+            'type': 'http.response.start', 'status': 200,
+            'headers': [(b'content-type', b'text/event-stream'),
+                        (b'cache-control', b'no-cache'),
+                        (b'x-accel-buffering', b'no')],
+        })
+        await send({'type': 'http.response.body',
+                    'body': b': connected\n\n', 'more_body': True})
+        while True:
+            pending = pending or asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {pending, disconnect},
+                timeout=settings.EVENTS_KEEPALIVE_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnect in done:
+                return
+            if pending not in done:
+                body = b': keepalive\n\n'
+            elif subscription.overflowed:
+                await send({'type': 'http.response.body',
+                            'body': b'event: overflow\ndata: {}\n\n'})
+                return
+            else:
+                body = b''.join(map(format_event, pending.result()))
+                pending = None
+                if not body:
+                    continue
+            await send({'type': 'http.response.body', 'body': body,
+                        'more_body': True})
+    finally:
+        broker.unsubscribe(subscription)
+        for task in (pending, disconnect):
+            if task is not None:
+                task.cancel()
@@ -0,0 +1,153 @@
+import heapq
+import uuid
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F, Max, Window
+from django.db.models.functions import RowNumber
+
+from core.models import Follow, Recipe
+
+
+def version_key(user_id):
+    return f'feed:version:{user_id}'
+
+
+def feed_version(user_id):
+    """
+    Return the token of the user's current feed, part of the key of
+    every cached page so dropping it invalidates them all
+    """
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_feed(user_id):
+    cache.delete(version_key(user_id))
+
+
+def author_key(author_id):
+    return f'feed:author:{author_id}'
+
+
+def author_versions(author_ids):
+    """
+    Return {author id: token} of the authors' published recipes, cached
+    pages keep the tokens of the authors they show and are dropped once
+    one of them changed
+    """
+    keys = {author_key(pk): pk for pk in author_ids}
+    versions = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def invalidate_followers(author_id):
+    """
+    Drop the cached feeds of everybody following the author, a single
+    cache write however many they are
+    """
+    cache.set(author_key(author_id), uuid.uuid4().hex, None)
+
+
+def page_key(user_id, before, size, variant=''):
+    return (f'feed:page:{user_id}:{feed_version(user_id)}:{before}:{size}:'
+            f'{variant}')
+
+
+def author_ranges(recipes, authors, newest, oldest, size):
+    """
+    Read the newest published ids of each author in [oldest, newest)
+    from the (user, id) index, at most size per author, in one query.
+    oldest may be None.
+
+    Returns the ranges as lists of descending ids.
+    """
+    ranked = recipes.filter(user_id__in=authors, id__lt=newest)
+    if oldest is not None:
+        ranked = ranked.filter(id__gte=oldest)
+    ranked = ranked.annotate(author_rank=Window(
+        RowNumber(), partition_by=[F('user_id')], order_by=F('id').desc()
+    )).values_list('user_id', 'id', 'author_rank')
+    sql, params = ranked.query.sql_with_params()
+    with connections[ranked.db].cursor() as cursor:
+        cursor.execute(
+            f'SELECT ranked.user_id, ranked.id FROM ({sql}) ranked '
+            f'WHERE ranked.author_rank <= %s '
+            f'ORDER BY ranked.user_id, ranked.id DESC',
+            (*params, size)
+        )
+        rows = cursor.fetchall()
+    return [
+        [recipe_id for _, recipe_id in items]
+        for _, items in groupby(rows, key=lambda row: row[0])
+    ]
+
+
+def feed_ids(user, before=None, size=20, using=None):
+    """
+    Return the ids of the newest published recipes of the authors the
+    user follows, older than before if given, newest first
+
+    Only authors whose newest recipe ranks in the top size can be in
+    the page, and if there are size of them nothing older than the
+    newest recipe of the last one. Their ranges are read and combined
+    with a k-way merge, two queries whatever the number of authors
+    followed.
+    """
+    recipes = Recipe.objects.using(using).filter(published=True)
+    if before is not None:
+        recipes = recipes.filter(id__lt=before)
+
+    heads = list(
+        recipes.filter(user_id__in=Follow.objects.using(using).filter(
+            follower=user
+        ).values('followee_id')).values('user_id').annotate(
+            head=Max('id')
+        ).order_by('-head').values_list('user_id', 'head')[:size]
+    )
+    if not heads:
+        return []
+
+    oldest = heads[-1][1] if len(heads) == size else None
+    ranges = author_ranges(
+        recipes, [author for author, _ in heads], heads[0][1] + 1, oldest,
+        size
+    )
+    merged = heapq.merge(*ranges, reverse=True)
+    return list(islice(merged, size))
+
+
+def cached_feed_page(user, before, size, render, variant=''):
+    """
+    Return the cached page of the user's feed, or cache the result of
+    render(ids of the page) until a followed author publishes
+
+    The page is checked against the versions of the authors followed
+    when it was cached, following or unfollowing drops it altogether.
+    """
+    key = page_key(user.pk, before, size, variant)
+    page = cache.get(key)
+    if page is None or author_versions(page['authors']) != page['authors']:
+        # Taken first, a change while the page is read makes it stale
+        authors = author_versions(Follow.objects.filter(
+            follower=user
+        ).values_list('followee_id', flat=True))
+        ids = feed_ids(user, before, size)
+        page = {
+            'results': render(ids),
+            'next': ids[-1] if len(ids) == size else None,
+            'authors': authors,
+        }
+        cache.set(key, page, settings.FEED_CACHE_TIMEOUT)
+    return {'results': page['results'], 'next': page['next']}
@@ -0,0 +1,40 @@
+import random
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+_migrated_aliases = set()
+
+
+def check_database(alias=DEFAULT_DB_ALIAS):
+    """Run a trivial query, raising OperationalError if the DB is down"""
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def check_migrations(alias=DEFAULT_DB_ALIAS):
+    """
+    Return True if every migration has been applied to the database
+
+    Loading the migration graph is expensive, so a successful result is
+    remembered for the lifetime of the process.
+    """
+    if alias in _migrated_aliases:
+        return True
+
+    executor = MigrationExecutor(connections[alias])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if plan:
+        return False
+
+    _migrated_aliases.add(alias)
+    return True
+
+
+def backoff_delays(base=0.1, maximum=5.0):
+    """Yield exponentially growing delays with full jitter"""
+    attempt = 0
+    while True:
+        yield random.uniform(0, min(maximum, base * 2 ** attempt))
+        attempt += 1
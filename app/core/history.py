@@ -0,0 +1,221 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Subquery
+
+from core.models import Recipe, RecipeIngredient, RecipeVersion, Unit
+from core.signals import amounts_changed
+from core.summaries import deferred_summaries
+from core.sync import deferred_changes
+
+VERSIONED_FIELDS = ('title', 'time_minutes', 'price', 'servings', 'link',
+                    'image')
+VERSIONED_RELATIONS = ('tags', 'ingredients')
+# Sorted [ingredient id, quantity, unit code] of the quantities known
+VERSIONED_AMOUNTS = 'amounts'
+# Values of the parts of the state versions recorded before them lack
+STATE_DEFAULTS = {'servings': None, VERSIONED_AMOUNTS: []}
+
+
+def recipe_state(recipe_id, using=None):
+    """Read the versioned state of a recipe as JSON compatible values"""
+    row = Recipe.objects.using(using).filter(id=recipe_id).values(
+        *VERSIONED_FIELDS
+    ).get()
+    state = {
+        'title': row['title'],
+        'time_minutes': row['time_minutes'],
+        'price': str(row['price']),
+        'servings': row['servings'],
+        'link': row['link'],
+        'image': row['image'] or None,
+    }
+    for relation in VERSIONED_RELATIONS:
+        through = getattr(Recipe, relation).through
+        target = through._meta.get_field(relation[:-1]).attname
+        state[relation] = sorted(
+            through.objects.using(using).filter(
+                recipe_id=recipe_id
+            ).values_list(target, flat=True)
+        )
+    state[VERSIONED_AMOUNTS] = [
+        [ingredient, str(quantity), unit]
+        for ingredient, quantity, unit in RecipeIngredient.objects.using(
+            using
+        ).filter(
+            recipe_id=recipe_id, quantity__isnull=False, unit__isnull=False
+        ).order_by('ingredient_id').values_list(
+            'ingredient_id', 'quantity', 'unit__code'
+        )
+    ]
+    return state
+
+
+def make_delta(old, new):
+    """
+    Return the changes between two states: changed fields and amounts
+    map to their new value and relations to the ids added and removed
+    """
+    delta = {}
+    for field in VERSIONED_FIELDS + (VERSIONED_AMOUNTS,):
+        if old[field] != new[field]:
+            delta[field] = new[field]
+    for relation in VERSIONED_RELATIONS:
+        added = sorted(set(new[relation]) - set(old[relation]))
+        removed = sorted(set(old[relation]) - set(new[relation]))
+        if added or removed:
+            delta[relation] = {'add': added, 'remove': removed}
+    return delta
+
+
+def apply_delta(state, delta):
+    """Return the state with the delta applied"""
+    state = dict(state)
+    for key, value in delta.items():
+        if key in VERSIONED_RELATIONS:
+            ids = set(state[key]) - set(value['remove'])
+            state[key] = sorted(ids | set(value['add']))
+        else:
+            state[key] = value
+    return state
+
+
+def version_state(recipe_id, number, using=None):
+    """
+    Rebuild the state of a recipe at a version from the closest
+    checkpoint at or before it, so at most one checkpoint interval of
+    deltas is read. Returns None if the version does not exist.
+    """
+    versions = RecipeVersion.objects.using(using).filter(recipe_id=recipe_id)
+    checkpoint = versions.filter(
+        checkpoint=True, number__lte=number
+    ).order_by('-number').values('number')[:1]
+    rows = list(versions.filter(
+        number__gte=Subquery(checkpoint), number__lte=number
+    ).order_by('number').values_list('number', 'data'))
+    if not rows or rows[-1][0] != number:
+        return None
+
+    state = dict(STATE_DEFAULTS, **rows[0][1])
+    for _, delta in rows[1:]:
+        state = apply_delta(state, delta)
+    return state
+
+
+def latest_version(recipe_id, using=None):
+    """Return the number of the newest version, or 0 if none exists"""
+    number = RecipeVersion.objects.using(using).filter(
+        recipe_id=recipe_id
+    ).order_by('-number').values_list('number', flat=True).first()
+    return number or 0
+
+
+def record_version(recipe, using=None):
+    """
+    Save the current state of a recipe as a new version if it differs
+    from the newest one
+
+    Returns the new version, or None if nothing changed.
+    """
+    using = using or router.db_for_write(RecipeVersion)
+    interval = settings.RECIPE_HISTORY_CHECKPOINT_INTERVAL
+    with transaction.atomic(using=using, savepoint=False):
+        # Lock the recipe so concurrent saves get consecutive numbers
+        list(Recipe.objects.using(using).select_for_update().filter(
+            id=recipe.id
+        ).values_list('id'))
+        state = recipe_state(recipe.id, using)
+        number = latest_version(recipe.id, using)
+
+        if number:
+            delta = make_delta(version_state(recipe.id, number, using),
+                               state)
+            if not delta:
+                return None
+            changed = sorted(delta)
+        else:
+            changed = sorted(state)
+
+        checkpoint = number % interval == 0
+        return RecipeVersion.objects.using(using).create(
+            recipe_id=recipe.id,
+            number=number + 1,
+            checkpoint=checkpoint,
+            data=state if checkpoint else delta,
+            changed=changed,
+        )
+
+
+def diff_versions(recipe_id, first, second, using=None):
+    """
+    Return the changes from one version to another, or None if either
+    does not exist
+    """
+    old = version_state(recipe_id, first, using)
+    new = version_state(recipe_id, second, using)
+    if old is None or new is None:
+        return None
+
+    changes = {}
+    for key, value in make_delta(old, new).items():
+        if key in VERSIONED_RELATIONS:
+            changes[key] = {'added': value['add'],
+                            'removed': value['remove']}
+        else:
+            changes[key] = {'from': old[key], 'to': value}
+    return changes
+
+
+def restore_state(recipe, state):
+    """
+    Reset a recipe to an earlier state from version_state() and record
+    the result as a new version. Tags and ingredients deleted since are
+    skipped, and an image whose file is gone is cleared. Returns the new
+    version, or None if nothing changed.
+    """
+    using = router.db_for_write(Recipe)
+    with transaction.atomic(using=using), deferred_changes(), \
+            deferred_summaries():
+        record_version(recipe, using)
+        for field in VERSIONED_FIELDS:
+            setattr(recipe, field, state[field])
+        if recipe.image and \
+                not recipe.image.storage.exists(recipe.image.name):
+            recipe.image = None
+        recipe.save(using=using)
+        for relation in VERSIONED_RELATIONS:
+            manager = getattr(recipe, relation)
+            manager.set(manager.model.objects.using(using).filter(
+                user_id=recipe.user_id, id__in=state[relation]
+            ))
+        restore_amounts(recipe, state[VERSIONED_AMOUNTS], using)
+        return record_version(recipe, using)
+
+
+def restore_amounts(recipe, amounts, using=None):
+    """
+    Set the quantities of the recipe's ingredients to those of a state,
+    clearing the others and those of units deleted since
+    """
+    units = dict(Unit.objects.using(using).filter(
+        code__in={unit for _, _, unit in amounts}
+    ).values_list('code', 'id'))
+    amounts = {
+        ingredient: (Decimal(quantity), units[unit])
+        for ingredient, quantity, unit in amounts if unit in units
+    }
+    links = list(RecipeIngredient.objects.using(using).filter(
+        recipe_id=recipe.id
+    ))
+    changed = []
+    for link in links:
+        quantity, unit = amounts.get(link.ingredient_id, (None, None))
+        if (link.quantity, link.unit_id) != (quantity, unit):
+            link.quantity, link.unit_id = quantity, unit
+            changed.append(link)
+    if changed:
+        RecipeIngredient.objects.using(using).bulk_update(
+            changed, ['quantity', 'unit']
+        )
+        amounts_changed([recipe.id], using)
@@ -0,0 +1,138 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.models import IdempotencyKey
+from core.purge import delete_in_chunks
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def request_fingerprint(request):
+    """Hash of what the key promises to repeat: method, path and body"""
+    digest = hashlib.sha256()
+    for part in (request.method, request.get_full_path()):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _error(code, detail):
+    return Response({'detail': detail}, status=code)
+
+
+def _take_over(keys, record):
+    """
+    Claim the key of a request that held it for longer than
+    IDEMPOTENCY_CLAIM_TIMEOUT, returning None while it may still run
+    """
+    now = timezone.now()
+    timeout = timedelta(seconds=settings.IDEMPOTENCY_CLAIM_TIMEOUT)
+    if record.claimed_at > now - timeout:
+        return None
+    # Of concurrent retries only the first moves the claim
+    if not keys.filter(id=record.id, status__isnull=True,
+                       claimed_at=record.claimed_at).update(claimed_at=now):
+        return None
+    record.claimed_at = now
+    return record
+
+
+def idempotent(request, handler):
+    """
+    Run handler() once per Idempotency-Key of the user, answering
+    retries with the stored response instead
+
+    The key is claimed by inserting its row before the handler runs, the
+    unique index letting one of concurrent requests with the same key
+    run while the others get 409 until it finishes. Errors release the
+    key so the request can be retried, and a claim held for longer than
+    IDEMPOTENCY_CLAIM_TIMEOUT, e.g. by a worker that died, is taken over
+    by the next retry.
+    """
+    key = request.headers.get(HEADER)
+    if not key:
+        return handler()
+    if len(key) > MAX_KEY_LENGTH:
+        return _error(status.HTTP_400_BAD_REQUEST,
+                      f'{HEADER} is longer than {MAX_KEY_LENGTH} '
+                      f'characters.')
+
+    fingerprint = request_fingerprint(request)
+    keys = IdempotencyKey.objects.db_manager(
+        router.db_for_write(IdempotencyKey)
+    ).filter(user=request.user, key=key)
+    record = keys.first()
+    claimed = None
+    if record is None:
+        try:
+            with transaction.atomic(using=keys.db):
+                claimed = keys.create(user=request.user, key=key,
+                                      fingerprint=fingerprint)
+        except IntegrityError:
+            # A concurrent request claimed the key first
+            record = keys.first()
+            if record is None:
+                return _error(status.HTTP_409_CONFLICT,
+                              'The request with this key expired, retry '
+                              'it.')
+
+    if record is not None:
+        if record.fingerprint != fingerprint:
+            return _error(status.HTTP_422_UNPROCESSABLE_ENTITY,
+                          f'{HEADER} was used for a different request.')
+        if record.status is None:
+            claimed = _take_over(keys, record)
+            if claimed is None:
+                return _error(status.HTTP_409_CONFLICT,
+                              'A request with this key is in progress.')
+        else:
+            response = Response(record.data, status=record.status)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+    # Left alone once another request took the claim over
+    owned = keys.filter(id=claimed.id, claimed_at=claimed.claimed_at)
+    try:
+        response = handler()
+    except Exception:
+        owned.delete()
+        raise
+    if response.status_code >= 500:
+        owned.delete()
+    else:
+        owned.update(status=response.status_code, data=response.data)
+    return response
+
+
+def expire_idempotency_keys(older_than, batch_size=1000):
+    """
+    Delete the keys created at least older_than ago in batches
+
+    Yields the rows deleted per batch.
+    """
+    cutoff = timezone.now() - older_than
+    keys = IdempotencyKey.objects.db_manager(
+        router.db_for_write(IdempotencyKey)
+    ).filter(created__lte=cutoff)
+    for deleted, _, _ in delete_in_chunks(keys, batch_size):
+        yield sum(deleted.values())
+
+
+class IdempotencyMixin:
+    """
+    Viewset mixin making create requests carrying an Idempotency-Key
+    safe to retry, it must come before the view overriding create
+    """
+
+    def create(self, request, *args, **kwargs):
+        create = super().create
+        return idempotent(request,
+                          lambda: create(request, *args, **kwargs))
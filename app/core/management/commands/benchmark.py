@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import report
+from core.benchmarks.environment import benchmark_environment
+from core.benchmarks.scenarios import SCENARIOS, BenchmarkError, \
+    run_benchmarks
+from core.benchmarks.seed import SCALES, seed
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the API against a seeded database"""
+
+    help = 'Run the API benchmark scenarios and compare with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small')
+        parser.add_argument('--scenario', action='append',
+                            choices=SCENARIOS, dest='scenarios')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline',
+                            help='JSON file with the baseline results')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write the results to --baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative p95 growth')
+        parser.add_argument(
+            '--in-place', action='store_true',
+            help='Seed the configured database instead of a throwaway '
+                 'test database'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with benchmark_environment(options['in_place']):
+                users = seed(seed_value=options['seed'],
+                             **SCALES[options['scale']])
+                results = run_benchmarks(
+                    users,
+                    names=options['scenarios'],
+                    iterations=options['iterations'],
+                    warmup=options['warmup'],
+                    seed_value=options['seed'],
+                )
+        except BenchmarkError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(report.format_table(results))
+
+        if not options['baseline']:
+            return
+
+        if options['save_baseline']:
+            report.save_baseline(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS(
+                f"Baseline saved to {options['baseline']}"
+            ))
+            return
+
+        regressions = report.compare(
+            results, report.load_baseline(options['baseline']),
+            options['tolerance']
+        )
+        if regressions:
+            raise CommandError(
+                'Performance regressions:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('No regressions'))
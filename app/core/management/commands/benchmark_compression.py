@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.benchmarks import compression
+from core.benchmarks.environment import benchmark_environment
+from core.benchmarks.seed import SCALES, seed
+
+VARIANTS = {
+    'full': {},
+    'expanded': {'expand': 'ingredients,tags'},
+    'title_image': {'fields': 'title,image'},
+}
+
+
+class Command(BaseCommand):
+    """Django command measuring bytes on the wire of recipe lists"""
+
+    help = 'Compare response sizes and compression CPU cost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--in-place', action='store_true')
+
+    def handle(self, *args, **options):
+        with benchmark_environment(options['in_place']):
+            users = seed(**SCALES[options['scale']])
+            client = APIClient()
+            client.force_authenticate(users[0])
+            bodies = {
+                name: client.get(reverse('recipe:recipe-list'),
+                                 params).content
+                for name, params in VARIANTS.items()
+            }
+
+        self.stdout.write(compression.format_table(
+            compression.measure(bodies, options['repeat'])
+        ))
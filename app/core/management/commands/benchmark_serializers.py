@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import report
+from core.benchmarks.environment import benchmark_environment
+from core.benchmarks.seed import SCALES, seed
+from core.benchmarks.serialization import compare_serializers
+from core.models import Recipe, RecipeSummary
+from recipe import serializers
+
+
+class Command(BaseCommand):
+    """Django command comparing the recipe list serialization paths"""
+
+    help = 'Micro-benchmark the model and fast recipe list serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--in-place', action='store_true')
+
+    def handle(self, *args, **options):
+        with benchmark_environment(options['in_place']):
+            users = seed(**SCALES[options['scale']])
+            recipes = Recipe.objects.filter(user=users[0]).order_by('id')
+            summaries = RecipeSummary.objects.filter(
+                user=users[0]
+            ).order_by('recipe_id')
+            results, identical = compare_serializers({
+                'model_serializer': (serializers.RecipeSerializer, recipes),
+                'values_serializer': (serializers.RecipeListSerializer,
+                                      recipes),
+                'summary_serializer': (
+                    serializers.RecipeSummaryListSerializer, summaries
+                ),
+            }, options['repeat'])
+
+        self.stdout.write(report.format_table(results))
+        if not identical:
+            raise CommandError('Serializers rendered different output')
+        self.stdout.write(self.style.SUCCESS('Output identical'))
@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sync import compact_changes, prune_tombstones
+
+
+class Command(BaseCommand):
+    """Django command to compact the sync change log in batches"""
+
+    help = ('Drop the change log entries superseded by newer ones and the '
+            'tombstones older than SYNC_TOMBSTONE_DAYS')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches to let other writers in'
+        )
+
+    def handle(self, *args, **options):
+        superseded = tombstones = 0
+        for deleted in compact_changes(options['batch_size']):
+            superseded += deleted
+            if options['pause']:
+                time.sleep(options['pause'])
+        for deleted in prune_tombstones(
+                timedelta(days=settings.SYNC_TOMBSTONE_DAYS),
+                options['batch_size']):
+            tombstones += deleted
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{superseded} superseded changes and {tombstones} tombstones '
+            f'deleted'
+        ))
@@ -0,0 +1,87 @@
+import copy
+import os
+import tempfile
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.db.utils import ConnectionHandler
+from django.core.management.base import BaseCommand
+
+
+def count_connection_opens(settings_dict, requests=1000):
+    """
+    Simulate the request cycle on a private connection and return how
+    many database connections were opened while serving the requests
+    """
+    handler = ConnectionHandler({
+        DEFAULT_DB_ALIAS: copy.deepcopy(settings_dict)
+    })
+    connection = handler[DEFAULT_DB_ALIAS]
+    opens = 0
+
+    def on_connection_created(sender, **kwargs):
+        nonlocal opens
+        if kwargs['connection'] is connection:
+            opens += 1
+
+    connection_created.connect(on_connection_created, weak=False)
+    try:
+        for _ in range(requests):
+            # Same hooks as the request_started / request_finished signals
+            connection.close_if_unusable_or_obsolete()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.close_if_unusable_or_obsolete()
+    finally:
+        connection_created.disconnect(on_connection_created)
+        connection.close()
+
+    return opens
+
+
+class Command(BaseCommand):
+    """Django command to count connection opens per N requests"""
+
+    help = 'Count the database connections opened while serving requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--conn-max-age', type=int, default=None,
+            help='Override CONN_MAX_AGE, negative keeps connections forever'
+        )
+        parser.add_argument(
+            '--sqlite', action='store_true',
+            help='Measure against a temporary SQLite database'
+        )
+
+    def handle(self, *args, **options):
+        settings_dict = copy.deepcopy(
+            connections.databases[options['database']]
+        )
+        if options['conn_max_age'] is not None:
+            max_age = options['conn_max_age']
+            settings_dict['CONN_MAX_AGE'] = None if max_age < 0 else max_age
+
+        if options['sqlite']:
+            handle, path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(handle)
+            settings_dict.update({
+                'ENGINE': 'core.backends.sqlite3',
+                'NAME': path,
+                'POOL': None,
+            })
+            try:
+                opens = count_connection_opens(
+                    settings_dict, options['requests']
+                )
+            finally:
+                os.remove(path)
+        else:
+            opens = count_connection_opens(settings_dict, options['requests'])
+
+        self.stdout.write(
+            f"{opens} connection(s) opened for {options['requests']} "
+            f"request(s) (CONN_MAX_AGE={settings_dict.get('CONN_MAX_AGE')})"
+        )
@@ -0,0 +1,52 @@
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import AccountDeletion
+from core.purge import delete_account, request_account_deletion
+
+
+class Command(BaseCommand):
+    """Django command to delete the accounts queued for deletion"""
+
+    help = ('Delete queued user accounts and everything they own in '
+            'chunks. Interrupted deletions resume on the next run')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'emails', nargs='*',
+            help='Queue these accounts for deletion first'
+        )
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between chunks to let other writers in'
+        )
+
+    def handle(self, *args, **options):
+        for email in options['emails']:
+            try:
+                user = get_user_model().objects.get(email=email)
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user with email {email}')
+            request_account_deletion(user)
+
+        pending = list(AccountDeletion.objects.order_by(
+            'requested_at'
+        ).values_list('user_id', flat=True))
+        for user_id in pending:
+            deleted = Counter()
+            files = size = 0
+            for chunk in delete_account(user_id, options['chunk_size']):
+                deleted += chunk[0]
+                files += chunk[1]
+                size += chunk[2]
+                if options['pause']:
+                    time.sleep(options['pause'])
+
+            self.stdout.write(self.style.SUCCESS(
+                f'User {user_id}: {sum(deleted.values())} rows deleted, '
+                f'{files} files removed, {size} bytes reclaimed'
+            ))
@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.idempotency import expire_idempotency_keys
+
+
+class Command(BaseCommand):
+    """Django command to delete expired idempotency keys in batches"""
+
+    help = ('Remove the responses stored for Idempotency-Key headers once '
+            'they are no longer replayed')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--older-than', type=float,
+            default=settings.IDEMPOTENCY_KEY_TTL_HOURS,
+            help='Only delete keys created this many hours ago'
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches to let other writers in'
+        )
+
+    def handle(self, *args, **options):
+        rows = batches = 0
+        for deleted in expire_idempotency_keys(
+                timedelta(hours=options['older_than']),
+                options['batch_size']):
+            batches += 1
+            rows += deleted
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} keys deleted in {batches} batches'
+        ))
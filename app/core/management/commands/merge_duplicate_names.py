@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from core.dedupe import merge_duplicates
+from core.summaries import refresh_summaries
+from core.sync import record_deletions, record_recipe_changes
+from core.usage import USAGE_RELATIONS, refresh_usage
+
+
+class Command(BaseCommand):
+    """Django command to merge tags and ingredients with the same name"""
+
+    help = ('Normalize the names of tags and ingredients written without '
+            'save(), merging those of a user whose names only differ in '
+            'case or spacing and moving their recipe links')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Duplicate groups merged per transaction')
+
+    def handle(self, *args, **options):
+        for model, through, field in USAGE_RELATIONS:
+            merged = renamed = 0
+            recipes = set()
+            for batch in merge_duplicates(model, through, field,
+                                          options['batch_size']):
+                merged += len(batch[0])
+                renamed += batch[1]
+                recipes.update(batch[2])
+                refresh_summaries(batch[2], create=False)
+                record_deletions(field, batch[0])
+                record_recipe_changes(batch[2])
+                # The rows keeping the moved links are among those linked
+                refresh_usage(model, through, field, through.objects.filter(
+                    recipe_id__in=batch[2]
+                ).values(f'{field}_id'))
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: {merged} duplicates '
+                f'merged, {renamed} names normalized, {len(recipes)} '
+                f'recipes relinked'
+            ))
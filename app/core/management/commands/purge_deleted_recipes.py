@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.purge import delete_files, orphaned_upload_files, \
+    purge_deleted_recipes
+
+
+class Command(BaseCommand):
+    """Django command to hard delete soft-deleted recipes in batches"""
+
+    help = ('Remove soft-deleted recipes, their links and images, and '
+            'recipe uploads no recipe refers to')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--older-than', type=float,
+            default=settings.RECIPE_PURGE_AFTER_HOURS,
+            help='Only purge recipes deleted this many hours ago'
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches to let other writers in'
+        )
+        parser.add_argument(
+            '--skip-orphans', action='store_true',
+            help='Do not look for unreferenced upload files'
+        )
+
+    def handle(self, *args, **options):
+        rows = files = size = batches = 0
+        for batch in purge_deleted_recipes(
+                timedelta(hours=options['older_than']),
+                options['batch_size']):
+            batches += 1
+            rows += batch[0]
+            files += batch[1]
+            size += batch[2]
+            self.stdout.write(f'Batch {batches}: {batch[0]} rows deleted')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        if not options['skip_orphans']:
+            removed, removed_size = delete_files(
+                orphaned_upload_files(batch_size=options['batch_size'])
+            )
+            files += removed
+            size += removed_size
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} rows deleted in {batches} batches, {files} files '
+            f'removed, {size} bytes reclaimed'
+        ))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from core.models import RecipeSummary
+from core.summaries import iter_recipe_id_batches, orphaned_summary_ids, \
+    refresh_summaries, verify_summaries
+
+
+class Command(BaseCommand):
+    """Django command to verify and rebuild the recipe summaries"""
+
+    help = 'Verify the denormalized recipe summaries and rebuild them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report the recipes with a wrong summary'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Rebuild every summary instead of only the wrong ones'
+        )
+
+    def handle(self, *args, **options):
+        checked = fixed = 0
+        for ids in iter_recipe_id_batches(options['batch_size']):
+            checked += len(ids)
+            if options['all'] and not options['verify']:
+                refresh_summaries(ids, options['batch_size'])
+                fixed += len(ids)
+                continue
+
+            wrong = verify_summaries(ids)
+            if wrong and not options['verify']:
+                refresh_summaries(wrong, options['batch_size'])
+            fixed += len(wrong)
+
+        orphans = orphaned_summary_ids()
+        if orphans and not options['verify']:
+            RecipeSummary.objects.filter(recipe_id__in=orphans).delete()
+
+        verb = 'wrong' if options['verify'] else 'rebuilt'
+        message = (f'{checked} recipes checked, {fixed} summaries {verb}, '
+                   f'{len(orphans)} orphaned summaries')
+        if options['verify'] and (fixed or orphans):
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
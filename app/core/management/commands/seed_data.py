@@ -0,0 +1,96 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.db import connection, connections
+from django.core.management.base import BaseCommand
+
+from core import seeding
+
+
+def _run_shard(args):
+    """Worker entry point, each process opens its own connection"""
+    connections.close_all()
+    return seeding.seed_shard(*args)
+
+
+class Command(BaseCommand):
+    """Django command to generate large, realistic data sets quickly"""
+
+    help = 'Generate users, tags, ingredients, recipes and their links'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes-per-user', type=int, default=100)
+        parser.add_argument('--tags-per-user', type=int, default=20)
+        parser.add_argument('--ingredients-per-user', type=int, default=60)
+        parser.add_argument('--max-tags', type=int, default=5,
+                            help='Maximum tags linked to a recipe')
+        parser.add_argument('--max-ingredients', type=int, default=12,
+                            help='Maximum ingredients linked to a recipe')
+        parser.add_argument('--password', default='seedpass123',
+                            help='Password shared by all generated users')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--shard-size', type=int, default=50,
+                            help='Users generated per unit of work')
+        parser.add_argument('--no-copy', dest='use_copy',
+                            action='store_false',
+                            help='Use bulk_create even on PostgreSQL')
+
+    def handle(self, *args, **options):
+        base_ids = seeding.next_ids()
+        # Hash once before forking so every worker reuses the result
+        seeding.password_hash(options['password'])
+
+        shard_size = max(1, options['shard_size'])
+        shards = [
+            (shard, first, min(first + shard_size, options['users']),
+             base_ids, options)
+            for shard, first in enumerate(
+                range(0, options['users'], shard_size)
+            )
+        ]
+
+        start = time.monotonic()
+        totals = dict.fromkeys(
+            ('users', 'tags', 'ingredients', 'recipes', 'links'), 0
+        )
+
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write('SQLite allows a single writer, using 1 worker')
+            workers = 1
+
+        if workers > 1:
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context('fork')
+            )
+            with executor:
+                futures = [executor.submit(_run_shard, shard)
+                           for shard in shards]
+                for future in as_completed(futures):
+                    self._progress(totals, future.result(), start)
+        else:
+            for shard in shards:
+                self._progress(totals, seeding.seed_shard(*shard), start)
+
+        if connection.vendor == 'postgresql':
+            seeding.reset_sequences()
+
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded ' + ', '.join(f'{v} {k}' for k, v in totals.items()) +
+            f' in {time.monotonic() - start:.1f}s'
+        ))
+
+    def _progress(self, totals, counts, start):
+        for key, value in counts.items():
+            totals[key] += value
+        elapsed = max(time.monotonic() - start, 1e-6)
+        rows = sum(totals.values())
+        self.stdout.write(
+            f"users {totals['users']}, recipes {totals['recipes']}, "
+            f"links {totals['links']} ({rows / elapsed:,.0f} rows/s)"
+        )
@@ -1,21 +1,50 @@
 import time
 
-from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from core.health import backoff_delays, check_database, check_migrations
 
 
 class Command(BaseCommand):
     """Django command to pause execution until database available"""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Give up after this many seconds'
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Upper bound of the delay between two probes'
+        )
+        parser.add_argument(
+            '--migrations', action='store_true',
+            help='Also wait until all migrations are applied'
+        )
+
     def handle(self, *args, **options):
         self.stdout.write("Waiting for database")
-        db_conn = None
-        while not db_conn:
+        deadline = time.monotonic() + options['timeout']
+        delays = backoff_delays(maximum=options['max_delay'])
+
+        while True:
             try:
-                db_conn = connections['default']
+                check_database()
+                if not options['migrations'] or check_migrations():
+                    break
+                reason = "Migrations not applied"
             except OperationalError:
-                self.stdout.write("Database not available. Wait for 1 second")
-                time.sleep(1)
+                reason = "Database not available"
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise CommandError(
+                    f"{reason} after {options['timeout']} seconds"
+                )
+
+            delay = min(next(delays), remaining)
+            self.stdout.write(f"{reason}. Wait for {delay:.2f} seconds")
+            time.sleep(delay)
 
         self.stdout.write(self.style.SUCCESS('Database Available'))
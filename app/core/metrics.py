@@ -0,0 +1,182 @@
+import threading
+import time
+from contextlib import contextmanager
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    """Timings collected while a sampled request is served"""
+
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.total_time = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+def current():
+    """Return the metrics of the request being sampled, if any"""
+    return getattr(_local, 'metrics', None)
+
+
+def activate(metrics):
+    _local.metrics = metrics
+
+
+def deactivate():
+    _local.metrics = None
+
+
+@contextmanager
+def serialization_timer():
+    """Add the time spent in the block to the serialization time"""
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += time.perf_counter() - start
+
+
+class MetricsRegistry:
+    """Process wide aggregation of the sampled request metrics per view"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, metrics):
+        with self._lock:
+            stats = self._views.setdefault(metrics.view, {
+                'requests': 0,
+                'queries': 0,
+                'db_seconds': 0.0,
+                'serialize_seconds': 0.0,
+                'total_seconds': 0.0,
+                'buckets': [0] * len(DURATION_BUCKETS),
+            })
+            stats['requests'] += 1
+            stats['queries'] += metrics.queries
+            stats['db_seconds'] += metrics.db_time
+            stats['serialize_seconds'] += metrics.serialize_time
+            stats['total_seconds'] += metrics.total_time
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if metrics.total_time <= bound:
+                    stats['buckets'][index] += 1
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: dict(stats, buckets=list(stats['buckets']))
+                for view, stats in self._views.items()
+            }
+
+    def render(self, sample_rate):
+        """Return the metrics in the Prometheus text exposition format"""
+        lines = [
+            '# HELP recipe_api_sample_rate Fraction of requests measured',
+            '# TYPE recipe_api_sample_rate gauge',
+            f'recipe_api_sample_rate {sample_rate}',
+        ]
+        counters = (
+            ('requests', 'recipe_api_requests_total',
+             'Sampled requests'),
+            ('queries', 'recipe_api_db_queries_total',
+             'SQL queries run by sampled requests'),
+            ('db_seconds', 'recipe_api_db_seconds_total',
+             'Time spent in SQL queries'),
+            ('serialize_seconds', 'recipe_api_serialize_seconds_total',
+             'Time spent serializing and rendering responses'),
+        )
+        snapshot = sorted(self.snapshot().items())
+
+        for key, name, help_text in counters:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for view, stats in snapshot:
+                lines.append(f'{name}{{view="{view}"}} {stats[key]}')
+
+        name = 'recipe_api_request_duration_seconds'
+        lines.append(f'# HELP {name} Total time spent serving requests')
+        lines.append(f'# TYPE {name} histogram')
+        for view, stats in snapshot:
+            for bound, count in zip(DURATION_BUCKETS, stats['buckets']):
+                lines.append(
+                    f'{name}_bucket{{view="{view}",le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'{name}_bucket{{view="{view}",le="+Inf"}} '
+                f'{stats["requests"]}'
+            )
+            lines.append(
+                f'{name}_sum{{view="{view}"}} {stats["total_seconds"]}'
+            )
+            lines.append(f'{name}_count{{view="{view}"}} {stats["requests"]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class TimedSerializer:
+    """
+    Stand-in for a serializer adding the time spent in its data property
+    to the serialization time, everything else goes to the serializer
+    """
+
+    def __init__(self, serializer):
+        object.__setattr__(self, 'serializer', serializer)
+
+    @property
+    def data(self):
+        with serialization_timer():
+            return self.serializer.data
+
+    def __getattr__(self, name):
+        return getattr(self.serializer, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.serializer, name, value)
+
+
+class SerializationTimingMixin:
+    """
+    Viewset mixin adding the time spent in serializer.data and in the
+    renderer to the serialization time of sampled requests
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if current() is not None:
+            return TimedSerializer(serializer)
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if current() is not None and hasattr(response, 'render'):
+            with serialization_timer():
+                response.render()
+        return response
@@ -0,0 +1,165 @@
+import gzip
+import random
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from core import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - exercised without brotli
+    brotli = None
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/|application/(json|javascript|xml)|image/svg)'
+)
+
+
+def view_label(request, view_func):
+    """Return a label like RecipeViewSet.list for the resolved view"""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unknown')
+
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure query count, DB time, serialization time and total time of a
+    sample of requests
+
+    Only METRICS_SAMPLE_RATE of the requests are measured, the others
+    pass through untouched. Measured requests get a Server-Timing header
+    and are aggregated per view for the /metrics endpoint.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        request_metrics = metrics.RequestMetrics()
+        metrics.activate(request_metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(
+                        request_metrics.record_query
+                    ))
+                response = self.get_response(request)
+        finally:
+            metrics.deactivate()
+
+        request_metrics.total_time = time.perf_counter() - start
+        if request_metrics.view is not None:
+            metrics.registry.observe(request_metrics)
+        response['Server-Timing'] = server_timing(request_metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request_metrics = metrics.current()
+        if request_metrics is not None:
+            request_metrics.view = view_label(request, view_func)
+
+
+def server_timing(request_metrics):
+    """Format the request metrics as a Server-Timing header value"""
+    return ', '.join([
+        f'db;dur={request_metrics.db_time * 1000:.2f};'
+        f'desc="{request_metrics.queries} queries"',
+        f'serialize;dur={request_metrics.serialize_time * 1000:.2f}',
+        f'total;dur={request_metrics.total_time * 1000:.2f}',
+    ])
+
+
+def accepted_encodings(header):
+    """Parse an Accept-Encoding header into {coding: quality}"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        match = re.search(r'q\s*=\s*([0-9.]+)', params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    """Return the best supported content coding for the client or None"""
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get('*', 0.0)
+    supported = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(content, coding):
+    if coding == 'br':
+        return brotli.compress(
+            content, quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+    return gzip.compress(
+        content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0
+    )
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli (when installed) or gzip, following
+    the client's Accept-Encoding preferences
+
+    Responses smaller than COMPRESSION_MIN_SIZE bytes, streaming or
+    already encoded responses and non textual content are sent as is.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (response.streaming or response.has_header('Content-Encoding') or
+                len(response.content) < settings.COMPRESSION_MIN_SIZE or
+                not COMPRESSIBLE_TYPES.match(
+                    response.get('Content-Type', ''))):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+
+        compressed = compress(response.content, coding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = coding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,67 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_summaries(apps, schema_editor):
+    """Build the summaries of the existing recipes"""
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeSummary = apps.get_model('core', 'RecipeSummary')
+
+    def related(through, target):
+        result = {}
+        for recipe_id, related_id, name in through.objects.order_by(
+                'recipe_id', f'{target}_id').values_list(
+                'recipe_id', f'{target}_id', f'{target}__name'):
+            ids, names = result.setdefault(recipe_id, ([], []))
+            ids.append(related_id)
+            names.append(name)
+        return result
+
+    tags = related(Recipe.tags.through, 'tag')
+    ingredients = related(Recipe.ingredients.through, 'ingredient')
+    summaries = []
+    for recipe in Recipe.objects.iterator():
+        tag_ids, tag_names = tags.get(recipe.id, ([], []))
+        ingredient_ids, ingredient_names = ingredients.get(recipe.id, ([], []))
+        summaries.append(RecipeSummary(
+            recipe_id=recipe.id, user_id=recipe.user_id, title=recipe.title,
+            time_minutes=recipe.time_minutes, price=recipe.price,
+            link=recipe.link, image=recipe.image.name or None,
+            tag_ids=tag_ids, tag_names=tag_names,
+            ingredient_ids=ingredient_ids, ingredient_names=ingredient_names,
+        ))
+    RecipeSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSummary',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='core.recipe')),
+                ('title', models.CharField(max_length=255)),
+                ('time_minutes', models.IntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('link', models.CharField(blank=True, max_length=255)),
+                ('image', models.CharField(max_length=100, null=True)),
+                ('tag_ids', models.JSONField(default=list)),
+                ('tag_names', models.JSONField(default=list)),
+                ('ingredient_ids', models.JSONField(default=list)),
+                ('ingredient_names', models.JSONField(default=list)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipesummary',
+            index=models.Index(fields=['user', 'recipe'], name='core_summary_user_recipe'),
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('checkpoint', models.BooleanField(default=False)),
+                ('data', models.JSONField()),
+                ('changed', models.JSONField(default=list)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('recipe', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='core.recipe')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='recipeversion',
+            constraint=models.UniqueConstraint(fields=('recipe', 'number'), name='core_version_recipe_number'),
+        ),
+    ]
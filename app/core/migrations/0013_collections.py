@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_accountdeletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Collection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CollectionRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.collection')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.recipe')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CollectionMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('read', 'Read'), ('write', 'Write')], default='read', max_length=5)),
+                ('collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='core.collection')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='collection',
+            name='recipes',
+            field=models.ManyToManyField(related_name='collections', through='core.CollectionRecipe', to='core.Recipe'),
+        ),
+        migrations.AddField(
+            model_name='collection',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='collectionrecipe',
+            constraint=models.UniqueConstraint(fields=('collection', 'recipe'), name='core_collection_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='collectionmember',
+            constraint=models.UniqueConstraint(fields=('user', 'collection'), name='core_member_user_collection'),
+        ),
+    ]
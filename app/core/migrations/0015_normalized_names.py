@@ -0,0 +1,170 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:16
+
+from collections import defaultdict
+
+from django.db import migrations, models, transaction
+from django.db.models import Case, Value, When
+
+
+def normalize_name(name):
+    # core.models.normalize_name as of this migration
+    return ' '.join(name.split()).casefold()
+
+
+def merge_into(model, through, field, replacements, using):
+    """
+    Repoint the recipe links of the rows in replacements, {id: id of the
+    row replacing it}, to their keeper and delete the rows. Returns the
+    ids of the recipes whose links changed.
+    """
+    links = through._base_manager.using(using)
+    column = f'{field}_id'
+    moved = list(links.filter(**{f'{column}__in': list(replacements)})
+                 .order_by('id').values_list('id', 'recipe_id', column))
+    recipes = {recipe_id for _, recipe_id, _ in moved}
+    linked = set(links.filter(
+        recipe_id__in=recipes,
+        **{f'{column}__in': set(replacements.values())}
+    ).values_list('recipe_id', column))
+    colliding = []
+    for pk, recipe_id, target_id in moved:
+        key = (recipe_id, replacements[target_id])
+        if key in linked:
+            colliding.append(pk)
+        else:
+            linked.add(key)
+    links.filter(id__in=colliding)._raw_delete(using)
+    if len(colliding) < len(moved):
+        links.filter(**{f'{column}__in': list(replacements)}).update(**{
+            column: Case(*(
+                When(**{column: pk}, then=Value(keeper))
+                for pk, keeper in replacements.items()
+            ))
+        })
+    model._base_manager.using(using).filter(
+        id__in=list(replacements)
+    )._raw_delete(using)
+    return recipes
+
+
+def merge_duplicates(model, through, field, using, batch_size=1000):
+    """
+    Fill the normalized names of model and merge the rows of a user whose
+    names normalize alike into the oldest one, a batch of rows in id
+    order at a time. Yields the ids of the recipes whose links changed.
+    """
+    rows = model._base_manager.using(using)
+    last_id = 0
+    while True:
+        batch = list(rows.filter(id__gt=last_id).order_by('id').values_list(
+            'id', 'user_id', 'name', 'normalized_name'
+        )[:batch_size])
+        if not batch:
+            return
+        last_id = batch[-1][0]
+
+        groups = defaultdict(set)
+        stale = set()
+        for pk, user_id, name, stored in batch:
+            if normalize_name(name) != stored:
+                groups[(user_id, normalize_name(name))].add(pk)
+                stale.add(pk)
+        if not groups:
+            continue
+
+        with transaction.atomic(using=using):
+            # Rows of earlier batches already holding one of the names
+            for pk, user_id, stored in rows.filter(
+                    user_id__in={user_id for user_id, _ in groups},
+                    normalized_name__in={name for _, name in groups},
+            ).values_list('id', 'user_id', 'normalized_name'):
+                if (user_id, stored) in groups:
+                    groups[(user_id, stored)].add(pk)
+
+            keepers = {key: min(ids) for key, ids in groups.items()}
+            replacements = {
+                pk: keepers[key]
+                for key, ids in groups.items() for pk in ids
+                if pk != keepers[key]
+            }
+            recipes = set()
+            if replacements:
+                recipes = merge_into(model, through, field, replacements,
+                                     using)
+            rows.bulk_update([
+                model(id=keeper, normalized_name=name)
+                for (_, name), keeper in keepers.items() if keeper in stale
+            ], ['normalized_name'])
+        yield sorted(recipes)
+
+
+def refresh_summary_links(apps, recipe_ids, relation, target):
+    """Recompute the copied ids and names of one relation of recipes"""
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeSummary = apps.get_model('core', 'RecipeSummary')
+    through = getattr(Recipe, relation).through
+
+    links = {recipe_id: ([], []) for recipe_id in recipe_ids}
+    for recipe_id, related_id, name in through.objects.filter(
+            recipe_id__in=recipe_ids).order_by(
+            'recipe_id', f'{target}_id').values_list(
+            'recipe_id', f'{target}_id', f'{target}__name'):
+        links[recipe_id][0].append(related_id)
+        links[recipe_id][1].append(name)
+
+    summaries = list(RecipeSummary.objects.filter(recipe_id__in=recipe_ids))
+    for summary in summaries:
+        ids, names = links[summary.recipe_id]
+        setattr(summary, f'{target}_ids', ids)
+        setattr(summary, f'{target}_names', names)
+    RecipeSummary.objects.bulk_update(
+        summaries, [f'{target}_ids', f'{target}_names']
+    )
+
+
+def normalize_and_merge(apps, schema_editor):
+    """Fill the normalized names and merge the existing duplicates"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for name, relation in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        target = name.lower()
+        for recipe_ids in merge_duplicates(
+                apps.get_model('core', name),
+                getattr(Recipe, relation).through, target,
+                schema_editor.connection.alias):
+            if recipe_ids:
+                refresh_summary_links(apps, recipe_ids, relation, target)
+    if schema_editor.connection.vendor == 'postgresql':
+        # The merge deleted rows behind deferred foreign keys, PostgreSQL
+        # refuses to alter the tables while their checks are pending
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=120),
+            preserve_default=False,
+        ),
+        migrations.RunPython(normalize_and_merge, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'normalized_name'), name='core_ingredient_user_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'normalized_name'), name='core_tag_user_name'),
+        ),
+    ]
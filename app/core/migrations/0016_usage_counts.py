@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:25
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_usage(apps, schema_editor):
+    """Count the links of live recipes of every tag and ingredient"""
+    Recipe = apps.get_model('core', 'Recipe')
+    using = schema_editor.connection.alias
+    for name, through, field in (
+            ('Tag', Recipe.tags.through, 'tag'),
+            ('Ingredient', Recipe.ingredients.through, 'ingredient')):
+        links = through.objects.using(using).filter(
+            **{field: OuterRef('pk')}, recipe__deleted_at__isnull=True
+        ).values(field).annotate(links=Count('*')).values('links')
+        apps.get_model('core', name).objects.using(using).update(
+            usage=Coalesce(Subquery(links), Value(0))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_normalized_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='usage',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='usage',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_usage, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-usage'], name='core_ingredient_usage'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-usage'], name='core_tag_usage'),
+        ),
+    ]
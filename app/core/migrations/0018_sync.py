@@ -0,0 +1,76 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def log_existing(apps, schema_editor):
+    """Start the change logs with an entry per existing object"""
+    Change = apps.get_model('core', 'Change')
+    using = schema_editor.connection.alias
+    for name, kind in (('Tag', 'tag'), ('Ingredient', 'ingredient'),
+                       ('Recipe', 'recipe')):
+        rows = apps.get_model('core', name)._base_manager.using(using)
+        if name == 'Recipe':
+            rows = rows.filter(deleted_at__isnull=True)
+        last_id = 0
+        while True:
+            batch = list(rows.filter(id__gt=last_id).order_by('id')
+                         .values_list('id', 'user_id')[:1000])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            Change.objects.using(using).bulk_create(
+                Change(user_id=user_id, kind=kind, object_id=pk)
+                for pk, user_id in batch
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('recipe', 'Recipe'), ('tag', 'Tag'), ('ingredient', 'Ingredient')], max_length=10)),
+                ('object_id', models.IntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(log_existing, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user', 'id'], name='core_change_user_id'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user', 'kind', 'object_id'], name='core_change_object'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(condition=models.Q(('deleted', True)), fields=['created'], name='core_change_tombstone'),
+        ),
+    ]
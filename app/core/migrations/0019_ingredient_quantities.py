@@ -0,0 +1,119 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# code, name, dimension, base units (g, ml, pieces) per unit
+UNITS = (
+    ('mg', 'milligram', 'mass', 0.001),
+    ('g', 'gram', 'mass', 1),
+    ('kg', 'kilogram', 'mass', 1000),
+    ('oz', 'ounce', 'mass', 28.349523125),
+    ('lb', 'pound', 'mass', 453.59237),
+    ('ml', 'millilitre', 'volume', 1),
+    ('l', 'litre', 'volume', 1000),
+    ('tsp', 'teaspoon', 'volume', 4.92892159375),
+    ('tbsp', 'tablespoon', 'volume', 14.78676478125),
+    ('fl_oz', 'fluid ounce', 'volume', 29.5735295625),
+    ('cup', 'cup', 'volume', 236.5882365),
+    ('pint', 'pint', 'volume', 473.176473),
+    ('piece', 'piece', 'count', 1),
+    ('dozen', 'dozen', 'count', 12),
+)
+
+
+def add_units(apps, schema_editor):
+    Unit = apps.get_model('core', 'Unit')
+    Unit.objects.using(schema_editor.connection.alias).bulk_create(
+        Unit(code=code, name=name, dimension=dimension, factor=factor)
+        for code, name, dimension, factor in UNITS
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Unit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('name', models.CharField(max_length=60)),
+                ('dimension', models.CharField(choices=[('mass', 'Mass'), ('volume', 'Volume'), ('count', 'Count')], max_length=10)),
+                ('factor', models.FloatField()),
+            ],
+        ),
+        migrations.RunPython(add_units, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='ingredient',
+            name='calories',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='carbohydrates',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='cost_per_kg',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='fat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='grams_per_ml',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='grams_per_piece',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='protein',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        # The existing link table becomes the through model, only the
+        # new columns are added to it
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='RecipeIngredient',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.ingredient')),
+                        ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.recipe')),
+                    ],
+                    options={
+                        'db_table': 'core_recipe_ingredients',
+                        'unique_together': {('recipe', 'ingredient')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='ingredients',
+                    field=models.ManyToManyField(through='core.RecipeIngredient', to='core.Ingredient'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='quantity',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='core.unit'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:02
+
+import django.core.validators
+from django.db import migrations, models
+
+SYSTEMS = {
+    'metric': ('mg', 'g', 'kg', 'ml', 'l'),
+    'us': ('oz', 'lb', 'tsp', 'tbsp', 'fl_oz', 'cup', 'pint'),
+}
+
+
+def set_systems(apps, schema_editor):
+    Unit = apps.get_model('core', 'Unit')
+    units = Unit.objects.using(schema_editor.connection.alias)
+    for system, codes in SYSTEMS.items():
+        units.filter(code__in=codes).update(system=system)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_ingredient_quantities'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='servings',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='recipesummary',
+            name='servings',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='unit',
+            name='system',
+            field=models.CharField(blank=True, choices=[('metric', 'Metric'), ('us', 'US customary')], max_length=10),
+        ),
+        migrations.RunPython(set_systems, migrations.RunPython.noop),
+    ]
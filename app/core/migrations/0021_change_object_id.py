@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_units_servings'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='change',
+            name='object_id',
+            field=models.BigIntegerField(),
+        ),
+    ]
@@ -4,6 +4,9 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import MinValueValidator
+from django.utils import timezone
 
 
 def recipe_image_file_path(instance, filename: str):
@@ -14,6 +17,11 @@ def recipe_image_file_path(instance, filename: str):
     return os.path.join('uploads/recipe/', filename)
 
 
+def normalize_name(name: str):
+    """Return the form of a name duplicates are detected by"""
+    return ' '.join(name.split()).casefold()
+
+
 class UserManager(BaseUserManager):
 
     def create_user(self, email, password=None, **extra_fields):
@@ -54,14 +62,31 @@ class Tag(models.Model):
     Tag to be used for a model
     """
     name = models.CharField(max_length=120)
+    normalized_name = models.CharField(max_length=120, editable=False)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # Number of live recipes linked, kept by signals
+    usage = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'normalized_name'],
+                                    name='core_tag_user_name'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-usage'], name='core_tag_usage'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
 
 class Ingredient(models.Model):
     """
@@ -69,14 +94,91 @@ class Ingredient(models.Model):
     """
 
     name = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255, editable=False)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # Number of live recipes linked, kept by signals
+    usage = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Nutrition per 100 g and cost per kg, for the recipe rollups
+    calories = models.FloatField(null=True, blank=True)
+    protein = models.FloatField(null=True, blank=True)
+    fat = models.FloatField(null=True, blank=True)
+    carbohydrates = models.FloatField(null=True, blank=True)
+    cost_per_kg = models.DecimalField(max_digits=8, decimal_places=2,
+                                      null=True, blank=True)
+    # Weights converting quantities in volume or count units to grams
+    grams_per_ml = models.FloatField(null=True, blank=True)
+    grams_per_piece = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'normalized_name'],
+                                    name='core_ingredient_user_name'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-usage'],
+                         name='core_ingredient_usage'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
+
+class Unit(models.Model):
+    """
+    Unit of the quantities of ingredients, factor converting it to the
+    base unit of its dimension: grams, millilitres or pieces, and the
+    system of units it belongs to if any
+    """
+
+    MASS = 'mass'
+    VOLUME = 'volume'
+    COUNT = 'count'
+    DIMENSIONS = (
+        (MASS, 'Mass'),
+        (VOLUME, 'Volume'),
+        (COUNT, 'Count'),
+    )
+    METRIC = 'metric'
+    US = 'us'
+    SYSTEMS = (
+        (METRIC, 'Metric'),
+        (US, 'US customary'),
+    )
+
+    code = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=60)
+    dimension = models.CharField(max_length=10, choices=DIMENSIONS)
+    factor = models.FloatField()
+    system = models.CharField(max_length=10, choices=SYSTEMS, blank=True)
+
+    def __str__(self):
+        return self.code
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def accessible_to(self, user, write=False):
+        """Recipes the user owns or can read, or write, through sharing"""
+        return self.filter(
+            models.Q(user=user) |
+            models.Q(id__in=CollectionRecipe.objects.shared_with(user, write))
+        )
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+    """Manager hiding soft-deleted recipes"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Recipe(models.Model):
     """
@@ -90,10 +192,320 @@ class Recipe(models.Model):
     title = models.CharField(max_length=255)
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
+    # Servings the ingredient quantities make, if known
+    servings = models.PositiveSmallIntegerField(
+        null=True, blank=True, validators=[MinValueValidator(1)]
+    )
     link = models.CharField(max_length=255, blank=True)
-    ingredients = models.ManyToManyField('Ingredient')
+    ingredients = models.ManyToManyField('Ingredient',
+                                         through='RecipeIngredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    published = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'],
+                         condition=models.Q(deleted_at__isnull=False),
+                         name='core_recipe_deleted_at'),
+            # The per author ranges merged into the feeds
+            models.Index(fields=['user', 'id'],
+                         condition=models.Q(published=True,
+                                            deleted_at__isnull=True),
+                         name='core_recipe_published'),
+        ]
 
     def __str__(self):
         return self.title
+
+    def soft_delete(self):
+        """Hide the recipe until purge_deleted_recipes removes it"""
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at'])
+
+
+class RecipeIngredient(models.Model):
+    """
+    Link of a recipe to an ingredient, with the quantity used if known
+    """
+
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=9, decimal_places=3,
+                                   null=True, blank=True)
+    unit = models.ForeignKey(Unit, on_delete=models.PROTECT, null=True,
+                             blank=True)
+
+    class Meta:
+        # The table of the links from before quantities were kept
+        db_table = 'core_recipe_ingredients'
+        unique_together = [('recipe', 'ingredient')]
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.ingredient_id}'
+
+
+class RecipeSummary(models.Model):
+    """
+    Denormalized read model of a recipe used by list views, holding the
+    tag and ingredient ids and names so no join is needed
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='summary'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    title = models.CharField(max_length=255)
+    time_minutes = models.IntegerField()
+    price = models.DecimalField(max_digits=5, decimal_places=2)
+    servings = models.PositiveSmallIntegerField(null=True)
+    link = models.CharField(max_length=255, blank=True)
+    image = models.CharField(max_length=100, null=True)
+    tag_ids = models.JSONField(default=list)
+    tag_names = models.JSONField(default=list)
+    ingredient_ids = models.JSONField(default=list)
+    ingredient_names = models.JSONField(default=list)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'recipe'],
+                         name='core_summary_user_recipe'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class RecipeVersion(models.Model):
+    """
+    One saved version of a recipe. Checkpoints hold the full state,
+    other versions only the fields and relation ids that changed
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='versions',
+        db_index=False
+    )
+    number = models.PositiveIntegerField()
+    checkpoint = models.BooleanField(default=False)
+    data = models.JSONField()
+    changed = models.JSONField(default=list)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'number'],
+                                    name='core_version_recipe_number'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} v{self.number}'
+
+
+class AccountDeletion(models.Model):
+    """
+    User account waiting to be deleted by delete_accounts, removed
+    together with the user
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='deletion'
+    )
+    requested_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class Collection(models.Model):
+    """
+    Named set of recipes its owner can share with other users
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    name = models.CharField(max_length=255)
+    recipes = models.ManyToManyField('Recipe', through='CollectionRecipe',
+                                     related_name='collections')
+
+    def __str__(self):
+        return self.name
+
+
+class CollectionRecipeQuerySet(models.QuerySet):
+
+    def shared_with(self, user, write=False):
+        """Ids of the recipes shared with the user, as a subquery"""
+        members = CollectionMember.objects.filter(user=user)
+        if write:
+            members = members.filter(level=CollectionMember.WRITE)
+        return self.filter(
+            collection_id__in=members.values('collection_id')
+        ).values('recipe_id')
+
+
+class CollectionRecipe(models.Model):
+    """
+    Recipe in a collection
+    """
+
+    collection = models.ForeignKey(Collection, on_delete=models.CASCADE)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+
+    objects = CollectionRecipeQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['collection', 'recipe'],
+                                    name='core_collection_recipe'),
+        ]
+
+
+class CollectionMember(models.Model):
+    """
+    User a collection is shared with, at read or write level
+    """
+
+    READ = 'read'
+    WRITE = 'write'
+    LEVELS = ((READ, 'Read'), (WRITE, 'Write'))
+
+    collection = models.ForeignKey(
+        Collection,
+        on_delete=models.CASCADE,
+        related_name='members'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    level = models.CharField(max_length=5, choices=LEVELS, default=READ)
+
+    class Meta:
+        constraints = [
+            # Leads with user, it is the index of every access check
+            models.UniqueConstraint(fields=['user', 'collection'],
+                                    name='core_member_user_collection'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.level} {self.collection_id}'
+
+
+class Follow(models.Model):
+    """
+    User following the published recipes of another user
+    """
+
+    follower = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='following',
+        db_index=False
+    )
+    followee = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='followers'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followee'],
+                                    name='core_follow_follower_followee'),
+        ]
+
+    def __str__(self):
+        return f'{self.follower_id} follows {self.followee_id}'
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response stored for a user's Idempotency-Key, replayed to retries.
+    status is null while the first request is still running, since
+    claimed_at.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status = models.PositiveSmallIntegerField(null=True)
+    data = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    claimed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'],
+                                    name='core_idempotency_user_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.key}'
+
+
+class Change(models.Model):
+    """
+    Entry of a user's change log read by offline clients to sync, the
+    id being the change token. A tombstone records a deletion.
+    """
+
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    KINDS = (
+        (RECIPE, 'Recipe'),
+        (TAG, 'Tag'),
+        (INGREDIENT, 'Ingredient'),
+    )
+
+    # Without a constraint, the tombstones logged while a user is being
+    # deleted do not block it, they are pruned like the others
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+        db_constraint=False
+    )
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='core_change_user_id'),
+            # Finds the superseded entries when compacting
+            models.Index(fields=['user', 'kind', 'object_id'],
+                         name='core_change_object'),
+            models.Index(fields=['created'], condition=models.Q(deleted=True),
+                         name='core_change_tombstone'),
+        ]
+
+    def __str__(self):
+        return f'{self.id} {self.kind} {self.object_id}'
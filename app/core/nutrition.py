@@ -0,0 +1,140 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, \
+    When
+from django.db.models.functions import Cast
+
+from core.models import RecipeIngredient, Unit
+
+NUTRIENTS = ('calories', 'protein', 'fat', 'carbohydrates')
+
+GENERATION_KEY = 'nutrition:generation'
+
+
+def _float(name):
+    return Cast(F(name), FloatField())
+
+
+def grams():
+    """Expression of the grams of ingredient a link stands for, or NULL"""
+    amount = _float('quantity') * F('unit__factor')
+    return Case(
+        When(unit__dimension=Unit.MASS, then=amount),
+        When(unit__dimension=Unit.VOLUME,
+             then=amount * F('ingredient__grams_per_ml')),
+        When(unit__dimension=Unit.COUNT,
+             then=amount * F('ingredient__grams_per_piece')),
+        output_field=FloatField(),
+    )
+
+
+def compute_rollups(recipe_ids):
+    """
+    Return {recipe id: totals} of the recipes, one aggregate query for
+    them all
+
+    Links whose grams, nutrition or cost are unknown count as missing,
+    the totals then only cover the other links.
+    """
+    weight = grams()
+    # Links with everything needed for their share of the totals
+    known = Q(
+        quantity__isnull=False, ingredient__cost_per_kg__isnull=False,
+        **{f'ingredient__{name}__isnull': False for name in NUTRIENTS}
+    ) & (
+        Q(unit__dimension=Unit.MASS) |
+        Q(unit__dimension=Unit.VOLUME,
+          ingredient__grams_per_ml__isnull=False) |
+        Q(unit__dimension=Unit.COUNT,
+          ingredient__grams_per_piece__isnull=False)
+    )
+    totals = {
+        name: Sum(weight * F(f'ingredient__{name}') / Value(100.0))
+        for name in NUTRIENTS
+    }
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values('recipe_id').annotate(
+        grams=Sum(weight),
+        cost=Sum(weight * _float('ingredient__cost_per_kg') / Value(1000.0)),
+        links=Count('id'),
+        known=Count('id', filter=known),
+        **totals,
+    ).order_by()
+
+    rollups = {pk: empty_rollup() for pk in recipe_ids}
+    for row in rows:
+        rollup = {
+            name: round(row[name] or 0, 1) for name in ('grams',) + NUTRIENTS
+        }
+        rollup['cost'] = f'{row["cost"] or 0:.2f}'
+        rollup['missing'] = row['links'] - row['known']
+        rollups[row['recipe_id']] = rollup
+    return rollups
+
+
+def empty_rollup():
+    rollup = dict.fromkeys(('grams',) + NUTRIENTS, 0)
+    rollup.update(cost='0.00', missing=0)
+    return rollup
+
+
+def scale_rollup(rollup, ratio):
+    """Return the totals of a rollup for ratio times the quantities"""
+    scaled = {
+        name: round(rollup[name] * ratio, 1)
+        for name in ('grams',) + NUTRIENTS
+    }
+    scaled['cost'] = f'{float(rollup["cost"]) * ratio:.2f}'
+    scaled['missing'] = rollup['missing']
+    return scaled
+
+
+def generation():
+    """
+    Return the token of the unit table, part of every cached rollup key
+    so changing a unit drops them all
+
+    Like the rollups it lives in the default cache, which must be shared
+    by all processes for the invalidations to reach them (core.E002).
+    """
+    token = cache.get(GENERATION_KEY)
+    if token is None:
+        cache.add(GENERATION_KEY, uuid.uuid4().hex, None)
+        token = cache.get(GENERATION_KEY)
+    return token
+
+
+def rollup_key(token, recipe_id):
+    return f'nutrition:{token}:{recipe_id}'
+
+
+def recipe_rollups(recipe_ids):
+    """
+    Return {recipe id: totals} of the recipes, reading the cache first
+    and computing the others in one query
+    """
+    token = generation()
+    keys = {rollup_key(token, pk): pk for pk in recipe_ids}
+    rollups = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    missing = [pk for pk in recipe_ids if pk not in rollups]
+    if missing:
+        computed = compute_rollups(missing)
+        cache.set_many({
+            rollup_key(token, pk): value for pk, value in computed.items()
+        }, settings.NUTRITION_CACHE_TIMEOUT)
+        rollups.update(computed)
+    return rollups
+
+
+def invalidate_rollups(recipe_ids):
+    """Drop the cached rollups of recipes whose links or data changed"""
+    if recipe_ids:
+        token = generation()
+        cache.delete_many([rollup_key(token, pk) for pk in recipe_ids])
+
+
+def invalidate_all_rollups():
+    cache.delete(GENERATION_KEY)
@@ -0,0 +1,197 @@
+import random
+import time
+from array import array
+from collections import defaultdict
+from itertools import chain
+
+from core.models import RecipeSummary
+
+
+class PlanNotFound(Exception):
+    """No plan meets the constraints, or none was found within the caps"""
+
+    def __init__(self, timed_out):
+        super().__init__(timed_out)
+        self.timed_out = timed_out
+
+
+class Candidates:
+    """
+    The recipes a plan can pick from, one entry per recipe in compact
+    arrays: id, minutes, price in cents, and a bit mask of the quota
+    tags the recipe carries
+    """
+
+    def __init__(self, rows, quota_tags=()):
+        bits = {tag: 1 << position for position, tag in enumerate(quota_tags)}
+        self.ids = array('q')
+        self.times = array('q')
+        self.prices = array('q')
+        self.masks = array('Q')
+        for pk, minutes, price, tag_ids in rows:
+            self.ids.append(pk)
+            self.times.append(minutes)
+            self.prices.append(int(price * 100))
+            mask = 0
+            for tag in tag_ids:
+                mask |= bits.get(tag, 0)
+            self.masks.append(mask)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def load_candidates(user, max_time=None, max_price=None, exclude_tags=(),
+                    quota_tags=()):
+    """
+    Read the user's recipes fitting the per meal limits into
+    Candidates, in one query on the summaries
+    """
+    summaries = RecipeSummary.objects.filter(user=user)
+    if max_time is not None:
+        summaries = summaries.filter(time_minutes__lte=max_time)
+    if max_price is not None:
+        summaries = summaries.filter(price__lte=max_price)
+    excluded = set(exclude_tags)
+    rows = (
+        row for row in summaries.order_by('recipe_id').values_list(
+            'recipe_id', 'time_minutes', 'price', 'tag_ids'
+        ).iterator()
+        if not excluded.intersection(row[3])
+    )
+    return Candidates(rows, quota_tags)
+
+
+def plan_meals(candidates, days, meals_per_day, daily_time=None,
+               daily_price=None, quotas=(), repeat_after_days=None, seed=0,
+               time_limit=None, max_steps=None):
+    """
+    Pick meals_per_day candidates for each of days so that every day
+    stays within daily_time minutes and daily_price cents, quotas[i]
+    meals carry the i-th quota tag, and a recipe comes back no sooner
+    than repeat_after_days, never if None
+
+    Depth first search filling the meals in order. Each meal tries the
+    candidates within their share of the day's budgets before the
+    others, each time those carrying the most quota tags still needed
+    first, in an order shuffled by seed so a seed always gives the same
+    plan. Choices that can no longer leave room for the
+    cheapest and quickest meals of the day, or for the quotas, are cut,
+    and unused candidates alike in time, price and tags are tried once.
+
+    Gives up after max_steps meals placed, which keeps results
+    reproducible, or time_limit seconds. Returns the recipe ids per
+    day, raises PlanNotFound otherwise.
+    """
+    count = len(candidates)
+    slots = days * meals_per_day
+    gap = repeat_after_days or days
+    times, prices, masks = candidates.times, candidates.prices, \
+        candidates.masks
+    needed = list(quotas)
+    if count == 0:
+        raise PlanNotFound(False)
+
+    # A quota more than its candidates can ever cover is hopeless
+    uses = -(-days // gap)
+    for position, quota in enumerate(needed):
+        tagged = sum(1 for mask in masks if mask >> position & 1)
+        if tagged * uses < quota:
+            raise PlanNotFound(False)
+
+    order = list(range(count))
+    random.Random(seed).shuffle(order)
+    by_mask = defaultdict(list)
+    for index in order:
+        by_mask[masks[index]].append(index)
+    min_time = min(times)
+    min_price = min(prices)
+    day_time = daily_time if daily_time is not None else float('inf')
+    day_price = daily_price if daily_price is not None else float('inf')
+
+    last_day = [None] * count
+    chosen = []
+    steps = 0
+    deadline = time.monotonic() + time_limit if time_limit else None
+
+    def unmet_mask():
+        mask = 0
+        for position, need in enumerate(needed):
+            if need > 0:
+                mask |= 1 << position
+        return mask
+
+    def ordered(unmet):
+        if not unmet:
+            return order
+        groups = sorted(by_mask.items(),
+                        key=lambda item: -bin(item[0] & unmet).count('1'))
+        return chain.from_iterable(indexes for _, indexes in groups)
+
+    def search(slot, time_left, price_left):
+        nonlocal steps
+        if slot == slots:
+            return True
+        steps += 1
+        if max_steps is not None and steps > max_steps or \
+                deadline is not None and time.monotonic() > deadline:
+            raise PlanNotFound(True)
+        day, meal = divmod(slot, meals_per_day)
+        if meal == 0:
+            time_left, price_left = day_time, day_price
+        meals_after = meals_per_day - meal - 1
+        slots_after = slots - slot - 1
+        time_share = time_left / (meals_after + 1)
+        price_share = price_left / (meals_after + 1)
+        unmet = unmet_mask()
+        tried = set()
+        # Meals within their share of the day's budgets go first, they
+        # rarely starve the meals after them
+        for within_share in (True, False):
+            for index in ordered(unmet):
+                minutes, cents = times[index], prices[index]
+                if (minutes <= time_share and cents <= price_share) == \
+                        within_share and place(index, day, meals_after,
+                                               slots_after, time_left,
+                                               price_left, tried):
+                    return True
+        return False
+
+    def place(index, day, meals_after, slots_after, time_left, price_left,
+              tried):
+        """Try the candidate for the meal, and the meals after it"""
+        used = last_day[index]
+        if used is not None and day - used < gap:
+            return False
+        minutes, cents, mask = times[index], prices[index], masks[index]
+        if time_left - minutes < meals_after * min_time or \
+                price_left - cents < meals_after * min_price:
+            return False
+        signature = (minutes, cents, mask)
+        if used is None:
+            if signature in tried:
+                return False
+            tried.add(signature)
+
+        for position in range(len(needed)):
+            if mask >> position & 1:
+                needed[position] -= 1
+        if max(needed, default=0) <= slots_after:
+            last_day[index] = day
+            chosen.append(index)
+            if search(len(chosen), time_left - minutes, price_left - cents):
+                return True
+            chosen.pop()
+            last_day[index] = used
+        for position in range(len(needed)):
+            if mask >> position & 1:
+                needed[position] += 1
+        return False
+
+    if not search(0, day_time, day_price):
+        raise PlanNotFound(False)
+    ids = candidates.ids
+    return [
+        [ids[index] for index in chosen[start:start + meals_per_day]]
+        for start in range(0, slots, meals_per_day)
+    ]
@@ -0,0 +1,201 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import models, router, transaction
+from django.utils import timezone
+
+from core.models import AccountDeletion, Ingredient, Recipe, \
+    RecipeVersion, Tag
+
+RECIPE_UPLOAD_DIR = 'uploads/recipe/'
+
+
+def delete_rows(model, using=None, **filters):
+    """
+    Delete the rows matching the filters and everything depending on
+    them with one DELETE per table, without loading the rows or sending
+    delete signals
+
+    Returns a Counter of the rows deleted per model label.
+    """
+    using = using or router.db_for_write(model)
+    queryset = model._base_manager.using(using).filter(**filters)
+    deleted = Counter()
+
+    dependents = [
+        rel for rel in model._meta.related_objects
+        if rel.many_to_many or rel.on_delete is not models.DO_NOTHING
+    ]
+    if dependents or model._meta.many_to_many:
+        if list(filters) == ['pk__in']:
+            pks = list(filters['pk__in'])
+        else:
+            pks = list(queryset.values_list('pk', flat=True))
+        if not pks:
+            return deleted
+        queryset = model._base_manager.using(using).filter(pk__in=pks)
+
+        # Explicit through models are reached through their foreign keys
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            if through._meta.auto_created:
+                deleted += delete_rows(
+                    through, using, **{f'{field.m2m_field_name()}__in': pks}
+                )
+        for rel in dependents:
+            if rel.many_to_many and not rel.through._meta.auto_created:
+                continue
+            elif rel.many_to_many:
+                through = rel.through
+                deleted += delete_rows(
+                    through, using,
+                    **{f'{rel.field.m2m_reverse_field_name()}__in': pks}
+                )
+            elif rel.on_delete is models.CASCADE:
+                deleted += delete_rows(
+                    rel.related_model, using,
+                    **{f'{rel.field.name}__in': pks}
+                )
+            elif rel.on_delete is models.SET_NULL:
+                rel.related_model._base_manager.using(using).filter(
+                    **{f'{rel.field.name}__in': pks}
+                ).update(**{rel.field.name: None})
+            else:
+                raise ValueError(
+                    f'{rel.related_model._meta.label}.{rel.field.name} '
+                    f'blocks deleting {model._meta.label}'
+                )
+
+    count = queryset._raw_delete(using)
+    if count:
+        deleted[model._meta.label] += count
+    return deleted
+
+
+def delete_files(names):
+    """Delete stored files, returning the number removed and their bytes"""
+    removed = size = 0
+    for name in names:
+        try:
+            file_size = default_storage.size(name)
+            default_storage.delete(name)
+        except OSError:
+            continue
+        removed += 1
+        size += file_size
+    return removed, size
+
+
+def delete_in_chunks(queryset, chunk_size=500, file_field=None):
+    """
+    Hard delete the rows of a queryset chunk by chunk in primary key
+    order, each chunk in its own transaction, so an interrupted run can
+    simply be started again
+
+    The files of file_field are deleted once their chunk is committed.
+    Yields (Counter of rows deleted, files removed, bytes reclaimed)
+    per chunk.
+    """
+    model = queryset.model
+    using = queryset.db
+    columns = ('pk', file_field) if file_field else ('pk',)
+    while True:
+        chunk = list(
+            queryset.order_by('pk').values_list(*columns)[:chunk_size]
+        )
+        if not chunk:
+            return
+
+        with transaction.atomic(using=using):
+            deleted = delete_rows(model, using,
+                                  pk__in=[row[0] for row in chunk])
+        removed, size = delete_files(
+            row[1] for row in chunk if file_field and row[1]
+        )
+        yield deleted, removed, size
+
+
+def purge_deleted_recipes(older_than, batch_size=500):
+    """
+    Hard delete recipes soft-deleted at least older_than ago in batches,
+    together with their image files
+
+    Yields (rows deleted, files removed, bytes reclaimed) per batch.
+    """
+    cutoff = timezone.now() - older_than
+    recipes = Recipe.all_objects.db_manager(
+        router.db_for_write(Recipe)
+    ).filter(deleted_at__lte=cutoff)
+    for deleted, removed, size in delete_in_chunks(recipes, batch_size,
+                                                   'image'):
+        yield sum(deleted.values()), removed, size
+
+
+def request_account_deletion(user):
+    """
+    Deactivate a user and queue the account for delete_accounts, which
+    removes it with everything it owns
+    """
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        AccountDeletion.objects.get_or_create(user=user)
+
+
+def delete_account(user_id, chunk_size=500):
+    """
+    Delete a user, their recipes, tags and ingredients in chunks with
+    bulk deletes, and the recipe images. The user row goes last, so
+    after an interruption the account can be deleted again from where
+    it stopped.
+
+    Yields (Counter of rows deleted, files removed, bytes reclaimed)
+    per chunk.
+    """
+    using = router.db_for_write(get_user_model())
+    yield from delete_in_chunks(
+        Recipe.all_objects.db_manager(using).filter(user_id=user_id),
+        chunk_size, 'image'
+    )
+    for model in (Tag, Ingredient):
+        yield from delete_in_chunks(
+            model.objects.db_manager(using).filter(user_id=user_id),
+            chunk_size
+        )
+    with transaction.atomic(using=using):
+        deleted = delete_rows(get_user_model(), using, pk=user_id)
+    yield deleted, 0, 0
+
+
+def orphaned_upload_files(older_than=timedelta(hours=1), batch_size=500):
+    """
+    Return the recipe uploads no recipe or recipe version refers to
+
+    Files younger than older_than are skipped, the recipe row of an
+    upload in progress may not be saved yet. Images replaced since are
+    kept while a version can still restore them.
+    """
+    if not default_storage.exists(RECIPE_UPLOAD_DIR):
+        return []
+
+    cutoff = timezone.now() - older_than
+    _, files = default_storage.listdir(RECIPE_UPLOAD_DIR)
+    names = [os.path.join(RECIPE_UPLOAD_DIR, name) for name in sorted(files)]
+    orphans = []
+    for start in range(0, len(names), batch_size):
+        chunk = names[start:start + batch_size]
+        used = set(Recipe.all_objects.filter(
+            image__in=chunk
+        ).values_list('image', flat=True))
+        used.update(RecipeVersion.objects.filter(
+            data__image__in=chunk
+        ).values_list('data__image', flat=True))
+        orphans.extend(
+            name for name in chunk
+            if name not in used
+            and default_storage.get_modified_time(name) <= cutoff
+        )
+    return orphans
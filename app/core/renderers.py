@@ -0,0 +1,74 @@
+import math
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised without orjson
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS |
+    orjson.OPT_PASSTHROUGH_DATETIME |
+    orjson.OPT_PASSTHROUGH_DATACLASS
+) if orjson else 0
+
+
+def has_non_finite(data):
+    """Return True if data holds a NaN or infinite float or Decimal"""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, Decimal) and not value.is_finite():
+            return True
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer using orjson when it is installed
+
+    Output is byte for byte the one of JSONRenderer: dates, decimals,
+    lazy strings and anything else orjson does not know are converted by
+    the DRF encoder, and U+2028/U+2029 are escaped. Pretty printing,
+    ASCII-only or non strict output, and values orjson cannot encode
+    (e.g. integers above 64 bits) use the stdlib renderer. So does data
+    holding NaN or infinity, which orjson writes as null where the
+    strict renderer raises ValueError; it is only looked for when the
+    output has a null.
+    """
+
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or
+                not self.compact or not self.strict or
+                self.get_indent(accepted_media_type,
+                                renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder.default,
+                               option=ORJSON_OPTIONS)
+        except (TypeError, orjson.JSONEncodeError):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        if b'null' in ret and has_non_finite(data):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+
+        return ret.replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
@@ -0,0 +1,226 @@
+import csv
+import io
+import random
+from collections import Counter
+from decimal import Decimal
+from functools import lru_cache
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.models import User, Tag, Ingredient, Recipe, Change, \
+    normalize_name
+from core.summaries import refresh_summaries
+
+TAG_NAMES = (
+    'Vegan', 'Vegetarian', 'Dessert', 'Breakfast', 'Quick', 'Spicy',
+    'Comfort Food', 'Gluten Free', 'Healthy', 'Dinner', 'Lunch', 'Baking',
+    'Grill', 'Salad', 'Soup', 'Seafood', 'Kids', 'Party', 'Budget', 'Asian',
+)
+INGREDIENT_NAMES = (
+    'Salt', 'Pepper', 'Olive Oil', 'Garlic', 'Onion', 'Butter', 'Flour',
+    'Sugar', 'Egg', 'Milk', 'Tomato', 'Rice', 'Chicken', 'Beef', 'Lemon',
+    'Basil', 'Cheese', 'Potato', 'Carrot', 'Ginger', 'Soy Sauce', 'Honey',
+    'Chili', 'Mushroom', 'Spinach', 'Cream', 'Pasta', 'Bread', 'Yogurt',
+    'Cumin',
+)
+TITLE_WORDS = (
+    'Roasted', 'Grilled', 'Creamy', 'Spicy', 'Slow Cooked', 'Crispy',
+    'Baked', 'Smoky', 'Herbed', 'Sticky', 'Classic', 'Easy',
+)
+TITLE_DISHES = (
+    'Curry', 'Stew', 'Salad', 'Pasta', 'Tacos', 'Soup', 'Risotto', 'Pie',
+    'Stir Fry', 'Burger', 'Pancakes', 'Noodles', 'Casserole', 'Bowl',
+)
+
+
+@lru_cache(maxsize=None)
+def password_hash(password):
+    """Hash a password once, seeded users share the resulting hash"""
+    return make_password(password)
+
+
+def next_ids():
+    """Return the highest existing id of every seeded model"""
+    return {
+        model: model.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        for model in (User, Tag, Ingredient, Recipe)
+    }
+
+
+def reset_sequences():
+    """Move the id sequences past the explicitly inserted ids"""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [User, Tag, Ingredient, Recipe]
+    )
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def _weighted_sample(rng, population, weights, count):
+    """Sample count distinct items, favouring the heavier ones"""
+    chosen = dict.fromkeys(rng.choices(population, weights, k=count * 2))
+    if len(chosen) < count:
+        for item in rng.sample(population, len(population)):
+            chosen.setdefault(item)
+    return list(chosen)[:count]
+
+
+def _copy(model_or_table, columns, rows):
+    """Insert rows with COPY ... FROM STDIN (PostgreSQL only)"""
+    table = getattr(model_or_table, '_meta', None)
+    table = table.db_table if table else model_or_table
+    buffer = io.StringIO()
+    # Quoted empty strings stay empty strings instead of becoming NULL
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {connection.ops.quote_name(table)} '
+            f'({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+
+
+def insert(model, columns, rows, use_copy, batch_size=5000):
+    """Insert raw rows of model, using COPY when possible"""
+    if not rows:
+        return
+    if use_copy:
+        _copy(model, columns, rows)
+        return
+    model.objects.bulk_create(
+        (model(**dict(zip(columns, row))) for row in rows),
+        batch_size=batch_size
+    )
+
+
+def seed_shard(shard, first_user, last_user, base_ids, options):
+    """
+    Generate the users first_user..last_user (indexes) and their rows
+
+    Ids are derived from the user index and the ids existing before the
+    run, so shards never need to read back generated keys and always
+    produce the same rows for the same seed. Returns the row counts.
+    """
+    rng = random.Random(f"{options['seed']}:{shard}")
+    tags_per_user = options['tags_per_user']
+    ingredients_per_user = options['ingredients_per_user']
+    recipes_per_user = options['recipes_per_user']
+    use_copy = options['use_copy'] and connection.vendor == 'postgresql'
+    hashed = password_hash(options['password'])
+
+    tag_weights = [1 / (k + 1) for k in range(tags_per_user)]
+    ingredient_weights = [1 / (k + 1) for k in range(ingredients_per_user)]
+
+    users, tags, ingredients, recipes = [], [], [], []
+    recipe_tags, recipe_ingredients = [], []
+
+    for index in range(first_user, last_user):
+        user_id = base_ids[User] + index + 1
+        users.append((
+            user_id, f'user{user_id}@seed.example.com', f'Seed User {index}',
+            hashed, True, False, False, False,
+        ))
+
+        tag_ids = [
+            base_ids[Tag] + index * tags_per_user + k + 1
+            for k in range(tags_per_user)
+        ]
+        ingredient_ids = [
+            base_ids[Ingredient] + index * ingredients_per_user + k + 1
+            for k in range(ingredients_per_user)
+        ]
+        tags.extend(
+            _named(tag_id, _name(TAG_NAMES, k), user_id)
+            for k, tag_id in enumerate(tag_ids)
+        )
+        ingredients.extend(
+            _named(ingredient_id, _name(INGREDIENT_NAMES, k), user_id)
+            for k, ingredient_id in enumerate(ingredient_ids)
+        )
+
+        for k in range(recipes_per_user):
+            recipe_id = base_ids[Recipe] + index * recipes_per_user + k + 1
+            recipes.append((
+                recipe_id, user_id,
+                f'{rng.choice(TITLE_WORDS)} {rng.choice(TITLE_DISHES)}',
+                int(rng.lognormvariate(3.4, 0.6)) + 5,
+                Decimal(rng.randint(150, 9999)) / 100,
+                '',
+            ))
+            if tag_ids:
+                count = rng.randint(0, min(options['max_tags'], len(tag_ids)))
+                recipe_tags.extend(
+                    (recipe_id, tag_id) for tag_id in
+                    _weighted_sample(rng, tag_ids, tag_weights, count)
+                )
+            if ingredient_ids:
+                count = rng.randint(
+                    1, min(options['max_ingredients'], len(ingredient_ids))
+                )
+                recipe_ingredients.extend(
+                    (recipe_id, ingredient_id) for ingredient_id in
+                    _weighted_sample(rng, ingredient_ids, ingredient_weights,
+                                     count)
+                )
+
+    # Raw inserts bypass the signals maintaining the usage counters and
+    # the sync change logs, and COPY the auto_now columns
+    now = timezone.now()
+    tag_usage = Counter(tag_id for _, tag_id in recipe_tags)
+    ingredient_usage = Counter(item_id for _, item_id in recipe_ingredients)
+    tags = [(*row, tag_usage[row[0]], now) for row in tags]
+    ingredients = [(*row, ingredient_usage[row[0]], now)
+                   for row in ingredients]
+    recipes = [(*row, False, now) for row in recipes]
+    changes = [
+        (row[3], kind, row[0], False, now)
+        for kind, rows in ((Change.TAG, tags),
+                           (Change.INGREDIENT, ingredients))
+        for row in rows
+    ] + [(row[1], Change.RECIPE, row[0], False, now) for row in recipes]
+
+    with transaction.atomic():
+        insert(User, ('id', 'email', 'name', 'password', 'is_active',
+                      'is_staff', 'is_supervisor', 'is_superuser'),
+               users, use_copy)
+        insert(Tag, ('id', 'name', 'normalized_name', 'user_id', 'usage',
+                     'updated_at'), tags, use_copy)
+        insert(Ingredient, ('id', 'name', 'normalized_name', 'user_id',
+                            'usage', 'updated_at'), ingredients, use_copy)
+        insert(Recipe, ('id', 'user_id', 'title', 'time_minutes', 'price',
+                        'link', 'published', 'updated_at'), recipes,
+               use_copy)
+        insert(Recipe.tags.through, ('recipe_id', 'tag_id'), recipe_tags,
+               use_copy)
+        insert(Recipe.ingredients.through, ('recipe_id', 'ingredient_id'),
+               recipe_ingredients, use_copy)
+        insert(Change, ('user_id', 'kind', 'object_id', 'deleted', 'created'),
+               changes, use_copy)
+        # Raw inserts bypass the signals maintaining the summaries
+        refresh_summaries([row[0] for row in recipes])
+
+    return {
+        'users': len(users),
+        'tags': len(tags),
+        'ingredients': len(ingredients),
+        'recipes': len(recipes),
+        'links': len(recipe_tags) + len(recipe_ingredients),
+    }
+
+
+def _named(pk, name, user_id):
+    """Row of a tag or ingredient, whose save() is bypassed"""
+    return pk, name, normalize_name(name), user_id
+
+
+def _name(names, index):
+    """Name the index-th item, numbering the names once they run out"""
+    name = names[index % len(names)]
+    round_ = index // len(names)
+    return f'{name} {round_ + 1}' if round_ else name
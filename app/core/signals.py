@@ -0,0 +1,217 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete
+from django.dispatch import receiver
+
+from core.feed import invalidate_feed, invalidate_followers
+from core.models import Tag, Ingredient, Recipe, RecipeIngredient, Unit, \
+    Follow, Change
+from core.nutrition import invalidate_all_rollups, invalidate_rollups
+from core.summaries import refresh_summaries
+from core.sync import deferred_changes, record_changes, \
+    record_recipe_changes
+from core.usage import change_usage, linked_counts, release_recipe
+
+
+def _linked_recipe_ids(instance, using):
+    return list(
+        instance.recipe_set.using(using).values_list('id', flat=True)
+    )
+
+
+def _invalidate_feeds(recipe_ids, using):
+    """Drop the feeds of the followers of the published recipes' authors"""
+    for user_id in Recipe.objects.using(using).filter(
+            id__in=recipe_ids, published=True
+    ).values_list('user_id', flat=True).distinct():
+        invalidate_followers(user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, using, raw=False,
+                 update_fields=None, **kwargs):
+    """Refresh the summary of a created or updated recipe and log it"""
+    if not raw:
+        refresh_summaries([instance.pk], using=using)
+        record_changes(instance.user_id, Change.RECIPE, [instance.pk],
+                       deleted=instance.deleted_at is not None,
+                       created=created, using=using)
+        if instance.published or 'published' in (update_fields or ()):
+            invalidate_followers(instance.user_id)
+        if instance.deleted_at and 'deleted_at' in (update_fields or ()):
+            release_recipe(instance.pk, using)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, using, **kwargs):
+    """Uncount the links of a live recipe, deleted without m2m signals"""
+    if instance.deleted_at is None:
+        release_recipe(instance.pk, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_changed(sender, instance, action, reverse, pk_set, using,
+                         **kwargs):
+    """Refresh the summaries of the recipes whose links changed"""
+    if reverse and action == 'pre_clear':
+        # Once cleared the tag or ingredient no longer knows its recipes
+        instance._summary_recipe_ids = _linked_recipe_ids(instance, using)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            refresh_summaries([instance.pk], using=using)
+        elif action == 'post_clear':
+            refresh_summaries(instance._summary_recipe_ids, using=using)
+        else:
+            refresh_summaries(pk_set or [], using=using)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, using, **kwargs):
+    """Log the deletion of a live recipe, soft deletes already were"""
+    if instance.deleted_at is None:
+        record_changes(instance.user_id, Change.RECIPE, [instance.pk],
+                       deleted=True, using=using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def sync_links_changed(sender, instance, action, reverse, pk_set, using,
+                       **kwargs):
+    """Log the recipes whose links changed"""
+    if action not in ('post_add', 'post_remove', 'post_clear') or \
+            action != 'post_clear' and not pk_set:
+        return
+    if not reverse:
+        if instance.deleted_at is None:
+            record_changes(instance.user_id, Change.RECIPE, [instance.pk],
+                           using=using)
+    elif action == 'post_clear':
+        # Remembered by recipe_links_changed before the clear
+        record_recipe_changes(instance._summary_recipe_ids, using)
+    else:
+        record_recipe_changes(pk_set, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def usage_links_changed(sender, instance, action, reverse, model, pk_set,
+                        using, **kwargs):
+    """Keep the usage counters of tags and ingredients with F() updates"""
+    target = type(instance) if reverse else model
+    field = target._meta.model_name
+    if not reverse and instance.deleted_at is not None:
+        return
+
+    if action in ('pre_remove', 'pre_clear'):
+        # Only the links that exist, and are live, get removed
+        filters = {'recipe__deleted_at__isnull': True}
+        if reverse:
+            filters[field] = instance.pk
+            if pk_set is not None:
+                filters['recipe_id__in'] = pk_set
+        else:
+            filters['recipe'] = instance.pk
+            if pk_set is not None:
+                filters[f'{field}_id__in'] = pk_set
+        instance._usage_removed = linked_counts(sender, field, using,
+                                                **filters)
+    elif action in ('post_remove', 'post_clear'):
+        change_usage(target, instance._usage_removed, using, sign=-1)
+    elif action == 'post_add' and pk_set:
+        if reverse:
+            counts = {instance.pk: Recipe.objects.using(using).filter(
+                id__in=pk_set
+            ).count()}
+        else:
+            counts = dict.fromkeys(pk_set, 1)
+        change_usage(target, counts, using)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def nutrition_links_changed(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    """Drop the cached rollups of the recipes whose ingredients changed"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_rollups([instance.pk])
+    elif action == 'post_clear':
+        # Remembered by recipe_links_changed before the clear
+        invalidate_rollups(instance._summary_recipe_ids)
+    else:
+        invalidate_rollups(pk_set or [])
+
+
+def amounts_changed(recipe_ids, using=None):
+    """
+    Drop the rollups of recipes whose quantities changed, log them and
+    drop the feeds showing them. Bulk updates of the quantities, which
+    send no signal, call it themselves.
+    """
+    invalidate_rollups(recipe_ids)
+    record_recipe_changes(recipe_ids, using)
+    _invalidate_feeds(recipe_ids, using)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def quantity_saved(sender, instance, using, raw=False, **kwargs):
+    """Handle the quantities of a recipe saved one link at a time"""
+    if not raw:
+        amounts_changed([instance.recipe_id], using)
+
+
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+def unit_changed(sender, **kwargs):
+    """Drop every cached rollup, any may use the unit"""
+    invalidate_all_rollups()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def related_saved(sender, instance, created, using, raw=False, **kwargs):
+    """
+    Refresh the names copied into the summaries of linked recipes, and
+    their rollups for ingredients, drop the feeds showing them and log
+    the change
+    """
+    if raw:
+        return
+    if not created:
+        recipe_ids = _linked_recipe_ids(instance, using)
+        refresh_summaries(recipe_ids, using=using)
+        if sender is Ingredient:
+            invalidate_rollups(recipe_ids)
+        _invalidate_feeds(recipe_ids, using)
+    record_changes(instance.user_id, sender._meta.model_name, [instance.pk],
+                   created=created, using=using)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def related_deleting(sender, instance, using, **kwargs):
+    """Remember the linked recipes, the links are deleted without signal"""
+    instance._summary_recipe_ids = _linked_recipe_ids(instance, using)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def related_deleted(sender, instance, using, **kwargs):
+    # The recipes may be deleted by the same cascade, only touch the
+    # summaries that still exist
+    refresh_summaries(instance._summary_recipe_ids, create=False,
+                      using=using)
+    with deferred_changes():
+        record_changes(instance.user_id, sender._meta.model_name,
+                       [instance.pk], deleted=True, using=using)
+        record_recipe_changes(instance._summary_recipe_ids, using)
+    if sender is Ingredient:
+        invalidate_rollups(instance._summary_recipe_ids)
+    _invalidate_feeds(instance._summary_recipe_ids, using)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    """Drop the cached feed of a user following or unfollowing someone"""
+    invalidate_feed(instance.follower_id)
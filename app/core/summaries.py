@@ -0,0 +1,165 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import router, transaction
+
+from core.models import Recipe, RecipeSummary
+
+SUMMARY_FIELDS = (
+    'title', 'time_minutes', 'price', 'servings', 'link', 'image',
+    'tag_ids', 'tag_names', 'ingredient_ids', 'ingredient_names',
+)
+
+
+def _related(through, target, recipe_ids, using=None):
+    """Return {recipe id: (sorted ids, names)} of a recipe relation"""
+    related = defaultdict(list)
+    for recipe_id, related_id, name in through.objects.using(using).filter(
+            recipe_id__in=recipe_ids
+    ).values_list('recipe_id', f'{target}_id', f'{target}__name'):
+        related[recipe_id].append((related_id, name))
+
+    result = {}
+    for recipe_id, items in related.items():
+        items.sort()
+        result[recipe_id] = ([i for i, _ in items], [n for _, n in items])
+    return result
+
+
+def build_summaries(recipe_ids, using=None):
+    """Compute the summaries of the recipes, without saving them"""
+    tags = _related(Recipe.tags.through, 'tag', recipe_ids, using)
+    ingredients = _related(Recipe.ingredients.through, 'ingredient',
+                           recipe_ids, using)
+
+    summaries = []
+    for row in Recipe.objects.using(using).filter(
+            id__in=recipe_ids).values(
+            'id', 'user_id', 'title', 'time_minutes', 'price', 'servings',
+            'link', 'image'):
+        tag_ids, tag_names = tags.get(row['id'], ([], []))
+        ingredient_ids, ingredient_names = ingredients.get(
+            row['id'], ([], [])
+        )
+        summaries.append(RecipeSummary(
+            recipe_id=row['id'],
+            user_id=row['user_id'],
+            title=row['title'],
+            time_minutes=row['time_minutes'],
+            price=row['price'],
+            servings=row['servings'],
+            link=row['link'],
+            image=row['image'] or None,
+            tag_ids=tag_ids,
+            tag_names=tag_names,
+            ingredient_ids=ingredient_ids,
+            ingredient_names=ingredient_names,
+        ))
+    return summaries
+
+
+_local = threading.local()
+
+
+@contextmanager
+def deferred_summaries():
+    """
+    Collect the refreshes requested in the block and run them once at
+    its end, for changes made in several steps like a save and link
+    updates
+    """
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+
+    _local.pending = pending = defaultdict(set)
+    try:
+        yield
+    finally:
+        _local.pending = None
+    for (using, create), recipe_ids in pending.items():
+        refresh_summaries(recipe_ids, create=create, using=using)
+
+
+def refresh_summaries(recipe_ids, batch_size=1000, create=True,
+                      using=None):
+    """
+    Recompute the summaries of the given recipes in batches, dropping
+    the summaries of recipes that no longer exist
+
+    With create=False only the summaries that already exist are
+    refreshed. using selects the database, the router decides if None.
+    Inside deferred_summaries() the refresh waits for the block's end.
+    The recipes are locked while theirs are rewritten, so concurrent
+    refreshes of a recipe take turns.
+    """
+    using = using or router.db_for_write(RecipeSummary)
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending[(using, create)].update(recipe_ids)
+        return
+    summaries = RecipeSummary.objects.db_manager(using)
+    recipe_ids = sorted(set(recipe_ids))
+    for start in range(0, len(recipe_ids), batch_size):
+        chunk = recipe_ids[start:start + batch_size]
+        if not create:
+            chunk = list(summaries.filter(
+                recipe_id__in=chunk
+            ).values_list('recipe_id', flat=True))
+            if not chunk:
+                continue
+        with transaction.atomic(using=summaries.db, savepoint=False):
+            list(Recipe.all_objects.using(summaries.db).select_for_update()
+                 .filter(id__in=chunk).order_by('id').values_list('id'))
+            built = build_summaries(chunk, summaries.db)
+            summaries.filter(recipe_id__in=chunk).delete()
+            summaries.bulk_create(built)
+
+
+def summary_values(summary):
+    return tuple(
+        getattr(summary, field) for field in ('user_id',) + SUMMARY_FIELDS
+    )
+
+
+def verify_summaries(recipe_ids):
+    """
+    Compare stored summaries with freshly computed ones
+
+    Returns the ids of the recipes whose summary is missing, stale or
+    orphaned.
+    """
+    expected = {s.recipe_id: summary_values(s)
+                for s in build_summaries(recipe_ids)}
+    stored = {
+        s.recipe_id: summary_values(s)
+        for s in RecipeSummary.objects.filter(recipe_id__in=recipe_ids)
+    }
+    return sorted(
+        recipe_id for recipe_id in set(expected) | set(stored)
+        if expected.get(recipe_id) != stored.get(recipe_id)
+    )
+
+
+def iter_recipe_id_batches(batch_size=1000, start_id=0):
+    """Yield the ids of all recipes in ascending batches (keyset paging)"""
+    last_id = start_id
+    while True:
+        ids = list(
+            Recipe.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def orphaned_summary_ids():
+    """Return the summaries whose recipe no longer exists"""
+    return list(
+        RecipeSummary.objects.exclude(
+            recipe_id__in=Recipe.objects.values('id')
+        ).values_list('recipe_id', flat=True)
+    )
@@ -0,0 +1,225 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from core import events
+from core.models import Change, Recipe
+from core.purge import delete_in_chunks
+
+
+class TokenExpired(Exception):
+    """The tombstones a sync token needs may have been compacted away"""
+
+
+# First key of the advisory locks held on the users' change logs
+LOG_LOCK = 0x5c4a
+
+
+def lock_logs(user_ids, using):
+    """
+    Hold the change logs of the users until the transaction ends
+
+    Change ids are then handed out to a user's changes in the order their
+    transactions commit, so a sync token never passes a change that
+    commits after it was given out. Takes PostgreSQL advisory locks, in
+    user order; SQLite lets a single transaction write at a time anyway.
+    Transactions logging more than once do it in deferred_changes(), so
+    they lock every user at once and in the same order.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for user_id in sorted(set(user_ids)):
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)',
+                           [LOG_LOCK, user_id])
+
+
+_local = threading.local()
+
+
+@contextmanager
+def deferred_changes():
+    """
+    Collect the changes logged in the block and store them at its end,
+    an object changed several times logged once. Use it inside the
+    transaction of the block's writes.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+
+    _local.pending = pending = {}
+    try:
+        yield
+    finally:
+        _local.pending = None
+    logged = defaultdict(list)
+    for (using, *_), entry in pending.items():
+        logged[using].append(entry)
+    for using, entries in logged.items():
+        _store(entries, using)
+
+
+def _store(entries, using):
+    """
+    Store the (change, event) entries and publish them to the users'
+    event streams
+    """
+    with transaction.atomic(using=using, savepoint=False):
+        lock_logs([change.user_id for change, _ in entries], using)
+        Change.objects.using(using).bulk_create(
+            [change for change, _ in entries]
+        )
+    by_user = defaultdict(list)
+    for change, event in entries:
+        by_user[change.user_id].append({
+            'event': event, 'kind': change.kind, 'id': change.object_id,
+        })
+    events.publish_on_commit(by_user, using)
+
+
+def _log(changes, event, using):
+    """Store the changes, at the end of deferred_changes() if inside it"""
+    using = using or router.db_for_write(Change)
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        _store([(change, event) for change in changes], using)
+        return
+    for change in changes:
+        key = (using, change.user_id, change.kind, change.object_id)
+        if key in pending and pending[key][1] == events.CREATED and \
+                not change.deleted:
+            # Still new to clients that have not synced since
+            pending[key] = (change, events.CREATED)
+        else:
+            pending[key] = (change, event)
+
+
+def record_changes(user_id, kind, ids, deleted=False, created=False,
+                   using=None):
+    """Append an entry per object id to the user's change log"""
+    if not ids:
+        return
+    if deleted:
+        event = events.DELETED
+    else:
+        event = events.CREATED if created else events.UPDATED
+    _log([
+        Change(user_id=user_id, kind=kind, object_id=pk, deleted=deleted)
+        for pk in sorted(set(ids))
+    ], event, using)
+
+
+def record_deletions(kind, owners, using=None):
+    """Log tombstones for {object id: user id} deleted in bulk"""
+    _log([
+        Change(user_id=user_id, kind=kind, object_id=pk, deleted=True)
+        for pk, user_id in sorted(owners.items())
+    ], events.DELETED, using)
+
+
+def record_recipe_changes(recipe_ids, using=None):
+    """Log a change of the live recipes among recipe_ids, of any users"""
+    if not recipe_ids:
+        return
+    _log([
+        Change(user_id=user_id, kind=Change.RECIPE, object_id=pk)
+        for pk, user_id in Recipe.objects.using(using).filter(
+            id__in=recipe_ids
+        ).order_by('id').values_list('id', 'user_id')
+    ], events.UPDATED, using)
+
+
+def make_token(change_id, now=None):
+    """
+    Token of a change, also carrying when it was handed out so tokens
+    older than the kept tombstones can be refused
+    """
+    return f'{change_id}.{int(now or time.time())}'
+
+
+def parse_token(token):
+    """Return the change id of a token, raising ValueError if invalid"""
+    change_id, issued = (int(part) for part in token.split('.'))
+    if change_id < 0:
+        raise ValueError(token)
+    retention = settings.SYNC_TOMBSTONE_DAYS * 24 * 3600
+    if issued < time.time() - retention:
+        raise TokenExpired(token)
+    return change_id
+
+
+def changes_since(user, since=0, size=500):
+    """
+    Return the next page of the user's changes after the change id
+    since, as ({kind: {'changed': ids, 'deleted': ids}}, last change
+    id, more)
+
+    Only the newest entry of an object counts. Every change visible is
+    safe to pass: lock_logs() keeps a transaction from logging changes
+    of the user while another that did has not committed, so no change
+    with a lower id can still appear.
+    """
+    rows = list(Change.objects.filter(
+        user=user, id__gt=since
+    ).order_by('id').values_list('id', 'kind', 'object_id',
+                                 'deleted')[:size + 1])
+    more = len(rows) > size
+    rows = rows[:size]
+
+    latest = {}
+    for _, kind, object_id, deleted in rows:
+        latest[(kind, object_id)] = deleted
+    changes = {
+        kind: {'changed': [], 'deleted': []} for kind, _ in Change.KINDS
+    }
+    for (kind, object_id), deleted in sorted(latest.items()):
+        changes[kind]['deleted' if deleted else 'changed'].append(object_id)
+    return changes, rows[-1][0] if rows else since, more
+
+
+def compact_changes(batch_size=5000):
+    """
+    Delete the log entries superseded by a newer entry of the same
+    object, walking the log in id order in batches
+
+    Yields the entries deleted per batch.
+    """
+    using = router.db_for_write(Change)
+    changes = Change.objects.using(using)
+    newer = changes.filter(
+        user_id=OuterRef('user_id'), kind=OuterRef('kind'),
+        object_id=OuterRef('object_id'), id__gt=OuterRef('id')
+    )
+    last_id = 0
+    while True:
+        ids = list(changes.filter(id__gt=last_id).order_by('id').values_list(
+            'id', flat=True
+        )[:batch_size])
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield changes.filter(
+            id__gte=ids[0], id__lte=last_id
+        ).filter(Exists(newer))._raw_delete(using)
+
+
+def prune_tombstones(older_than, batch_size=5000):
+    """
+    Delete the tombstones recorded at least older_than ago, tokens
+    handed out before then are refused afterwards
+
+    Yields the tombstones deleted per batch.
+    """
+    tombstones = Change.objects.db_manager(
+        router.db_for_write(Change)
+    ).filter(deleted=True, created__lte=timezone.now() - older_than)
+    for deleted, _, _ in delete_in_chunks(tombstones, batch_size):
+        yield sum(deleted.values())
@@ -0,0 +1,40 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Alias of the database standing in for a read replica in the routing
+# tests, they list it in DATABASE_REPLICAS themselves
+REPLICA_ALIAS = 'replica'
+
+
+def add_replica_alias():
+    """
+    Add a second database with the settings of the default one, created
+    as a separate test database so rows written to one of them are not
+    visible in the other
+    """
+    if REPLICA_ALIAS in connections.databases:
+        return
+    default = connections.databases[DEFAULT_DB_ALIAS]
+    test = dict(default.get('TEST', {}), MIRROR=None, NAME=None)
+    if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+        test['NAME'] = f"test_{default['NAME']}_{REPLICA_ALIAS}"
+    connections.databases[REPLICA_ALIAS] = dict(default, TEST=test)
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Test runner turning throttling off for the whole run, tests of the
+    throttle turn it back on with override_settings, and adding the
+    stand-in replica database
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        add_replica_alias()
+        self._overrides = override_settings(THROTTLE_ENABLED=False)
+        self._overrides.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._overrides.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,23 @@
+from unittest.mock import patch
+
+from django.db import OperationalError
+from django.test import SimpleTestCase
+from psycopg2 import pool as pg_pool
+
+from core.backends.postgresql.base import DatabaseWrapper
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    @patch('core.backends.postgresql.base.get_pool')
+    def test_exhausted_pool(self, get_pool):
+        """Test an exhausted pool raises OperationalError"""
+        get_pool.return_value.getconn.side_effect = pg_pool.PoolError(
+            'connection pool exhausted'
+        )
+        wrapper = DatabaseWrapper({
+            'NAME': 'app', 'OPTIONS': {}, 'POOL': {'MAX_SIZE': 2},
+        }, 'pooled')
+
+        with self.assertRaisesMessage(OperationalError, 'all 2 connections'):
+            wrapper.get_new_connection({})
@@ -0,0 +1,121 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.benchmarks import report
+from core.benchmarks.seed import seed
+from core.models import Recipe, Tag, Ingredient
+
+
+class SeedTests(TestCase):
+
+    def test_seed_counts(self):
+        """Test the seeder creates the requested scale"""
+        users = seed(users=2, recipes=5, tags=4, ingredients=6,
+                     tags_per_recipe=2, ingredients_per_recipe=3)
+
+        self.assertEqual(len(users), 2)
+        self.assertEqual(Recipe.objects.count(), 10)
+        self.assertEqual(Tag.objects.count(), 8)
+        self.assertEqual(Ingredient.objects.count(), 12)
+        self.assertEqual(Recipe.tags.through.objects.count(), 20)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 30)
+
+    def test_seed_deterministic(self):
+        """Test the same seed produces the same data"""
+        def snapshot():
+            return [
+                (r.title, r.time_minutes, r.price,
+                 sorted(t.name for t in r.tags.all()))
+                for r in Recipe.objects.order_by('id')
+            ]
+
+        seed(users=1, recipes=5, tags=5, ingredients=5, seed_value=7)
+        first = snapshot()
+        get_user_model().objects.all().delete()
+        seed(users=1, recipes=5, tags=5, ingredients=5, seed_value=7)
+
+        self.assertEqual(snapshot(), first)
+
+
+class ReportTests(TestCase):
+
+    def test_percentile(self):
+        """Test percentiles are interpolated between samples"""
+        values = list(range(1, 101))
+
+        self.assertEqual(report.percentile(values, 50), 50.5)
+        self.assertAlmostEqual(report.percentile(values, 95), 95.05)
+        self.assertEqual(report.percentile([3.0], 99), 3.0)
+        self.assertEqual(report.percentile([], 50), 0.0)
+
+    def test_compare_flags_regressions(self):
+        """Test slower p95 and extra queries are reported"""
+        baseline = {'list': {'p95': 10.0, 'queries': 3}}
+
+        self.assertEqual(
+            report.compare({'list': {'p95': 11.0, 'queries': 3}}, baseline),
+            []
+        )
+        regressions = report.compare(
+            {'list': {'p95': 13.0, 'queries': 4}}, baseline
+        )
+        self.assertEqual(len(regressions), 2)
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def setUp(self):
+        handle, self.baseline = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.baseline)
+
+    def run_benchmark(self, *args):
+        out = StringIO()
+        call_command('benchmark', '--in-place', '--scale', 'tiny',
+                     '--iterations', '3', '--warmup', '0',
+                     '--scenario', 'list', '--scenario', 'detail',
+                     '--baseline', self.baseline, *args, stdout=out)
+        return out.getvalue()
+
+    def test_save_and_compare_baseline(self):
+        """Test results are saved and compared against a baseline"""
+        self.run_benchmark('--save-baseline')
+        with open(self.baseline) as baseline_file:
+            saved = json.load(baseline_file)
+
+        self.assertEqual(set(saved), {'list', 'detail'})
+        self.assertEqual(saved['list']['requests'], 3)
+        self.assertGreater(saved['list']['queries'], 0)
+
+        get_user_model().objects.all().delete()
+        output = self.run_benchmark('--tolerance', '1000')
+        self.assertIn('No regressions', output)
+
+    def test_query_regression_fails(self):
+        """Test more queries than the baseline fail the run"""
+        with open(self.baseline, 'w') as baseline_file:
+            json.dump({'detail': {'p95': 1000, 'queries': 0}}, baseline_file)
+
+        with self.assertRaises(CommandError):
+            self.run_benchmark()
+
+
+class BenchmarkSerializersCommandTests(TestCase):
+
+    def test_serializers_render_identical_output(self):
+        """Test the serializer micro-benchmark compares both paths"""
+        out = StringIO()
+        call_command('benchmark_serializers', '--in-place', '--scale',
+                     'tiny', '--repeat', '2', stdout=out)
+
+        self.assertIn('values_serializer', out.getvalue())
+        self.assertIn('Output identical', out.getvalue())
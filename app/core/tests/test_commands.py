@@ -1,23 +1,184 @@
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
 from django.db.utils import OperationalError
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.management.commands.count_connections import \
+    count_connection_opens
+from core.models import User, Tag, Ingredient, Recipe
 
 
 class CommandTests(TestCase):
 
     def test_wait_for_db_ready(self):
         """Test waiting for db until db is ready"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
+        with patch('core.management.commands.wait_for_db.check_database') \
+                as cd:
             call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 1)
+            self.assertEqual(cd.call_count, 1)
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
         """Test waiting for DB"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
+        with patch('core.management.commands.wait_for_db.check_database') \
+                as cd:
+            cd.side_effect = [OperationalError] * 5 + [None]
             call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+            self.assertEqual(cd.call_count, 6)
+            self.assertEqual(ts.call_count, 5)
+
+    def test_wait_for_db_runs_query(self):
+        """Test the probe opens a real connection instead of a handle"""
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('wait_for_db', stdout=out)
+
+        self.assertEqual([query['sql'] for query in queries], ['SELECT 1'])
+        self.assertEqual(out.getvalue().splitlines(),
+                         ['Waiting for database', 'Database Available'])
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_backoff(self, ts):
+        """Test delays grow exponentially and stay under the maximum"""
+        with patch('core.management.commands.wait_for_db.check_database') \
+                as cd, patch('core.health.random.uniform',
+                             side_effect=lambda low, high: high):
+            cd.side_effect = [OperationalError] * 8 + [None]
+            call_command('wait_for_db', '--max-delay', '1', stdout=StringIO())
+
+        delays = [c.args[0] for c in ts.call_args_list]
+        self.assertEqual(delays[:4], [0.1, 0.2, 0.4, 0.8])
+        self.assertEqual(max(delays), 1)
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, ts):
+        """Test the command fails once the timeout has elapsed"""
+        with patch('core.management.commands.wait_for_db.check_database') \
+                as cd:
+            cd.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', '--timeout', '0',
+                             stdout=StringIO())
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_migrations(self, ts):
+        """Test waiting until migrations are applied"""
+        with patch('core.management.commands.wait_for_db.check_database'), \
+                patch('core.management.commands.wait_for_db.'
+                      'check_migrations') as cm:
+            cm.side_effect = [False, False, True]
+            call_command('wait_for_db', '--migrations', stdout=StringIO())
+            self.assertEqual(cm.call_count, 3)
+
+
+class CountConnectionsCommandTests(TestCase):
+
+    def setUp(self):
+        self.db_file = tempfile.NamedTemporaryFile(suffix='.sqlite3')
+        self.settings_dict = {
+            'ENGINE': 'core.backends.sqlite3',
+            'NAME': self.db_file.name,
+            'CONN_HEALTH_CHECKS': True,
+        }
+
+    def tearDown(self):
+        self.db_file.close()
+
+    def test_connection_opened_per_request_without_max_age(self):
+        """Test a new connection is opened for every request"""
+        self.settings_dict['CONN_MAX_AGE'] = 0
+        opens = count_connection_opens(self.settings_dict, 1000)
+
+        self.assertEqual(opens, 1000)
+
+    def test_persistent_connection_reused(self):
+        """Test a persistent connection is reused across requests"""
+        self.settings_dict['CONN_MAX_AGE'] = 60
+        opens = count_connection_opens(self.settings_dict, 1000)
+
+        self.assertEqual(opens, 1)
+
+    def test_unusable_connection_replaced_by_health_check(self):
+        """Test a dead persistent connection is replaced, not reused"""
+        self.settings_dict['CONN_MAX_AGE'] = None
+        with patch('core.backends.sqlite3.base.DatabaseWrapper.is_usable',
+                   side_effect=[False] + [True] * 10):
+            opens = count_connection_opens(self.settings_dict, 10)
+
+        self.assertEqual(opens, 2)
+
+    def test_command_output(self):
+        """Test the command reports the number of connections opened"""
+        out = StringIO()
+        call_command('count_connections', '--requests', '50',
+                     '--conn-max-age', '0', '--sqlite', stdout=out)
+
+        self.assertIn('50 connection(s) opened for 50 request(s)',
+                      out.getvalue())
+
+
+class SeedDataCommandTests(TestCase):
+
+    def seed(self, *args):
+        call_command('seed_data', '--users', '5', '--recipes-per-user', '4',
+                     '--tags-per-user', '3', '--ingredients-per-user', '6',
+                     '--shard-size', '2', *args, stdout=StringIO())
+
+    def test_seed_data_counts(self):
+        """Test the requested number of rows is generated"""
+        self.seed()
+
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Tag.objects.count(), 15)
+        self.assertEqual(Ingredient.objects.count(), 30)
+        self.assertEqual(Recipe.objects.count(), 20)
+        self.assertTrue(Recipe.ingredients.through.objects.exists())
+
+    def test_seed_data_links_stay_with_owner(self):
+        """Test recipes only link tags and ingredients of their owner"""
+        self.seed()
+
+        self.assertFalse(Recipe.objects.exclude(
+            tags__user=F('user')).filter(tags__isnull=False).exists())
+        self.assertFalse(Recipe.objects.exclude(
+            ingredients__user=F('user')).exists())
+
+    def test_seed_data_reproducible(self):
+        """Test the same seed generates the same recipes"""
+        def snapshot():
+            return [
+                (r.title, r.time_minutes, r.price,
+                 sorted(r.ingredients.values_list('name', flat=True)))
+                for r in Recipe.objects.order_by('id')
+            ]
+
+        self.seed('--seed', '3')
+        first = snapshot()
+        User.objects.all().delete()
+        self.seed('--seed', '3')
+
+        self.assertEqual(snapshot(), first)
+
+    def test_seed_data_shared_password(self):
+        """Test generated users can log in with the shared password"""
+        self.seed('--password', 'secret123')
+
+        user = User.objects.first()
+        self.assertTrue(user.check_password('secret123'))
+
+    def test_seed_data_appends_after_existing_rows(self):
+        """Test explicit ids never collide with existing rows"""
+        existing = User.objects.create_user('taken@test.com', 'test123')
+        Tag.objects.create(user=existing, name='Existing')
+
+        self.seed()
+
+        self.assertEqual(User.objects.count(), 6)
+        self.assertEqual(Tag.objects.count(), 16)
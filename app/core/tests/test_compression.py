@@ -0,0 +1,94 @@
+import gzip
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import middleware
+from core.models import Recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for index in range(20):
+            Recipe.objects.create(user=self.user, title=f'Recipe {index}',
+                                  time_minutes=5, price='5.00')
+
+    def test_gzip(self):
+        """Test responses are gzipped when the client accepts it"""
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        plain = self.client.get(RECIPE_URL).content
+        self.assertEqual(gzip.decompress(res.content), plain)
+
+    @skipUnless(middleware.brotli, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        """Test brotli wins over gzip at equal quality"""
+        res = self.client.get(RECIPE_URL,
+                              HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        plain = self.client.get(RECIPE_URL).content
+        self.assertEqual(middleware.brotli.decompress(res.content), plain)
+
+    @patch('core.middleware.brotli', None)
+    def test_gzip_without_brotli(self):
+        """Test gzip is used when brotli is not installed"""
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='br, gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+
+    def test_no_accept_encoding(self):
+        """Test responses stay plain without Accept-Encoding"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    @override_settings(COMPRESSION_MIN_SIZE=10 ** 6)
+    def test_small_responses_not_compressed(self):
+        """Test responses under the threshold are not compressed"""
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_choose_encoding(self):
+        """Test the Accept-Encoding negotiation"""
+        with patch('core.middleware.brotli', object()):
+            self.assertEqual(middleware.choose_encoding('gzip;q=1, br;q=0.5'),
+                             'gzip')
+            self.assertEqual(middleware.choose_encoding('br;q=0, *'), 'gzip')
+            self.assertEqual(middleware.choose_encoding('*'), 'br')
+            self.assertIsNone(middleware.choose_encoding('identity'))
+            self.assertIsNone(middleware.choose_encoding('gzip;q=0'))
+            self.assertIsNone(middleware.choose_encoding(''))
+
+
+class BenchmarkCompressionCommandTests(TestCase):
+
+    def test_benchmark_compression(self):
+        """Test the compression benchmark reports every variant"""
+        out = StringIO()
+        call_command('benchmark_compression', '--in-place', '--scale',
+                     'tiny', '--repeat', '1', stdout=out)
+
+        for variant in ('full', 'expanded', 'title_image', 'gzip-6'):
+            self.assertIn(variant, out.getvalue())
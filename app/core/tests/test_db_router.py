@@ -0,0 +1,131 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import checks, db_router
+from core.models import Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample_recipe(user, using='default', **params):
+    """Create a recipe on the given database"""
+    defaults = {'title': 'Sample', 'time_minutes': 5, 'price': '5.00'}
+    defaults.update(params)
+    return Recipe.objects.using(using).create(user=user, **defaults)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], READ_YOUR_WRITES_WINDOW=5)
+class ReplicaRoutingTests(TestCase):
+    """
+    The default database and the one the test runner adds stand in for
+    a primary and a replica. The replica is not replicated, so rows only
+    present in one of them show which database served a request.
+    """
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        db_router._lag_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.user.save(using='replica')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_safe_reads_use_replica(self):
+        """Test list requests are served by the replica"""
+        sample_recipe(self.user, title='Primary')
+        sample_recipe(self.user, using='replica', title='Replica')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual([r['title'] for r in res.data], ['Replica'])
+
+    def test_tags_read_from_replica(self):
+        """Test tag lists are served by the replica"""
+        Tag.objects.using('replica').create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_writes_go_to_primary(self):
+        """Test creating a tag writes it to the primary"""
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertTrue(Tag.objects.using('default').exists())
+        self.assertFalse(Tag.objects.using('replica').exists())
+
+    def test_reads_pinned_to_primary_after_write(self):
+        """Test reads after a write see the primary"""
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual([t['name'] for t in res.data], ['Vegan'])
+
+    def test_pin_expires(self):
+        """Test reads go back to the replica once the window passed"""
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+        cache.delete(db_router.pin_key(self.user.pk))
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data, [])
+
+    @patch('core.db_router.measure_replica_lag', return_value=60.0)
+    def test_lagging_replica_skipped(self, lag):
+        """Test a replica behind the allowed lag is not used"""
+        sample_recipe(self.user, title='Primary')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual([r['title'] for r in res.data], ['Primary'])
+
+    @patch('core.db_router.measure_replica_lag', return_value=0.0)
+    def test_lag_measured_once_per_interval(self, lag):
+        """Test the lag is cached between requests"""
+        self.client.get(RECIPE_URL)
+        self.client.get(RECIPE_URL)
+
+        self.assertEqual(lag.call_count, 1)
+
+    def test_reads_outside_viewsets_use_primary(self):
+        """Test reads are only routed while a replica view is active"""
+        sample_recipe(self.user, using='replica')
+
+        self.assertFalse(Recipe.objects.exists())
+
+
+class SharedCacheCheckTests(TestCase):
+
+    def test_replicas_need_shared_cache(self):
+        """Test replicas with a per-process cache fail the checks"""
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/tmp/recipe-api-check-cache',
+        }}
+
+        with override_settings(DATABASE_REPLICAS=['replica']):
+            errors = checks.check_shared_cache(None)
+            with override_settings(CACHES=shared):
+                self.assertEqual(checks.check_shared_cache(None), [])
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+        self.assertEqual(checks.check_shared_cache(None), [])
+
+    def test_deployments_need_shared_cache(self):
+        """Test deployments with a per-process cache fail the checks"""
+        errors = checks.check_deployed_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E002'])
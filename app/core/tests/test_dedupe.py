@@ -0,0 +1,112 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+
+from core import nutrition
+from core.models import Ingredient, Recipe, RecipeIngredient, \
+    RecipeSummary, Tag, Unit
+
+
+class MergeDuplicateNamesTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.soup = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price='4.50'
+        )
+        self.stew = Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=30, price='6.00'
+        )
+
+    def test_unique_normalized_name(self):
+        """Test a user cannot have two tags whose names normalize alike"""
+        tag = Tag.objects.create(user=self.user, name='  Quick  Meals ')
+        self.assertEqual(tag.normalized_name, 'quick meals')
+
+        with self.assertRaises(IntegrityError):
+            Tag.objects.create(user=self.user, name='QUICK MEALS')
+
+    def test_merge_rows_written_without_save(self):
+        """Test duplicates written in bulk are merged into the oldest"""
+        Ingredient.objects.bulk_create([
+            Ingredient(user=self.user, name='Salt', normalized_name='Salt'),
+            Ingredient(user=self.user, name='salt ', normalized_name='x'),
+            Ingredient(user=self.user, name='SALT', normalized_name='y'),
+        ])
+        salt, lower, upper = Ingredient.objects.order_by('id')
+        other = get_user_model().objects.create_user(
+            email='other@test.com',
+            password='test123'
+        )
+        kept = Ingredient.objects.create(user=other, name='salt')
+        self.soup.ingredients.add(salt, lower)
+        self.stew.ingredients.add(upper)
+        out = StringIO()
+
+        call_command('merge_duplicate_names', stdout=out)
+
+        rows = Ingredient.objects.order_by('id')
+        self.assertEqual(list(rows), [salt, kept])
+        self.assertEqual(rows[0].normalized_name, 'salt')
+        self.assertEqual(list(self.soup.ingredients.all()), [salt])
+        self.assertEqual(list(self.stew.ingredients.all()), [salt])
+        summary = RecipeSummary.objects.get(recipe=self.stew)
+        self.assertEqual(summary.ingredient_ids, [salt.id])
+        self.assertIn('2 duplicates merged, 1 names normalized',
+                      out.getvalue())
+
+    def test_merge_into_existing_name(self):
+        """Test a stale row is merged into a tag already holding its name"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.bulk_create([
+            Tag(user=self.user, name='VEGAN', normalized_name='')
+        ])
+        stale = Tag.objects.get(name='VEGAN')
+        self.soup.tags.add(stale)
+
+        call_command('merge_duplicate_names', stdout=StringIO())
+
+        self.assertEqual(list(Tag.objects.all()), [vegan])
+        self.assertEqual(list(self.soup.tags.all()), [vegan])
+
+    def test_merge_keeps_amounts(self):
+        """Test moved ingredient links keep their quantity and unit"""
+        cache.clear()
+        Ingredient.objects.bulk_create([
+            Ingredient(user=self.user, name='Salt', normalized_name='salt'),
+            Ingredient(user=self.user, name='SALT', normalized_name='x',
+                       calories=0, protein=0, fat=0, carbohydrates=0,
+                       cost_per_kg='1.00'),
+        ])
+        salt, upper = Ingredient.objects.order_by('id')
+        grams = Unit.objects.get(code='g')
+        self.soup.ingredients.add(upper, through_defaults={
+            'quantity': 5, 'unit': grams,
+        })
+        self.stew.ingredients.add(salt, through_defaults={
+            'quantity': 2, 'unit': grams,
+        })
+        self.stew.ingredients.add(upper, through_defaults={'quantity': 9})
+        nutrition.recipe_rollups([self.soup.id])
+
+        call_command('merge_duplicate_names', stdout=StringIO())
+
+        self.assertEqual(
+            sorted(RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient_id', 'quantity', 'unit_id'
+            )),
+            [(self.soup.id, salt.id, 5, grams.id),
+             (self.stew.id, salt.id, 2, grams.id)]
+        )
+        # The keeper has no nutrition data, the cached total is dropped
+        self.assertEqual(
+            nutrition.recipe_rollups([self.soup.id])[self.soup.id]['missing'],
+            1
+        )
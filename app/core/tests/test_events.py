@@ -0,0 +1,233 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from rest_framework.authtoken.models import Token
+
+from core import events
+from core.models import Recipe, Tag
+
+
+def stream_scope(key=None, method='GET'):
+    headers = [(b'authorization', f'Token {key}'.encode())] if key else []
+    return {'type': 'http', 'method': method,
+            'path': '/api/recipe/events/', 'headers': headers}
+
+
+class CoalesceTests(TestCase):
+
+    def test_last_event_of_each_object_kept(self):
+        """Test an object's events collapse into its latest one"""
+        result = events.coalesce([
+            {'event': 'created', 'kind': 'tag', 'id': 1},
+            {'event': 'updated', 'kind': 'recipe', 'id': 1},
+            {'event': 'updated', 'kind': 'tag', 'id': 1},
+            {'event': 'updated', 'kind': 'recipe', 'id': 2},
+            {'event': 'deleted', 'kind': 'recipe', 'id': 1},
+        ])
+
+        self.assertEqual(result, [
+            {'event': 'created', 'kind': 'tag', 'id': 1},
+            {'event': 'updated', 'kind': 'recipe', 'id': 2},
+            {'event': 'deleted', 'kind': 'recipe', 'id': 1},
+        ])
+
+
+class BrokerTests(TestCase):
+
+    async def test_local_broker_delivers_to_user_streams(self):
+        """Test events reach every stream of their user only"""
+        broker = events.LocalBroker()
+        first, second = broker.subscribe(1), broker.subscribe(1)
+        other = broker.subscribe(2)
+        event = {'event': 'updated', 'kind': 'tag', 'id': 3}
+
+        await sync_to_async(broker.publish)(1, [event])
+
+        self.assertEqual(await first.get(), [event])
+        self.assertEqual(await second.get(), [event])
+        self.assertFalse(other._ready.is_set())
+        broker.unsubscribe(first)
+        broker.unsubscribe(second)
+        self.assertEqual(broker.subscribed_users(), [2])
+
+    async def test_overflow(self):
+        """Test a stream falling behind is marked as overflowed"""
+        broker = events.LocalBroker(max_events=2)
+        subscription = broker.subscribe(1)
+
+        for pk in range(3):
+            broker.publish(1, [{'event': 'updated', 'kind': 'tag', 'id': pk}])
+        await asyncio.sleep(0)
+
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(await subscription.get(), [])
+
+    async def test_cache_broker_polls_published_events(self):
+        """Test events published through the cache reach the streams"""
+        cache.clear()
+        publisher, broker = events.CacheBroker(), events.CacheBroker()
+        broker._poller = 'started by the test'
+        subscription = broker.subscribe(1)
+        broker.poll()
+        first = {'event': 'created', 'kind': 'tag', 'id': 1}
+        second = {'event': 'deleted', 'kind': 'recipe', 'id': 2}
+
+        publisher.publish(1, [first])
+        publisher.publish(1, [second])
+        publisher.publish(2, [first])
+        broker.poll()
+
+        self.assertEqual(await subscription.get(), [first, second])
+        broker.poll()
+        await asyncio.sleep(0)
+        self.assertFalse(subscription._ready.is_set())
+
+    async def test_cache_broker_waits_for_batches_being_stored(self):
+        """Test a batch not stored yet is fetched again, not lost"""
+        cache.clear()
+        broker = events.CacheBroker()
+        broker._poller = 'started by the test'
+        subscription = broker.subscribe(1)
+        broker.poll()
+        event = {'event': 'created', 'kind': 'tag', 'id': 1}
+
+        # Published up to the sequence number only
+        cache.set(broker._key(1), 1)
+        broker.poll()
+        await asyncio.sleep(0)
+        self.assertFalse(subscription._ready.is_set())
+        cache.set(broker._key(1, 1), [event])
+        broker.poll()
+
+        self.assertFalse(subscription.overflowed)
+        self.assertEqual(await subscription.get(), [event])
+
+    async def test_cache_broker_lost_batches_overflow(self):
+        """Test a batch missing for longer than kept is reported lost"""
+        cache.clear()
+        broker = events.CacheBroker(timeout=0)
+        broker._poller = 'started by the test'
+        subscription = broker.subscribe(1)
+        broker.poll()
+
+        cache.set(broker._key(1), 1)
+        broker.poll()
+        broker.poll()
+        await asyncio.sleep(0)
+
+        self.assertTrue(subscription.overflowed)
+
+
+@override_settings(EVENTS_KEEPALIVE_SECONDS=0.05)
+class EventStreamTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@dulvin.com', 'testpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    async def start_stream(self):
+        stream = ApplicationCommunicator(events.event_stream,
+                                         stream_scope(self.token.key))
+        await stream.send_input({'type': 'http.request'})
+        start = await stream.receive_output(1)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'),
+                      start['headers'])
+        body = await stream.receive_output(1)
+        self.assertEqual(body['body'], b': connected\n\n')
+        return stream
+
+    async def receive_events(self, stream):
+        """Return the next body sent besides keepalives"""
+        while True:
+            body = (await stream.receive_output(1))['body']
+            if body != b': keepalive\n\n':
+                return body
+
+    async def stop_stream(self, stream):
+        await stream.send_input({'type': 'http.disconnect'})
+        await stream.wait(1)
+        self.assertEqual(events.get_broker().subscribed_users(), [])
+
+    def create_and_roll_back(self):
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                Tag.objects.create(user=self.user, name='Vegan')
+                raise ValueError
+
+    async def test_invalid_token_rejected(self):
+        """Test a stream needs a valid token"""
+        for scope in (stream_scope(), stream_scope('nope')):
+            stream = ApplicationCommunicator(events.event_stream, scope)
+            await stream.send_input({'type': 'http.request'})
+            start = await stream.receive_output(1)
+            self.assertEqual(start['status'], 401)
+            await stream.wait(1)
+
+    async def test_changes_streamed(self):
+        """Test creates, updates and deletes of the user are streamed"""
+        stream = await self.start_stream()
+        other = await sync_to_async(get_user_model().objects.create_user)(
+            'other@dulvin.com', 'testpass'
+        )
+
+        create_tag = sync_to_async(Tag.objects.create)
+        tag = await create_tag(user=self.user, name='Vegan')
+        await create_tag(user=other, name='Vegan')
+        body = await self.receive_events(stream)
+        self.assertEqual(
+            body,
+            b'event: created\ndata: {"kind": "tag", "id": %d}\n\n' % tag.id
+        )
+
+        recipe = await sync_to_async(Recipe.objects.create)(
+            user=self.user, title='Soup', time_minutes=5, price=1
+        )
+        await self.receive_events(stream)
+        await sync_to_async(recipe.tags.add)(tag)
+        body = await self.receive_events(stream)
+        self.assertEqual(
+            body,
+            b'event: updated\ndata: {"kind": "recipe", "id": %d}\n\n'
+            % recipe.id
+        )
+
+        await sync_to_async(tag.delete)()
+        body = await self.receive_events(stream)
+        if b'recipe' not in body:
+            # Published right after the tombstone, maybe sent apart
+            body += await self.receive_events(stream)
+        self.assertIn(b'event: deleted\ndata: {"kind": "tag"', body)
+        self.assertIn(b'event: updated\ndata: {"kind": "recipe"', body)
+        await self.stop_stream(stream)
+
+    async def test_rolled_back_changes_not_streamed(self):
+        """Test changes are only published once committed"""
+        stream = await self.start_stream()
+
+        await sync_to_async(self.create_and_roll_back)()
+
+        body = await stream.receive_output(1)
+        self.assertEqual(body['body'], b': keepalive\n\n')
+        await self.stop_stream(stream)
+
+    async def test_overflow_closes_stream(self):
+        """Test a stream too far behind is told to resync and closed"""
+        stream = await self.start_stream()
+        subscription = next(iter(
+            events.get_broker()._subscriptions[self.user.id]
+        ))
+
+        subscription.put(None)
+
+        body = await self.receive_events(stream)
+        self.assertEqual(body, b'event: overflow\ndata: {}\n\n')
+        await stream.wait(1)
@@ -0,0 +1,153 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from core import feed
+from core.models import Follow, Ingredient, Recipe
+
+
+def create_users(count, prefix='author'):
+    get_user_model().objects.bulk_create(
+        get_user_model()(email=f'{prefix}{index}@test.com')
+        for index in range(count)
+    )
+    return list(get_user_model().objects.filter(
+        email__startswith=prefix
+    ).order_by('id'))
+
+
+class FeedTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.authors = create_users(30)
+        rng = random.Random(0)
+        Recipe.objects.bulk_create(
+            Recipe(user=rng.choice(self.authors), title='Recipe',
+                   time_minutes=5, price='5.00',
+                   published=rng.random() < 0.8)
+            for _ in range(400)
+        )
+        self.followed = self.authors[:20]
+        Follow.objects.bulk_create(
+            Follow(follower=self.user, followee=author)
+            for author in self.followed
+        )
+
+    def expected(self):
+        return list(Recipe.objects.filter(
+            user__in=self.followed, published=True
+        ).order_by('-id').values_list('id', flat=True))
+
+    def test_pages_match_ordered_recipes(self):
+        """Test paging through the feed returns every recipe in order"""
+        ids, before = [], None
+        while True:
+            page = feed.feed_ids(self.user, before, size=7)
+            ids += page
+            if len(page) < 7:
+                break
+            before = page[-1]
+
+        self.assertEqual(ids, self.expected())
+
+    def test_skewed_authors(self):
+        """Test an author publishing a burst does not hide the others"""
+        Recipe.objects.bulk_create(
+            Recipe(user=self.followed[0], title='Burst', time_minutes=5,
+                   price='5.00', published=True)
+            for _ in range(50)
+        )
+
+        self.assertEqual(feed.feed_ids(self.user, size=60),
+                         self.expected()[:60])
+
+    def test_two_queries_for_many_authors(self):
+        """Test the feed query count does not grow with the authors"""
+        authors = create_users(1000, prefix='many')
+        Follow.objects.bulk_create(
+            Follow(follower=self.user, followee=author) for author in authors
+        )
+        Recipe.objects.bulk_create(
+            Recipe(user=author, title='Recipe', time_minutes=5,
+                   price='5.00', published=True)
+            for author in authors
+        )
+        self.followed += authors
+
+        with self.assertNumQueries(2):
+            ids = feed.feed_ids(self.user, size=20)
+
+        self.assertEqual(ids, self.expected()[:20])
+
+    def test_no_follows(self):
+        """Test the feed of a user following nobody is empty"""
+        Follow.objects.all().delete()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(feed.feed_ids(self.user), [])
+
+    def test_cached_page_invalidated_on_publish(self):
+        """Test pages are cached until a followed author publishes"""
+        def render(ids):
+            return ids
+
+        page = feed.cached_feed_page(self.user, None, 5, render)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                feed.cached_feed_page(self.user, None, 5, render), page
+            )
+
+        recipe = Recipe.objects.create(user=self.followed[3], title='New',
+                                       time_minutes=5, price='5.00',
+                                       published=True)
+
+        page = feed.cached_feed_page(self.user, None, 5, render)
+        self.assertEqual(page['results'][0], recipe.id)
+        self.assertEqual(page['next'], page['results'][-1])
+
+    def test_cached_page_invalidated_on_ingredient_change(self):
+        """Test renaming an ingredient drops the pages showing it"""
+        recipe = Recipe.objects.filter(user=self.followed[0],
+                                       published=True).first()
+        ingredient = Ingredient.objects.create(user=self.followed[0],
+                                               name='Salt')
+        recipe.ingredients.add(ingredient)
+        versions = feed.author_versions([self.followed[0].id])
+
+        ingredient.name = 'Sea salt'
+        ingredient.save()
+
+        self.assertNotEqual(
+            feed.author_versions([self.followed[0].id]), versions
+        )
+
+    def test_invalidation_independent_of_followers(self):
+        """Test an author's change drops the feeds without reading them"""
+        calls = []
+        page = feed.cached_feed_page(self.user, None, 5, list)
+
+        with self.assertNumQueries(0):
+            feed.invalidate_followers(self.followed[0].id)
+
+        self.assertEqual(
+            feed.cached_feed_page(self.user, None, 5, calls.append),
+            {'results': None, 'next': page['next']}
+        )
+        self.assertEqual(calls, [page['results']])
+
+    def test_cached_page_kept_for_unfollowed_authors(self):
+        """Test publishing by others keeps the cached pages"""
+        feed.cached_feed_page(self.user, None, 5, list)
+
+        Recipe.objects.create(user=self.authors[-1], title='New',
+                              time_minutes=5, price='5.00', published=True)
+
+        with self.assertNumQueries(0):
+            feed.cached_feed_page(self.user, None, 5, list)
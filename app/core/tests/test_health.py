@@ -0,0 +1,55 @@
+from unittest.mock import patch
+
+from django.db.utils import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+
+from core import health
+
+HEALTHZ_URL = reverse('core:healthz')
+READYZ_URL = reverse('core:readyz')
+
+
+class HealthEndpointTests(TestCase):
+
+    def setUp(self):
+        health._migrated_aliases.clear()
+
+    def test_healthz(self):
+        """Test the liveness probe answers without touching the database"""
+        with self.assertNumQueries(0):
+            res = self.client.get(HEALTHZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['status'], 'ok')
+
+    def test_readyz_ready(self):
+        """Test the readiness probe with a migrated database"""
+        res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['checks'],
+                         {'database': 'ok', 'migrations': 'ok'})
+
+    def test_readyz_is_cheap_once_migrated(self):
+        """Test repeated polls only run a single query"""
+        self.client.get(READYZ_URL)
+
+        with self.assertNumQueries(1):
+            self.client.get(READYZ_URL)
+
+    @patch('core.views.check_database', side_effect=OperationalError)
+    def test_readyz_database_down(self, cd):
+        """Test the readiness probe fails when the database is down"""
+        res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['checks']['database'], 'unavailable')
+
+    @patch('core.views.check_migrations', return_value=False)
+    def test_readyz_migrations_pending(self, cm):
+        """Test the readiness probe fails with unapplied migrations"""
+        res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['checks']['migrations'], 'pending')
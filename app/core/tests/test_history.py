@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from core import history
+from core.models import Recipe, RecipeVersion, Tag
+
+
+@override_settings(RECIPE_HISTORY_CHECKPOINT_INTERVAL=3)
+class RecipeHistoryTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price='4.50'
+        )
+
+    def save(self, **fields):
+        for name, value in fields.items():
+            setattr(self.recipe, name, value)
+        self.recipe.save()
+        return history.record_version(self.recipe)
+
+    def test_first_version_is_checkpoint(self):
+        """Test the first version stores the full state"""
+        version = history.record_version(self.recipe)
+
+        self.assertEqual(version.number, 1)
+        self.assertTrue(version.checkpoint)
+        self.assertEqual(version.data['title'], 'Soup')
+        self.assertEqual(version.data['price'], '4.50')
+        self.assertEqual(version.data['tags'], [])
+
+    def test_deltas_store_only_changes(self):
+        """Test later versions only store the changed values"""
+        history.record_version(self.recipe)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+
+        version = self.save(title='Stew')
+
+        self.assertFalse(version.checkpoint)
+        self.assertEqual(version.data, {
+            'title': 'Stew', 'tags': {'add': [tag.id], 'remove': []}
+        })
+        self.assertEqual(version.changed, ['tags', 'title'])
+
+    def test_unchanged_recipe_not_recorded(self):
+        """Test saving without changes does not add a version"""
+        history.record_version(self.recipe)
+
+        self.assertIsNone(history.record_version(self.recipe))
+        self.assertEqual(RecipeVersion.objects.count(), 1)
+
+    def test_checkpoints_bound_reconstruction(self):
+        """Test every interval a checkpoint is taken and used"""
+        history.record_version(self.recipe)
+        for minutes in range(11, 17):
+            self.save(time_minutes=minutes)
+
+        self.assertEqual(
+            list(RecipeVersion.objects.filter(checkpoint=True)
+                 .values_list('number', flat=True).order_by('number')),
+            [1, 4, 7]
+        )
+        for number in range(1, 8):
+            state = history.version_state(self.recipe.id, number)
+            self.assertEqual(state['time_minutes'], 9 + number)
+        self.assertIsNone(history.version_state(self.recipe.id, 8))
+
+        with self.assertNumQueries(1):
+            history.version_state(self.recipe.id, 6)
+
+    def test_diff_versions(self):
+        """Test the diff between two versions"""
+        first = Tag.objects.create(user=self.user, name='Vegan')
+        second = Tag.objects.create(user=self.user, name='Quick')
+        self.recipe.tags.add(first)
+        history.record_version(self.recipe)
+        self.recipe.tags.set([second])
+        self.save(price='6.00')
+
+        self.assertEqual(history.diff_versions(self.recipe.id, 1, 2), {
+            'price': {'from': '4.50', 'to': '6.00'},
+            'tags': {'added': [second.id], 'removed': [first.id]},
+        })
+        self.assertEqual(history.diff_versions(self.recipe.id, 2, 2), {})
+        self.assertIsNone(history.diff_versions(self.recipe.id, 1, 5))
+
+    def test_servings_versioned(self):
+        """Test servings are diffed and restored like the other fields"""
+        history.record_version(self.recipe)
+        self.save(servings=4)
+
+        self.assertEqual(history.diff_versions(self.recipe.id, 1, 2), {
+            'servings': {'from': None, 'to': 4},
+        })
+
+        history.restore_state(self.recipe,
+                              history.version_state(self.recipe.id, 1))
+
+        self.recipe.refresh_from_db()
+        self.assertIsNone(self.recipe.servings)
+
+    def test_versions_before_servings(self):
+        """Test versions recorded without servings read it as unknown"""
+        version = history.record_version(self.recipe)
+        del version.data['servings']
+        version.save()
+
+        self.assertIsNone(
+            history.version_state(self.recipe.id, 1)['servings']
+        )
+
+    def test_restore_state(self):
+        """Test restoring a version records it as a new version"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        history.record_version(self.recipe)
+        self.recipe.tags.clear()
+        self.save(title='Stew', image='uploads/recipe/a.jpg')
+
+        version = history.restore_state(
+            self.recipe, history.version_state(self.recipe.id, 1)
+        )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'Soup')
+        self.assertFalse(self.recipe.image)
+        self.assertEqual(list(self.recipe.tags.all()), [tag])
+        self.assertEqual(version.number, 3)
+        self.assertEqual(self.recipe.summary.title, 'Soup')
@@ -0,0 +1,122 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import IdempotencyKey, Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class IdempotencyKeyTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.payload = {'title': 'Soup', 'time_minutes': 10,
+                        'price': '4.50', 'tags': [], 'ingredients': []}
+
+    def post(self, url, payload, key='retry-1'):
+        return self.client.post(url, payload, format='json',
+                                HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_response(self):
+        """Test a retried create returns the first response"""
+        first = self.post(RECIPE_URL, self.payload)
+        with self.assertNumQueries(1):
+            retry = self.post(RECIPE_URL, self.payload)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_keys_scoped(self):
+        """Test other keys and other users run the request again"""
+        self.post(RECIPE_URL, self.payload)
+        self.post(RECIPE_URL, self.payload, key='retry-2')
+        other = get_user_model().objects.create_user('other@test.com',
+                                                     'test123')
+        self.client.force_authenticate(other)
+        self.post(RECIPE_URL, self.payload)
+        self.client.post(RECIPE_URL, self.payload, format='json')
+
+        self.assertEqual(Recipe.objects.count(), 4)
+
+    def test_replay_keeps_status(self):
+        """Test the 200 of an existing tag is replayed as is"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        first = self.post(TAGS_URL, {'name': 'vegan'})
+        retry = self.post(TAGS_URL, {'name': 'vegan'})
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data, first.data)
+
+    def test_key_reused_for_other_request(self):
+        """Test reusing a key with another body is rejected"""
+        self.post(RECIPE_URL, self.payload)
+        res = self.post(RECIPE_URL, {**self.payload, 'title': 'Stew'})
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_request_in_progress(self):
+        """Test a duplicate of a running request gets a conflict"""
+        self.post(RECIPE_URL, self.payload)
+        IdempotencyKey.objects.update(status=None, data=None)
+
+        res = self.post(RECIPE_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_abandoned_claim_taken_over(self):
+        """Test a retry runs once the claim outlived its timeout"""
+        self.post(RECIPE_URL, self.payload)
+        IdempotencyKey.objects.update(
+            status=None, data=None,
+            claimed_at=timezone.now() - timedelta(seconds=61)
+        )
+
+        res = self.post(RECIPE_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(IdempotencyKey.objects.get().status,
+                         status.HTTP_201_CREATED)
+        self.assertEqual(self.post(RECIPE_URL, self.payload).data, res.data)
+
+    def test_invalid_request_not_stored(self):
+        """Test a rejected request can be retried with the same key"""
+        res = self.post(RECIPE_URL, {'title': 'Soup'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expire_keys(self):
+        """Test expired keys are deleted and run again"""
+        self.post(RECIPE_URL, self.payload)
+        self.post(RECIPE_URL, self.payload, key='retry-2')
+        IdempotencyKey.objects.filter(key='retry-1').update(
+            created=timezone.now() - timedelta(hours=25)
+        )
+        out = StringIO()
+
+        call_command('expire_idempotency_keys', stdout=out)
+        self.post(RECIPE_URL, self.payload)
+
+        self.assertIn('1 keys deleted', out.getvalue())
+        self.assertEqual(Recipe.objects.count(), 3)
@@ -0,0 +1,127 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe, Tag
+from recipe.views import RecipeViewSet
+
+METRICS_URL = reverse('core:metrics')
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0)
+class RequestMetricsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        metrics.registry.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        """Test sampled responses carry a Server-Timing header"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL)
+
+        timing = res['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_metrics_recorded_per_action(self):
+        """Test metrics are aggregated per view and action"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price='5.00'
+        )
+        self.client.get(RECIPE_URL)
+        self.client.get(RECIPE_URL)
+        self.client.get(reverse('recipe:recipe-detail', args=[recipe.id]))
+
+        snapshot = metrics.registry.snapshot()
+
+        self.assertEqual(snapshot['RecipeViewSet.list']['requests'], 2)
+        self.assertEqual(snapshot['RecipeViewSet.retrieve']['requests'], 1)
+        self.assertGreater(snapshot['RecipeViewSet.list']['queries'], 0)
+        self.assertGreater(
+            snapshot['RecipeViewSet.list']['serialize_seconds'], 0
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint(self):
+        """Test the metrics are exposed in Prometheus format"""
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        body = res.content.decode()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('recipe_api_requests_total{view="TagViewSet.list"} 1',
+                      body)
+        self.assertIn('# TYPE recipe_api_request_duration_seconds histogram',
+                      body)
+        self.assertIn(
+            'recipe_api_request_duration_seconds_bucket'
+            '{view="TagViewSet.list",le="+Inf"} 1',
+            body
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_restricted(self):
+        """Test only staff and requests with the token read the metrics"""
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+        self.assertEqual(
+            self.client.get(METRICS_URL,
+                            HTTP_AUTHORIZATION='Bearer wrong').status_code,
+            403
+        )
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.login(email='test@test.com', password='test123')
+
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 200)
+
+    def test_serializer_wrapped_when_sampled(self):
+        """Test sampled requests time the serializer without changing it"""
+        view = RecipeViewSet(request=None, format_kwarg=None,
+                             action='create')
+        metrics.activate(metrics.RequestMetrics())
+        try:
+            serializer = view.get_serializer(data={'title': 'Soup'})
+            serializer.context['extra'] = True
+        finally:
+            metrics.deactivate()
+
+        self.assertIsInstance(serializer, metrics.TimedSerializer)
+        self.assertIs(type(serializer.serializer),
+                      view.get_serializer_class())
+        self.assertTrue(serializer.serializer.context['extra'])
+        self.assertIs(type(view.get_serializer(data={})),
+                      view.get_serializer_class())
+
+    @override_settings(METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_not_measured(self):
+        """Test requests outside the sample are left untouched"""
+        res = self.client.get(TAGS_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(metrics.registry.snapshot(), {})
+
+    @patch('core.middleware.random.random', return_value=0.5)
+    def test_sample_rate(self, rand):
+        """Test the sample rate decides which requests are measured"""
+        with self.settings(METRICS_SAMPLE_RATE=0.4):
+            self.assertNotIn('Server-Timing', self.client.get(TAGS_URL))
+        with self.settings(METRICS_SAMPLE_RATE=0.6):
+            self.assertIn('Server-Timing', self.client.get(TAGS_URL))
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from core import nutrition
+from core.models import Ingredient, Recipe, RecipeIngredient, Unit
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('test@test.com',
+                                                         'test123')
+        self.flour = Ingredient.objects.create(
+            user=self.user, name='Flour', calories=360, protein=10, fat=1,
+            carbohydrates=76, cost_per_kg='2.00', grams_per_ml=0.5
+        )
+        self.egg = Ingredient.objects.create(
+            user=self.user, name='Egg', calories=140, protein=12, fat=10,
+            carbohydrates=1, cost_per_kg='6.00', grams_per_piece=50
+        )
+        self.bread = self.sample_recipe('Bread')
+        self.link(self.bread, self.flour, '0.5', 'kg')
+        self.link(self.bread, self.egg, '2', 'piece')
+
+    def sample_recipe(self, title):
+        return Recipe.objects.create(user=self.user, title=title,
+                                     time_minutes=30, price='5.00')
+
+    def link(self, recipe, ingredient, quantity=None, unit=None):
+        recipe.ingredients.add(ingredient, through_defaults={
+            'quantity': quantity,
+            'unit': unit and Unit.objects.get(code=unit),
+        })
+
+    def test_totals_over_units(self):
+        """Test quantities in mass, volume and count units are summed"""
+        cake = self.sample_recipe('Cake')
+        self.link(cake, self.flour, '2', 'cup')
+
+        rollups = nutrition.compute_rollups([self.bread.id, cake.id])
+
+        self.assertEqual(rollups[self.bread.id], {
+            'grams': 600.0, 'calories': 1940.0, 'protein': 62.0,
+            'fat': 15.0, 'carbohydrates': 381.0, 'cost': '1.60',
+            'missing': 0,
+        })
+        # 2 cups of 236.6 ml at 0.5 g per ml
+        self.assertEqual(rollups[cake.id]['grams'], 236.6)
+        self.assertEqual(rollups[cake.id]['cost'], '0.47')
+
+    def test_unknown_links_counted_as_missing(self):
+        """Test links without quantity or data are reported missing"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        milk = Ingredient.objects.create(
+            user=self.user, name='Milk', calories=60, protein=3, fat=3,
+            carbohydrates=5, cost_per_kg='1.00'
+        )
+        self.link(self.bread, salt, '5', 'g')
+        self.link(self.bread, milk, '200', 'ml')
+        empty = self.sample_recipe('Empty')
+
+        rollups = nutrition.compute_rollups([self.bread.id, empty.id])
+
+        self.assertEqual(rollups[self.bread.id]['missing'], 2)
+        self.assertEqual(rollups[self.bread.id]['grams'], 605.0)
+        self.assertEqual(rollups[empty.id], nutrition.empty_rollup())
+
+    def test_rollups_cached(self):
+        """Test cached rollups are read without queries"""
+        nutrition.recipe_rollups([self.bread.id])
+
+        with self.assertNumQueries(0):
+            rollups = nutrition.recipe_rollups([self.bread.id])
+
+        self.assertEqual(rollups[self.bread.id]['grams'], 600.0)
+
+    def assert_recomputed(self, change, grams):
+        nutrition.recipe_rollups([self.bread.id])
+        change()
+        self.assertEqual(
+            nutrition.recipe_rollups([self.bread.id])[self.bread.id]['grams'],
+            grams
+        )
+
+    def test_ingredient_change_invalidates(self):
+        """Test changing an ingredient's data drops the cached rollups"""
+        def change():
+            self.egg.grams_per_piece = 60
+            self.egg.save()
+
+        self.assert_recomputed(change, 620.0)
+
+    def test_link_changes_invalidate(self):
+        """Test removing a link or changing its quantity drops the rollup"""
+        def change_quantity():
+            link = RecipeIngredient.objects.get(recipe=self.bread,
+                                                ingredient=self.flour)
+            link.quantity = 1
+            link.save()
+
+        self.assert_recomputed(change_quantity, 1100.0)
+        self.assert_recomputed(lambda: self.bread.ingredients.remove(
+            self.flour
+        ), 100.0)
+        self.assert_recomputed(self.egg.delete, 0)
+
+    def test_unit_change_invalidates(self):
+        """Test changing a unit drops every cached rollup"""
+        def change():
+            Unit.objects.filter(code='piece').update(factor=2)
+            Unit.objects.get(code='piece').save()
+
+        self.assert_recomputed(change, 700.0)
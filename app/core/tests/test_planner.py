@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core import planner
+from core.models import Recipe, Tag
+
+
+def candidates(rows, quota_tags=()):
+    """Candidates from (minutes, price, tag ids), ids counting from 1"""
+    return planner.Candidates(
+        [(pk, minutes, price, tags)
+         for pk, (minutes, price, tags) in enumerate(rows, 1)],
+        quota_tags
+    )
+
+
+class PlanMealsTests(TestCase):
+
+    def test_budgets_quotas_and_repeats_respected(self):
+        """Test every day fits its budgets and the quotas are met"""
+        rows = [(10 + pk % 50, pk % 17 + 1, [pk % 4]) for pk in range(200)]
+        options = candidates(rows, quota_tags=[1, 2])
+
+        days = planner.plan_meals(options, 7, 3, daily_time=90,
+                                  daily_price=2000, quotas=[6, 4], seed=5)
+
+        self.assertEqual([len(meals) for meals in days], [3] * 7)
+        ids = [pk for meals in days for pk in meals]
+        self.assertEqual(len(set(ids)), 21)
+        for meals in days:
+            self.assertLessEqual(sum(rows[pk - 1][0] for pk in meals), 90)
+            self.assertLessEqual(
+                sum(int(rows[pk - 1][1] * 100) for pk in meals), 2000
+            )
+        self.assertGreaterEqual(sum(rows[pk - 1][2] == [1] for pk in ids), 6)
+        self.assertGreaterEqual(sum(rows[pk - 1][2] == [2] for pk in ids), 4)
+
+    def test_backtracks_out_of_dead_ends(self):
+        """Test a meal leaving no room for the next one is taken back"""
+        # Only the 30 minute recipes leave room for a second meal
+        options = candidates([(50, 1, []), (50, 1, []), (30, 1, []),
+                              (30, 1, [])])
+
+        for seed in range(10):
+            days = planner.plan_meals(options, 1, 2, daily_time=60,
+                                      seed=seed)
+            self.assertEqual(sorted(days[0]), [3, 4])
+
+    def test_repeat_after_days(self):
+        """Test recipes only come back after repeat_after_days"""
+        options = candidates([(10, 1, []), (10, 1, [])])
+
+        days = planner.plan_meals(options, 4, 1, repeat_after_days=2,
+                                  seed=1)
+
+        self.assertEqual(days[0], days[2])
+        self.assertEqual(days[1], days[3])
+        self.assertNotEqual(days[0], days[1])
+        with self.assertRaises(planner.PlanNotFound) as raised:
+            planner.plan_meals(options, 3, 1)
+        self.assertFalse(raised.exception.timed_out)
+
+    def test_same_seed_same_plan(self):
+        """Test a seed always gives the same plan, others vary it"""
+        options = candidates([(pk % 30 + 5, 2, []) for pk in range(100)])
+
+        plans = [planner.plan_meals(options, 5, 3, seed=seed)
+                 for seed in (1, 1, 2)]
+
+        self.assertEqual(plans[0], plans[1])
+        self.assertNotEqual(plans[0], plans[2])
+
+    def test_infeasible_quota(self):
+        """Test a quota more than its recipes can cover is refused"""
+        options = candidates([(10, 1, [1]), (10, 1, [])] * 5, quota_tags=[1])
+
+        with self.assertRaises(planner.PlanNotFound) as raised:
+            planner.plan_meals(options, 3, 3, quotas=[6])
+        self.assertFalse(raised.exception.timed_out)
+
+    def test_step_cap(self):
+        """Test the search gives up after max_steps meals placed"""
+        # Every day needs a 10 minute meal, there are only two
+        options = candidates([(10, 1, [])] * 2 +
+                             [(40, 1 + pk / 100, []) for pk in range(40)])
+
+        with self.assertRaises(planner.PlanNotFound) as raised:
+            planner.plan_meals(options, 3, 2, daily_time=50, max_steps=50)
+        self.assertTrue(raised.exception.timed_out)
+
+
+class LoadCandidatesTests(TestCase):
+
+    def test_per_meal_limits_and_excluded_tags(self):
+        """Test only the user's live recipes within the limits are read"""
+        user = get_user_model().objects.create_user('test@test.com',
+                                                    'test123')
+        other = get_user_model().objects.create_user('other@test.com',
+                                                     'test123')
+        meat = Tag.objects.create(user=user, name='Meat')
+        vegan = Tag.objects.create(user=user, name='Vegan')
+        soup = Recipe.objects.create(user=user, title='Soup',
+                                     time_minutes=10, price='4.50')
+        soup.tags.add(vegan)
+        Recipe.objects.create(user=user, title='Roast', time_minutes=90,
+                              price='4.50')
+        Recipe.objects.create(user=user, title='Caviar', time_minutes=5,
+                              price='90.00')
+        Recipe.objects.create(user=user, title='Steak', time_minutes=15,
+                              price='9.00').tags.add(meat)
+        Recipe.objects.create(user=user, title='Gone', time_minutes=5,
+                              price='1.00').soft_delete()
+        Recipe.objects.create(user=other, title='Salad', time_minutes=5,
+                              price='1.00')
+
+        options = planner.load_candidates(user, max_time=30, max_price=50,
+                                          exclude_tags=[meat.id],
+                                          quota_tags=[vegan.id])
+
+        self.assertEqual(list(options.ids), [soup.id])
+        self.assertEqual(list(options.prices), [450])
+        self.assertEqual(list(options.masks), [1])
@@ -0,0 +1,240 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import history
+from core.benchmarks.seed import seed
+from core.models import AccountDeletion, Ingredient, Recipe, \
+    RecipeSummary, RecipeVersion, Tag
+from core.purge import delete_account, delete_rows, \
+    orphaned_upload_files, request_account_deletion
+
+
+class PurgeTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+
+    def sample_recipe(self, image=None):
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price='5.00'
+        )
+        recipe.tags.add(self.tag)
+        history.record_version(recipe)
+        if image:
+            recipe.image.save(image, ContentFile(b'x' * 10))
+        return recipe
+
+    def age(self, recipe, hours):
+        Recipe.all_objects.filter(id=recipe.id).update(
+            deleted_at=timezone.now() - timedelta(hours=hours)
+        )
+
+    def purge(self, *args):
+        out = StringIO()
+        call_command('purge_deleted_recipes', *args, stdout=out)
+        return out.getvalue()
+
+    def test_soft_delete_hides_recipe(self):
+        """Test soft-deleted recipes are hidden but kept"""
+        recipe = self.sample_recipe()
+
+        recipe.soft_delete()
+
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(self.tag.recipe_set.exists())
+        self.assertTrue(Recipe.all_objects.filter(id=recipe.id).exists())
+        self.assertFalse(RecipeSummary.objects.exists())
+
+    def test_delete_rows_cascades_without_loading(self):
+        """Test dependent rows are deleted with one statement per table"""
+        recipes = [self.sample_recipe() for _ in range(3)]
+
+        with self.assertNumQueries(7):
+            deleted = delete_rows(Recipe, id__in=[r.id for r in recipes])
+
+        self.assertEqual(deleted, {
+            'core.Recipe': 3, 'core.Recipe_tags': 3,
+            'core.RecipeSummary': 3, 'core.RecipeVersion': 3,
+        })
+        self.assertTrue(Tag.objects.filter(id=self.tag.id).exists())
+
+    def test_purge_removes_rows_and_images(self):
+        """Test purging deletes old soft-deleted recipes and their files"""
+        purged = self.sample_recipe(image='old.jpg')
+        recent = self.sample_recipe(image='recent.jpg')
+        kept = self.sample_recipe()
+        for recipe in (purged, recent):
+            recipe.soft_delete()
+        self.age(purged, 48)
+
+        output = self.purge('--older-than', '24', '--batch-size', '1')
+
+        self.assertIn('3 rows deleted in 1 batches', output)
+        self.assertIn('1 files removed, 10 bytes reclaimed', output)
+        self.assertFalse(default_storage.exists(purged.image.name))
+        self.assertTrue(default_storage.exists(recent.image.name))
+        self.assertEqual(
+            set(Recipe.all_objects.values_list('id', flat=True)),
+            {recent.id, kept.id}
+        )
+        self.assertEqual(RecipeVersion.objects.count(), 2)
+
+    def test_purge_in_batches(self):
+        """Test large purges are split in batches"""
+        for _ in range(5):
+            self.sample_recipe().soft_delete()
+
+        output = self.purge('--older-than', '0', '--batch-size', '2')
+
+        self.assertIn('in 3 batches', output)
+        self.assertFalse(Recipe.all_objects.exists())
+
+    def test_orphaned_upload_files(self):
+        """Test only old files no recipe refers to are orphans"""
+        recipe = self.sample_recipe(image='used.jpg')
+        recipe.soft_delete()
+        orphan = default_storage.save('uploads/recipe/orphan.jpg',
+                                      ContentFile(b'x' * 4))
+        default_storage.save('uploads/recipe/new.jpg', ContentFile(b'x'))
+        old = (timezone.now() - timedelta(hours=2)).timestamp()
+        for name in (orphan, recipe.image.name):
+            os.utime(default_storage.path(name), (old, old))
+
+        self.assertEqual(orphaned_upload_files(), [orphan])
+
+        output = self.purge()
+
+        self.assertIn('1 files removed, 4 bytes reclaimed', output)
+        self.assertFalse(default_storage.exists(orphan))
+
+    def test_versioned_images_kept(self):
+        """Test images a version can restore are not swept"""
+        recipe = self.sample_recipe(image='first.jpg')
+        history.record_version(recipe)
+        first = recipe.image.name
+        recipe.image.save('second.jpg', ContentFile(b'y'))
+        history.record_version(recipe)
+        old = (timezone.now() - timedelta(hours=2)).timestamp()
+        os.utime(default_storage.path(first), (old, old))
+
+        self.purge()
+
+        self.assertTrue(default_storage.exists(first))
+        history.restore_state(recipe, history.version_state(recipe.id, 2))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, first)
+
+    def test_restore_of_missing_image(self):
+        """Test restoring an image whose file is gone clears it"""
+        recipe = self.sample_recipe(image='first.jpg')
+        history.record_version(recipe)
+        default_storage.delete(recipe.image.name)
+        recipe.image = None
+        recipe.save()
+
+        history.restore_state(recipe, history.version_state(recipe.id, 2))
+
+        recipe.refresh_from_db()
+        self.assertFalse(recipe.image)
+
+
+class AccountDeletionTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user, self.other = seed(users=2, recipes=600, tags=30,
+                                     ingredients=60)
+        self.images = []
+        for recipe in Recipe.objects.filter(user=self.user)[:3]:
+            recipe.image.save('image.jpg', ContentFile(b'x' * 10))
+            self.images.append(recipe.image.name)
+        Recipe.objects.filter(user=self.user)[0].soft_delete()
+
+    def delete(self, *args):
+        out = StringIO()
+        call_command('delete_accounts', '--chunk-size', '200', *args,
+                     stdout=out)
+        return out.getvalue()
+
+    def assert_other_user_intact(self):
+        self.assertEqual(Recipe.objects.filter(user=self.other).count(), 600)
+        self.assertEqual(RecipeSummary.objects.filter(
+            user=self.other
+        ).count(), 600)
+        self.assertEqual(Recipe.tags.through.objects.filter(
+            recipe__user=self.other
+        ).count(), 600 * 3)
+
+    def test_delete_large_account(self):
+        """Test an account is deleted in chunks with its images"""
+        output = self.delete(self.user.email)
+
+        self.assertIn('3 files removed, 30 bytes reclaimed', output)
+        self.assertFalse(get_user_model().objects.filter(
+            id=self.user.id
+        ).exists())
+        for model in (Recipe.all_objects, Tag.objects, Ingredient.objects,
+                      RecipeSummary.objects):
+            self.assertFalse(model.filter(user=self.user).exists())
+        self.assertFalse(AccountDeletion.objects.exists())
+        for name in self.images:
+            self.assertFalse(default_storage.exists(name))
+        self.assert_other_user_intact()
+
+    def test_query_count_independent_of_rows(self):
+        """Test chunks are deleted without per row queries"""
+        chunks = delete_account(self.user.id, chunk_size=200)
+
+        with self.assertNumQueries(9):
+            deleted, _, _ = next(chunks)
+
+        self.assertEqual(deleted['core.Recipe'], 200)
+        self.assertEqual(deleted['core.RecipeIngredient'], 200 * 8)
+
+    def test_resume_interrupted_deletion(self):
+        """Test an interrupted deletion is finished by the next run"""
+        request_account_deletion(self.user)
+        chunks = delete_account(self.user.id, chunk_size=200)
+        next(chunks)
+        next(chunks)
+        chunks.close()
+        self.assertEqual(
+            Recipe.all_objects.filter(user=self.user).count(), 200
+        )
+
+        output = self.delete()
+
+        self.assertIn(f'User {self.user.id}:', output)
+        self.assertFalse(get_user_model().objects.filter(
+            id=self.user.id
+        ).exists())
+        self.assert_other_user_intact()
+
+    def test_unknown_email(self):
+        """Test queuing an unknown account fails"""
+        with self.assertRaises(CommandError):
+            self.delete('nobody@test.com')
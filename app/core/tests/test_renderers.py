@@ -0,0 +1,161 @@
+import datetime
+import io
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import Recipe, Tag, Ingredient
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from recipe import serializers
+
+
+class FastJSONRendererCompatibilityTests(TestCase):
+    """
+    The fast renderer must produce exactly the bytes of JSONRenderer
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Crème brûlée     "quoted"',
+            time_minutes=45, price=Decimal('7.50'), link='https://x.com'
+        )
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Ünï'))
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Egg')
+        )
+
+    def assertSameBytes(self, data, accepted_media_type=None):
+        expected = JSONRenderer().render(data, accepted_media_type)
+        actual = FastJSONRenderer().render(data, accepted_media_type)
+        self.assertEqual(actual, expected)
+
+    def test_recipe_list(self):
+        """Test recipe list payloads render identically"""
+        recipes = Recipe.objects.all()
+        self.assertSameBytes(
+            serializers.RecipeSerializer(recipes, many=True).data
+        )
+        self.assertSameBytes(
+            serializers.RecipeListSerializer(recipes, many=True).data
+        )
+
+    def test_recipe_detail(self):
+        """Test nested recipe detail payloads render identically"""
+        self.assertSameBytes(
+            serializers.RecipeDetailSerializer(self.recipe).data
+        )
+
+    def test_image_url(self):
+        """Test absolute image URLs render identically"""
+        self.recipe.image = 'uploads/recipe/ümlaut image.jpg'
+        request = APIRequestFactory().get('/')
+        data = serializers.RecipeImageSerializer(
+            self.recipe, context={'request': request}
+        ).data
+
+        self.assertIn('http://testserver/media/', data['image'])
+        self.assertSameBytes(data)
+        self.assertSameBytes({'id': 1, 'image': None})
+
+    def test_decimals(self):
+        """Test raw Decimal values render identically"""
+        self.assertSameBytes({
+            'price': Decimal('5.00'),
+            'prices': [Decimal('0.10'), Decimal('999.99'), Decimal('-1.5')],
+        })
+
+    def test_other_types(self):
+        """Test values handled by the DRF encoder render identically"""
+        self.assertSameBytes({
+            'created': datetime.datetime(
+                2021, 5, 1, 10, 30, 15, 123456, tzinfo=datetime.timezone.utc
+            ),
+            'day': datetime.date(2021, 5, 1),
+            'time': datetime.time(10, 30),
+            'duration': datetime.timedelta(minutes=5),
+            'uuid': uuid.UUID('12345678123456781234567812345678'),
+            'lazy': gettext_lazy('Lazy'),
+            'nested': {'empty': [], 'none': None, 'flag': True, 1: 'int'},
+            'tuple': (1, 'two'),
+        })
+
+    def test_big_integers_fall_back(self):
+        """Test integers orjson cannot encode use the stdlib renderer"""
+        self.assertSameBytes({'big': 2 ** 70})
+
+    def test_non_finite_floats_rejected(self):
+        """Test NaN and infinity raise like the strict JSONRenderer"""
+        for value in (float('nan'), float('inf'), [{'x': -float('inf')}],
+                      Decimal('NaN')):
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({'value': value})
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'value': value})
+        self.assertSameBytes({'none': None, 'value': 1.5})
+
+    def test_indent_falls_back(self):
+        """Test pretty printed output matches JSONRenderer"""
+        self.assertSameBytes({'a': [1, 2]}, 'application/json; indent=4')
+
+    def test_none(self):
+        """Test None renders an empty body"""
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    @patch('core.renderers.orjson', None)
+    def test_without_orjson(self):
+        """Test the renderer works without orjson installed"""
+        self.assertSameBytes(
+            serializers.RecipeDetailSerializer(self.recipe).data
+        )
+
+    def test_api_response(self):
+        """Test API responses are rendered by the fast renderer"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get('/api/recipe/recipe/')
+
+        self.assertIsInstance(res.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(res.content, JSONRenderer().render(res.data))
+
+
+class FastJSONParserTests(TestCase):
+
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), 'application/json',
+                            {'encoding': 'utf-8'})
+
+    def test_parse(self):
+        """Test the parser matches JSONParser"""
+        body = '{"title": "Crème", "tags": [1, 2], "price": 5.5}'.encode()
+
+        self.assertEqual(self.parse(FastJSONParser(), body),
+                         self.parse(JSONParser(), body))
+
+    def test_invalid_json(self):
+        """Test invalid bodies raise the same ParseError"""
+        for body in (b'{"title": ', b'{"price": NaN}'):
+            with self.assertRaises(ParseError) as fast:
+                self.parse(FastJSONParser(), body)
+            with self.assertRaises(ParseError) as default:
+                self.parse(JSONParser(), body)
+            self.assertEqual(str(fast.exception), str(default.exception))
+
+    @patch('core.parsers.orjson', None)
+    def test_without_orjson(self):
+        """Test the parser works without orjson installed"""
+        self.assertEqual(self.parse(FastJSONParser(), b'[1]'), [1])
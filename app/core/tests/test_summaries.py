@@ -0,0 +1,130 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Recipe, RecipeSummary, Tag, Ingredient
+from core.summaries import verify_summaries
+
+
+class RecipeSummaryTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price='4.50'
+        )
+
+    def summary(self):
+        return RecipeSummary.objects.get(recipe=self.recipe)
+
+    def test_summary_created_and_updated(self):
+        """Test saving a recipe maintains its summary"""
+        self.assertEqual(self.summary().title, 'Soup')
+
+        self.recipe.title = 'Stew'
+        self.recipe.save()
+
+        self.assertEqual(self.summary().title, 'Stew')
+        self.assertEqual(self.summary().user, self.user)
+
+    def test_links_added_and_removed(self):
+        """Test tag and ingredient links are copied to the summary"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+        self.recipe.tags.add(quick, vegan)
+        self.recipe.ingredients.add(salt)
+        summary = self.summary()
+        self.assertEqual(summary.tag_ids, [vegan.id, quick.id])
+        self.assertEqual(summary.tag_names, ['Vegan', 'Quick'])
+        self.assertEqual(summary.ingredient_names, ['Salt'])
+
+        self.recipe.tags.remove(vegan)
+        self.assertEqual(self.summary().tag_ids, [quick.id])
+
+        self.recipe.ingredients.clear()
+        self.assertEqual(self.summary().ingredient_ids, [])
+
+    def test_reverse_links(self):
+        """Test links changed from the tag side update the summary"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        tag.recipe_set.add(self.recipe)
+        self.assertEqual(self.summary().tag_ids, [tag.id])
+
+        tag.recipe_set.clear()
+        self.assertEqual(self.summary().tag_ids, [])
+
+    def test_rename_and_delete_tag(self):
+        """Test renamed and deleted tags are reflected in the summary"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+
+        tag.name = 'Plant Based'
+        tag.save()
+        self.assertEqual(self.summary().tag_names, ['Plant Based'])
+
+        tag.delete()
+        self.assertEqual(self.summary().tag_names, [])
+
+    def test_summary_deleted_with_recipe(self):
+        """Test deleting a recipe or its user removes the summary"""
+        self.recipe.delete()
+        self.assertFalse(RecipeSummary.objects.exists())
+
+        Recipe.objects.create(user=self.user, title='Soup', time_minutes=1,
+                              price='1.00').tags.add(
+            Tag.objects.create(user=self.user, name='Vegan')
+        )
+        self.user.delete()
+        self.assertFalse(RecipeSummary.objects.exists())
+
+
+class RebuildRecipeSummariesCommandTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.recipes = Recipe.objects.bulk_create([
+            Recipe(user=self.user, title=f'Recipe {i}', time_minutes=5,
+                   price='5.00')
+            for i in range(5)
+        ])
+        self.ids = list(Recipe.objects.values_list('id', flat=True))
+
+    def rebuild(self, *args):
+        out = StringIO()
+        call_command('rebuild_recipe_summaries', '--batch-size', '2', *args,
+                     stdout=out)
+        return out.getvalue()
+
+    def test_verify_reports_missing_summaries(self):
+        """Test verify finds summaries missed by bulk operations"""
+        output = self.rebuild('--verify')
+
+        self.assertIn('5 summaries wrong', output)
+        self.assertFalse(RecipeSummary.objects.exists())
+
+    def test_rebuild_fixes_stale_summaries(self):
+        """Test rebuild fixes missing and stale summaries"""
+        Recipe.objects.filter(id=self.ids[0]).update(title='Changed')
+
+        self.assertIn('5 summaries rebuilt', self.rebuild())
+        self.assertEqual(verify_summaries(self.ids), [])
+        self.assertEqual(
+            RecipeSummary.objects.get(recipe_id=self.ids[0]).title, 'Changed'
+        )
+        self.assertIn('0 summaries wrong', self.rebuild('--verify'))
+
+    def test_rebuild_all(self):
+        """Test --all rebuilds every summary"""
+        self.assertIn('5 summaries rebuilt', self.rebuild('--all'))
+        self.assertEqual(RecipeSummary.objects.count(), 5)
@@ -0,0 +1,108 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Change, Recipe, Tag
+from core.sync import LOG_LOCK, changes_since, deferred_changes, \
+    lock_logs, record_changes
+
+
+class ChangeLogTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+
+    def test_changes_logged(self):
+        """Test saves, link changes and deletes append to the log"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price='4.50'
+        )
+        recipe.tags.add(tag)
+        tag_id = tag.id
+        tag.delete()
+
+        self.assertEqual(list(Change.objects.order_by('id').values_list(
+            'kind', 'object_id', 'deleted'
+        )), [
+            ('tag', tag_id, False),
+            ('recipe', recipe.id, False),
+            ('recipe', recipe.id, False),
+            ('tag', tag_id, True),
+            ('recipe', recipe.id, False),
+        ])
+
+    def test_changes_handed_out_once_committed(self):
+        """Test a user's changes are visible as soon as they commit"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        changes, last_id, _ = changes_since(self.user)
+
+        self.assertEqual(changes['tag']['changed'], [tag.id])
+        self.assertEqual(last_id, Change.objects.get().id)
+
+    def test_logs_locked_on_postgresql(self):
+        """Test logging changes locks the users' logs in user order"""
+        connection = MagicMock(vendor='postgresql')
+        cursor = connection.cursor.return_value.__enter__.return_value
+
+        with patch('core.sync.connections', {'default': connection}):
+            lock_logs([7, 3, 7], 'default')
+
+        self.assertEqual(
+            [call.args[1] for call in cursor.execute.call_args_list],
+            [[LOG_LOCK, 3], [LOG_LOCK, 7]]
+        )
+
+    def test_deferred_changes_lock_once(self):
+        """Test changes logged in a block lock all their users at once"""
+        other = get_user_model().objects.create_user(
+            email='other@test.com',
+            password='test123'
+        )
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        Change.objects.all().delete()
+
+        with patch('core.sync.lock_logs') as lock, deferred_changes():
+            record_changes(other.id, Change.TAG, [5])
+            record_changes(self.user.id, Change.TAG, [tag.id])
+            record_changes(self.user.id, Change.TAG, [tag.id], deleted=True)
+            self.assertFalse(Change.objects.exists())
+
+        lock.assert_called_once()
+        self.assertEqual(sorted(lock.call_args.args[0]),
+                         sorted([other.id, self.user.id]))
+        self.assertEqual(list(Change.objects.order_by('id').values_list(
+            'user_id', 'object_id', 'deleted'
+        )), [(other.id, 5, False), (self.user.id, tag.id, True)])
+
+    def test_compact_change_log(self):
+        """Test compaction keeps the newest entry of each object"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        for name in ('Vegetarian', 'Vegan'):
+            tag.name = name
+            tag.save()
+        old = Tag.objects.create(user=self.user, name='Old')
+        old_id = old.id
+        old.delete()
+        Change.objects.filter(object_id=old_id).update(
+            created=timezone.now() - timedelta(days=31)
+        )
+        out = StringIO()
+
+        call_command('compact_change_log', stdout=out)
+
+        self.assertEqual(
+            list(Change.objects.values_list('kind', 'object_id', 'deleted')),
+            [('tag', tag.id, False)]
+        )
+        self.assertIn('3 superseded changes and 1 tombstones',
+                      out.getvalue())
@@ -0,0 +1,111 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import throttling
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class BucketTests(TestCase):
+
+    def assert_bucket(self, bucket, clock):
+        for _ in range(3):
+            self.assertEqual(bucket.consume('a', 1), (True, 0))
+        self.assertEqual(bucket.consume('a', 2), (False, 1.0))
+        self.assertTrue(bucket.consume('b', 3)[0])
+
+        clock.return_value += 1
+        self.assertTrue(bucket.consume('a', 2)[0])
+        self.assertFalse(bucket.consume('a', 1)[0])
+
+        clock.return_value += 100
+        self.assertTrue(bucket.consume('a', 3)[0])
+
+    @patch('core.throttling.time.monotonic', return_value=1000.0)
+    def test_local_memory_bucket(self, clock):
+        """Test buckets refill at the rate up to the burst"""
+        self.assert_bucket(throttling.LocalMemoryBucket(2, 3), clock)
+
+    @patch('core.throttling.time.time', return_value=1000.0)
+    def test_cache_bucket(self, clock):
+        """Test buckets shared through the cache behave the same"""
+        cache.clear()
+        self.assert_bucket(throttling.CacheBucket(2, 3), clock)
+
+    def test_local_memory_bucket_bounded(self):
+        """Test the least recently used buckets are dropped"""
+        bucket = throttling.LocalMemoryBucket(1, 5, max_keys=2)
+        for key in 'abc':
+            bucket.consume(key, 5)
+
+        self.assertEqual(list(bucket._buckets), ['b', 'c'])
+        self.assertTrue(bucket.consume('a', 5)[0])
+
+
+@override_settings(THROTTLE_ENABLED=True, THROTTLE_RATE=0.01,
+                   THROTTLE_BURST=10,
+                   THROTTLE_COSTS={'filter': 5, 'upload_image': 10})
+class ThrottleApiTests(TestCase):
+
+    def setUp(self):
+        throttling._buckets.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_requests_throttled(self):
+        """Test requests past the burst get 429 with Retry-After"""
+        for _ in range(10):
+            res = self.client.get(TAGS_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '100')
+
+    def test_filter_costs_more(self):
+        """Test filtered lists spend their cost weight"""
+        for _ in range(2):
+            res = self.client.get(RECIPE_URL, {'tags': '1,2'})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_buckets_per_token_and_user(self):
+        """Test each token, user and address has its own bucket"""
+        other = get_user_model().objects.create_user(
+            email='other@test.com',
+            password='test123'
+        )
+        token = Token.objects.create(user=other)
+        for _ in range(10):
+            self.client.get(TAGS_URL)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(client.get(TAGS_URL).status_code,
+                         status.HTTP_200_OK)
+        self.assertEqual(APIClient().get(TAGS_URL).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_disabled(self):
+        """Test no request is throttled when throttling is off"""
+        with self.settings(THROTTLE_ENABLED=False):
+            for _ in range(12):
+                res = self.client.get(TAGS_URL)
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
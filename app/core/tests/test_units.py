@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from core import units
+from core.models import Ingredient, Recipe, Unit
+
+
+class UnitGraphTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.graph = units.get_graph()
+
+    def assert_converts(self, quantity, code, system, expected):
+        converted, unit = self.graph.convert(quantity, code, system)
+        self.assertEqual((round(converted, 3), unit), expected)
+
+    def test_convert_to_metric(self):
+        """Test quantities go to the largest metric unit they fill"""
+        self.assert_converts(1, 'lb', Unit.METRIC, (453.592, 'g'))
+        self.assert_converts(3, 'lb', Unit.METRIC, (1.361, 'kg'))
+        self.assert_converts(4, 'cup', Unit.METRIC, (946.353, 'ml'))
+        self.assert_converts(1000, 'ml', Unit.METRIC, (1, 'l'))
+        self.assert_converts(0.2, 'g', Unit.METRIC, (200, 'mg'))
+
+    def test_convert_to_us(self):
+        """Test quantities go to the largest US customary unit they fill"""
+        self.assert_converts(3, 'tsp', Unit.US, (1, 'tbsp'))
+        self.assert_converts(250, 'ml', Unit.US, (1.057, 'cup'))
+        self.assert_converts(1, 'kg', Unit.US, (2.205, 'lb'))
+        self.assert_converts(1, 'ml', Unit.US, (0.203, 'tsp'))
+
+    def test_count_units_kept(self):
+        """Test units no system covers are left alone"""
+        self.assert_converts(2, 'dozen', Unit.METRIC, (2, 'dozen'))
+
+    def test_factors_memoized(self):
+        """Test factors are computed once per pair of units"""
+        self.assertAlmostEqual(self.graph.factor('kg', 'lb'), 2.2046226)
+        self.assertIn(('kg', 'lb'), self.graph._factors)
+        with self.assertRaises(ValueError):
+            self.graph.factor('kg', 'ml')
+
+    def test_graph_compiled_once(self):
+        """Test the graph is reused until a unit changes"""
+        with self.assertNumQueries(0):
+            self.assertIs(units.get_graph(), self.graph)
+
+        Unit.objects.create(code='stone', name='stone', dimension=Unit.MASS,
+                            factor=6350.29318, system=Unit.US)
+
+        graph = units.get_graph()
+        self.assertIsNot(graph, self.graph)
+        self.assertEqual(graph.convert(7, 'kg', Unit.US)[1], 'stone')
+
+
+class RecipeAmountsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user('test@test.com',
+                                                    'test123')
+        self.flour = Ingredient.objects.create(user=user, name='Flour')
+        self.milk = Ingredient.objects.create(user=user, name='Milk')
+        self.bread = Recipe.objects.create(user=user, title='Bread',
+                                           time_minutes=60, price='2.00',
+                                           servings=4)
+        self.soup = Recipe.objects.create(user=user, title='Soup',
+                                          time_minutes=20, price='3.00')
+        for recipe in (self.bread, self.soup):
+            recipe.ingredients.add(self.flour, through_defaults={
+                'quantity': '1.5', 'unit': Unit.objects.get(code='cup'),
+            })
+            recipe.ingredients.add(self.milk)
+
+    def test_amounts_scaled_and_converted(self):
+        """Test quantities are scaled per recipe and converted"""
+        ids = [self.bread.id, self.soup.id]
+        ratios = units.serving_ratios(ids, 6)
+        units.get_graph()
+
+        with self.assertNumQueries(1):
+            amounts = units.recipe_amounts(ids, ratios, Unit.METRIC)
+
+        self.assertEqual(ratios, {self.bread.id: 1.5})
+        self.assertEqual(amounts, {
+            self.bread.id: [{'ingredient': self.flour.id,
+                             'quantity': '532.324', 'unit': 'ml'}],
+            self.soup.id: [{'ingredient': self.flour.id,
+                            'quantity': '354.882', 'unit': 'ml'}],
+        })
+
+    def test_amounts_unchanged_by_default(self):
+        """Test quantities are kept as stored without scale or system"""
+        amounts = units.recipe_amounts([self.bread.id])
+
+        self.assertEqual(amounts[self.bread.id], [
+            {'ingredient': self.flour.id, 'quantity': '1.500', 'unit': 'cup'},
+        ])
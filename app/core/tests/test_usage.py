@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.models import Ingredient, Recipe, Tag
+from core.usage import refresh_usage
+
+
+class UsageCounterTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.soup = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price='4.50'
+        )
+        self.stew = Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=30, price='6.00'
+        )
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+
+    def usage(self, *objects):
+        return [type(obj).objects.get(pk=obj.pk).usage for obj in objects]
+
+    def test_add_and_remove_links(self):
+        """Test adding and removing links updates the counters"""
+        self.soup.tags.add(self.vegan, self.quick)
+        self.stew.tags.add(self.vegan)
+        self.soup.tags.add(self.vegan)
+        self.assertEqual(self.usage(self.vegan, self.quick), [2, 1])
+
+        self.soup.tags.remove(self.vegan)
+        self.stew.tags.remove(self.quick)
+        self.assertEqual(self.usage(self.vegan, self.quick), [1, 1])
+
+        self.soup.tags.set([self.vegan])
+        self.stew.tags.clear()
+        self.assertEqual(self.usage(self.vegan, self.quick), [1, 0])
+
+    def test_reverse_links(self):
+        """Test changing the recipes of a tag updates its counter"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        salt.recipe_set.add(self.soup, self.stew)
+        self.assertEqual(self.usage(salt), [2])
+
+        salt.recipe_set.remove(self.stew, self.stew)
+        self.assertEqual(self.usage(salt), [1])
+
+        salt.recipe_set.clear()
+        self.assertEqual(self.usage(salt), [0])
+
+    def test_deleted_recipes_not_counted(self):
+        """Test soft and hard deleted recipes no longer count"""
+        self.soup.tags.add(self.vegan)
+        self.stew.tags.add(self.vegan, self.quick)
+
+        self.soup.soft_delete()
+        self.assertEqual(self.usage(self.vegan, self.quick), [1, 1])
+        self.stew.delete()
+        self.assertEqual(self.usage(self.vegan, self.quick), [0, 0])
+
+    def test_refresh_usage(self):
+        """Test recounting fixes counters of links written in bulk"""
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe=self.soup, tag=self.vegan),
+            Recipe.tags.through(recipe=self.stew, tag=self.vegan),
+        ])
+        self.soup.soft_delete()
+
+        with self.assertNumQueries(1):
+            refresh_usage(Tag, Recipe.tags.through, 'tag')
+
+        self.assertEqual(self.usage(self.vegan, self.quick), [1, 0])
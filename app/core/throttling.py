@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.authtoken.models import Token
+from rest_framework.throttling import BaseThrottle
+
+
+def refill(tokens, updated_at, now, rate, burst):
+    """Return the tokens of a bucket after refilling it until now"""
+    return min(burst, tokens + (now - updated_at) * rate)
+
+
+def take(tokens, cost, rate):
+    """
+    Take cost tokens from a bucket
+
+    Returns (allowed, tokens left, seconds until the cost is available).
+    """
+    if tokens >= cost:
+        return True, tokens - cost, 0
+    return False, tokens, (cost - tokens) / rate
+
+
+class LocalMemoryBucket:
+    """
+    Token buckets kept in process memory, each worker process limits
+    on its own. The least recently used buckets are dropped past
+    max_keys, which only makes them full again.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, cost):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+            tokens = refill(tokens, updated_at, now, self.rate, self.burst)
+            allowed, tokens, wait = take(tokens, cost, self.rate)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucket:
+    """
+    Token buckets kept in a Django cache shared by all processes, e.g.
+    Redis or Memcached. The read and write are not atomic, concurrent
+    requests of one client may both spend the same tokens.
+    """
+
+    def __init__(self, rate, burst, alias='default'):
+        self.rate = rate
+        self.burst = burst
+        self.cache = caches[alias]
+
+    def consume(self, key, cost):
+        now = time.time()
+        key = f'throttle:{key}'
+        tokens, updated_at = self.cache.get(key, (self.burst, now))
+        tokens = refill(tokens, updated_at, now, self.rate, self.burst)
+        allowed, tokens, wait = take(tokens, cost, self.rate)
+        # Past this the bucket is full again, like a missing key
+        self.cache.set(key, (tokens, now),
+                       int((self.burst - tokens) / self.rate) + 1)
+        return allowed, wait
+
+
+_buckets = {}
+
+
+def get_bucket():
+    """Return the bucket backend configured by the THROTTLE_* settings"""
+    config = (settings.THROTTLE_BACKEND, settings.THROTTLE_RATE,
+              settings.THROTTLE_BURST)
+    if config not in _buckets:
+        options = dict(settings.THROTTLE_BACKEND_OPTIONS)
+        _buckets[config] = import_string(settings.THROTTLE_BACKEND)(
+            settings.THROTTLE_RATE, settings.THROTTLE_BURST, **options
+        )
+    return _buckets[config]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle spending a request's cost from the bucket of its token,
+    user, or address for anonymous requests
+
+    Views may define get_throttle_cost(request), the default cost is
+    THROTTLE_COSTS[view.action] or 1.
+    """
+
+    def get_cache_key(self, request):
+        if isinstance(request.auth, Token):
+            return f'token:{request.auth.key}'
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'anon:{self.get_ident(request)}'
+
+    def get_cost(self, request, view):
+        if hasattr(view, 'get_throttle_cost'):
+            cost = view.get_throttle_cost(request)
+        else:
+            cost = settings.THROTTLE_COSTS.get(getattr(view, 'action', None),
+                                               1)
+        # More than a full bucket could never be served
+        return min(cost, settings.THROTTLE_BURST)
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED:
+            return True
+
+        allowed, self._wait = get_bucket().consume(
+            self.get_cache_key(request), self.get_cost(request, view)
+        )
+        return allowed
+
+    def wait(self):
+        return self._wait
@@ -0,0 +1,120 @@
+from collections import defaultdict
+
+from core import nutrition
+from core.models import Recipe, RecipeIngredient, Unit
+
+# Units are picked once a quantity reaches one of them, give or take
+# the float error of the factors
+TOLERANCE = 1e-9
+
+
+class UnitGraph:
+    """
+    The units, each linked to the base unit of its dimension by its
+    factor, so any two units of a dimension are joined through it
+
+    Compiled once from the unit table: the units of each dimension and
+    system are kept largest first, and the factor between two units is
+    computed on first use and memoized.
+    """
+
+    def __init__(self, rows, token=None):
+        self.token = token
+        self.units = {}
+        self.targets = defaultdict(list)
+        for code, dimension, system, factor in rows:
+            self.units[code] = (dimension, factor)
+            if system:
+                self.targets[(dimension, system)].append((factor, code))
+        for targets in self.targets.values():
+            targets.sort(reverse=True)
+        self._factors = {}
+
+    def factor(self, source, target):
+        """Return the factor converting quantities of source to target"""
+        key = (source, target)
+        try:
+            return self._factors[key]
+        except KeyError:
+            pass
+        (dimension, source_factor), (other, target_factor) = \
+            self.units[source], self.units[target]
+        if dimension != other:
+            raise ValueError(f'Cannot convert {source} to {target}.')
+        factor = self._factors[key] = source_factor / target_factor
+        return factor
+
+    def convert(self, quantity, code, system):
+        """
+        Return (quantity, unit code) of a quantity in the largest unit
+        of the system it makes at least one of, the smallest if none
+
+        Quantities of units no system covers, e.g. pieces, are kept.
+        """
+        dimension, factor = self.units[code]
+        targets = self.targets.get((dimension, system))
+        if not targets:
+            return quantity, code
+        base = quantity * factor * (1 + TOLERANCE)
+        target = targets[-1][1]
+        for target_factor, target_code in targets:
+            if base >= target_factor:
+                target = target_code
+                break
+        return quantity * self.factor(code, target), target
+
+
+_graph = None
+
+
+def get_graph():
+    """
+    Return the graph of the unit table, compiled again after units
+    change, which also renews the token of the nutrition rollups
+    """
+    global _graph
+    token = nutrition.generation()
+    if _graph is None or _graph.token != token:
+        _graph = UnitGraph(Unit.objects.values_list(
+            'code', 'dimension', 'system', 'factor'
+        ), token)
+    return _graph
+
+
+def serving_ratios(recipe_ids, servings):
+    """
+    Return {recipe id: ratio} scaling the recipes to servings, for the
+    recipes whose servings are known
+    """
+    return {
+        pk: servings / base
+        for pk, base in Recipe.objects.filter(
+            id__in=recipe_ids, servings__isnull=False
+        ).values_list('id', 'servings')
+    }
+
+
+def recipe_amounts(recipe_ids, ratios=None, system=None):
+    """
+    Return {recipe id: amounts} of the recipes in one query, quantities
+    scaled by ratios[recipe id] if any and converted to the units of
+    system if given
+    """
+    ratios = ratios or {}
+    graph = get_graph() if system else None
+    amounts = {pk: [] for pk in recipe_ids}
+    for recipe_id, ingredient, quantity, code in \
+            RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids, quantity__isnull=False,
+                unit__isnull=False
+            ).order_by('recipe_id', 'ingredient_id').values_list(
+                'recipe_id', 'ingredient_id', 'quantity', 'unit__code'
+            ):
+        quantity = float(quantity) * ratios.get(recipe_id, 1)
+        if graph is not None:
+            quantity, code = graph.convert(quantity, code, system)
+        amounts[recipe_id].append({
+            'ingredient': ingredient, 'quantity': f'{quantity:.3f}',
+            'unit': code,
+        })
+    return amounts
@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from django.db import router
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from core.models import Ingredient, Recipe, Tag
+
+USAGE_RELATIONS = (
+    (Tag, Recipe.tags.through, 'tag'),
+    (Ingredient, Recipe.ingredients.through, 'ingredient'),
+)
+
+
+def change_usage(model, counts, using=None, sign=1):
+    """
+    Add {id: links} times sign to the usage counters of tags or
+    ingredients, one F() update per distinct change
+    """
+    using = using or router.db_for_write(model)
+    by_change = defaultdict(list)
+    for pk, links in counts.items():
+        if links:
+            by_change[sign * links].append(pk)
+    for change, ids in by_change.items():
+        # Never below zero, even if a concurrent remove got there first
+        model._base_manager.using(using).filter(id__in=ids).update(
+            usage=Greatest(F('usage') + change, Value(0))
+        )
+
+
+def linked_counts(through, field, using=None, **filters):
+    """Return {tag or ingredient id: links} of the links matching filters"""
+    return dict(
+        through._base_manager.using(using).filter(**filters)
+        .values_list(f'{field}_id').annotate(links=Count('*'))
+        .values_list(f'{field}_id', 'links')
+    )
+
+
+def release_recipe(recipe_id, using=None):
+    """Take the links of a recipe being deleted out of the counters"""
+    for model, through, field in USAGE_RELATIONS:
+        change_usage(model, linked_counts(through, field, using,
+                                          recipe_id=recipe_id),
+                     using, sign=-1)
+
+
+def refresh_usage(model, through, field, ids=None, using=None):
+    """
+    Recount the usage of tags or ingredients, all of them or those in
+    ids, from the links of live recipes in one UPDATE
+    """
+    using = using or router.db_for_write(model)
+    links = through._base_manager.using(using).filter(
+        **{field: OuterRef('pk')}, recipe__deleted_at__isnull=True
+    ).values(field).annotate(links=Count('*')).values('links')
+    rows = model._base_manager.using(using).all()
+    if ids is not None:
+        rows = rows.filter(id__in=ids)
+    return rows.update(usage=Coalesce(Subquery(links), Value(0)))
@@ -0,0 +1,56 @@
+import hmac
+
+from django.db import DatabaseError
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.http import require_GET
+
+from core import metrics
+from core.health import check_database, check_migrations
+
+
+@require_GET
+def healthz(request):
+    """Liveness probe, answers as long as the process serves requests"""
+    return JsonResponse({'status': 'ok'})
+
+
+@require_GET
+def readyz(request):
+    """Readiness probe, checks the database and applied migrations"""
+    checks = {'database': 'ok', 'migrations': 'ok'}
+    try:
+        check_database()
+        if not check_migrations():
+            checks['migrations'] = 'pending'
+    except DatabaseError:
+        checks['database'] = 'unavailable'
+        checks['migrations'] = 'unknown'
+
+    ready = all(value == 'ok' for value in checks.values())
+    return JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', 'checks': checks},
+        status=200 if ready else 503
+    )
+
+
+def _has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(
+        header.encode(), f'Bearer {token}'.encode()
+    )
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Expose the sampled request metrics in Prometheus format to staff
+    users and to requests bearing METRICS_TOKEN
+    """
+    if not (request.user.is_staff or _has_metrics_token(request)):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.registry.render(settings.METRICS_SAMPLE_RATE),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
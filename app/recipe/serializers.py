@@ -1,6 +1,17 @@
+from collections import defaultdict
+from operator import itemgetter
+
+from django.contrib.auth import get_user_model
+from django.db import models, router
+from django.db.models.signals import m2m_changed
 from rest_framework import serializers
+from rest_framework.utils.serializer_helpers import ReturnList
 
-from core.models import Tag, Ingredient, Recipe
+from core import nutrition, units
+from core.models import Tag, Ingredient, Recipe, RecipeIngredient, \
+    RecipeVersion, Unit, Collection, CollectionMember
+from core.signals import amounts_changed
+from core.summaries import deferred_summaries
 
 
 class TagSerializers(serializers.ModelSerializer):
@@ -25,6 +36,34 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_field = ('id',)
 
 
+class IngredientDataSerializer(serializers.ModelSerializer):
+    """
+    Ingredient serializer with the nutrition per 100 g, cost per kg and
+    weights the recipe rollups are computed from
+    """
+
+    class Meta:
+        model = Ingredient
+        fields = ('id', 'name', 'calories', 'protein', 'fat',
+                  'carbohydrates', 'cost_per_kg', 'grams_per_ml',
+                  'grams_per_piece')
+        read_only_fields = ('id', 'name')
+        extra_kwargs = {
+            name: {'min_value': 0} for name in fields[2:]
+        }
+
+
+class RecipeIngredientSerializer(serializers.Serializer):
+    """
+    Quantity of an ingredient in a recipe, in a unit given by its code
+    """
+
+    ingredient = serializers.IntegerField()
+    quantity = serializers.DecimalField(max_digits=9, decimal_places=3,
+                                        min_value=0)
+    unit = serializers.CharField(max_length=20)
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """
     Recipe Serializer
@@ -38,13 +77,385 @@ class RecipeSerializer(serializers.ModelSerializer):
         many=True,
         queryset=Tag.objects.all()
     )
+    amounts = RecipeIngredientSerializer(many=True, write_only=True,
+                                         required=False)
 
     class Meta:
         model = Recipe
-        fields = ('id', 'title', 'time_minutes', 'price', 'link',
-                  'ingredients', 'tags',)
+        fields = ('id', 'title', 'time_minutes', 'price', 'servings',
+                  'link', 'ingredients', 'tags', 'amounts')
         read_only_field = ('id',)
 
+    def validate_amounts(self, amounts):
+        """Check the ingredients are the owner's and the units exist"""
+        user = self.instance.user if self.instance else \
+            self.context['request'].user
+        ingredient_ids = [amount['ingredient'] for amount in amounts]
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'Each ingredient may have one amount.'
+            )
+        found = set(Ingredient.objects.filter(
+            user=user, id__in=ingredient_ids
+        ).values_list('id', flat=True))
+        if found != set(ingredient_ids):
+            raise serializers.ValidationError(
+                f'Invalid ingredient ids: '
+                f'{sorted(set(ingredient_ids) - found)}.'
+            )
+        units = dict(Unit.objects.filter(
+            code__in={amount['unit'] for amount in amounts}
+        ).values_list('code', 'id'))
+        unknown = {amount['unit'] for amount in amounts} - set(units)
+        if unknown:
+            raise serializers.ValidationError(
+                f'Unknown units: {", ".join(sorted(unknown))}.'
+            )
+        return [
+            {'ingredient_id': amount['ingredient'],
+             'quantity': amount['quantity'],
+             'unit_id': units[amount['unit']]}
+            for amount in amounts
+        ]
+
+    def save_amounts(self, recipe, amounts):
+        """
+        Set the quantities of ingredients of the recipe, linking those
+        not linked yet in one insert
+        """
+        if not amounts:
+            return
+        links = {
+            link.ingredient_id: link
+            for link in RecipeIngredient.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=[a['ingredient_id'] for a in amounts]
+            )
+        }
+        added, changed = [], []
+        for amount in amounts:
+            link = links.get(amount['ingredient_id'])
+            if link is None:
+                added.append(RecipeIngredient(recipe=recipe, **amount))
+            else:
+                link.quantity = amount['quantity']
+                link.unit_id = amount['unit_id']
+                changed.append(link)
+        if added:
+            self.add_links(recipe, added)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed,
+                                                 ['quantity', 'unit'])
+            amounts_changed([recipe.pk])
+
+    def add_links(self, recipe, links):
+        """
+        Insert new ingredient links with their quantities, sending the
+        m2m_changed signals recipe.ingredients.add() would
+        """
+        using = router.db_for_write(RecipeIngredient, instance=recipe)
+        signal = {
+            'sender': RecipeIngredient, 'instance': recipe,
+            'reverse': False, 'model': Ingredient, 'using': using,
+            'pk_set': {link.ingredient_id for link in links},
+        }
+        m2m_changed.send(action='pre_add', **signal)
+        RecipeIngredient.objects.using(using).bulk_create(links)
+        m2m_changed.send(action='post_add', **signal)
+
+    def create(self, validated_data):
+        amounts = validated_data.pop('amounts', None)
+        with deferred_summaries():
+            recipe = super().create(validated_data)
+            self.save_amounts(recipe, amounts)
+        return recipe
+
+    def update(self, instance, validated_data):
+        amounts = validated_data.pop('amounts', None)
+        with deferred_summaries():
+            instance = super().update(instance, validated_data)
+            self.save_amounts(instance, amounts)
+        return instance
+
+
+def decimal_representation(field):
+    """
+    Return a fast to_representation for a DRF DecimalField
+
+    Values coming from the database already carry the field's decimal
+    places, those are formatted directly and everything else goes
+    through the field itself.
+    """
+    exponent = -field.decimal_places
+    fallback = field.to_representation
+
+    if not getattr(field, 'coerce_to_string', True) or field.localize:
+        return fallback
+
+    def to_representation(value):
+        if value is None:
+            return None
+        if value.as_tuple().exponent == exponent:
+            return '{:f}'.format(value)
+        return fallback(value)
+
+    return to_representation
+
+
+def file_representation(storage, request=None):
+    """Return a to_representation of stored file names like FileField"""
+    def to_representation(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request else url
+
+    return to_representation
+
+
+class ValuesListSerializer:
+    """
+    Read-only serializer for list actions building plain dicts from
+    queryset.values() rows instead of model instances
+
+    Many-to-many fields are fetched as sorted id lists with one query
+    per relation, whatever the number of rows. The output matches the
+    model_serializer it stands in for.
+
+    The 'fields' and 'expand' context entries select a subset of the
+    fields (optional_fields and computed_fields may be added) and
+    replace the ids of the expandable relations by nested objects.
+    Relations that are not rendered are not queried.
+    """
+
+    model_serializer = None
+    many_to_many = ()
+    optional_fields = ()
+    # Optional fields computed for all rows at once by the method of the
+    # same name, taking the row ids and returning {id: value}
+    computed_fields = ()
+    # Fields of model_serializer only written, never rendered
+    write_only_fields = ()
+    expandable = {}
+
+    def __init__(self, instance=None, many=True, context=None, **kwargs):
+        self.instance = instance
+        self.context = context or {}
+        self.fields = tuple(
+            self.context.get('fields') or self.default_fields()
+        )
+        self.expand = set(self.context.get('expand') or ()) & \
+            set(self.expandable)
+        self._data = None
+
+    @classmethod
+    def default_fields(cls):
+        return tuple(name for name in cls.model_serializer.Meta.fields
+                     if name not in cls.write_only_fields)
+
+    @classmethod
+    def allowed_fields(cls):
+        return cls.default_fields() + cls.optional_fields + \
+            cls.computed_fields
+
+    def add_computed(self, rows, ids):
+        """Fill in the computed fields of the rows, whose ids are ids"""
+        for name in self.computed_fields:
+            if name in self.fields:
+                values = getattr(self, name)(ids)
+                for row, pk in zip(rows, ids):
+                    row[name] = values[pk]
+
+    def converters(self, names):
+        """Return the field name -> to_representation for special fields"""
+        model = self.model_serializer.Meta.model
+        request = self.context.get('request')
+        converters = {}
+        for name in names:
+            model_field = model._meta.get_field(name)
+            if isinstance(model_field, models.DecimalField):
+                converters[name] = decimal_representation(
+                    serializers.DecimalField(
+                        max_digits=model_field.max_digits,
+                        decimal_places=model_field.decimal_places
+                    )
+                )
+            elif isinstance(model_field, models.FileField):
+                converters[name] = file_representation(
+                    model_field.storage, request
+                )
+        return converters
+
+    def related(self, queryset, name):
+        """
+        Return {row id: related values} of a many-to-many field, ids or
+        nested dicts when the field is expanded, sorted by id
+        """
+        field = queryset.model._meta.get_field(name)
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+
+        links = through.objects.filter(**{
+            f'{source}__in': queryset.values('pk')
+        })
+        related = defaultdict(list)
+
+        if name not in self.expand:
+            for row_id, related_id in links.values_list(
+                    f'{source}_id', f'{target}_id'):
+                related[row_id].append(related_id)
+            for ids in related.values():
+                ids.sort()
+            return related
+
+        nested_fields = self.expandable[name].Meta.fields
+        for row in links.values_list(
+                f'{source}_id', *(f'{target}__{f}' for f in nested_fields)):
+            related[row[0]].append(dict(zip(nested_fields, row[1:])))
+        for objects in related.values():
+            objects.sort(key=itemgetter('id'))
+        return related
+
+    @property
+    def data(self):
+        if self._data is None:
+            fields = self.fields
+            value_fields = [
+                f for f in fields
+                if f not in self.many_to_many and f not in self.computed_fields
+            ]
+            if 'id' not in value_fields:
+                value_fields.append('id')
+            converters = self.converters(value_fields)
+            related = {
+                name: self.related(self.instance, name)
+                for name in self.many_to_many if name in fields
+            }
+
+            rows, row_ids = [], []
+            for row in self.instance.values(*value_fields):
+                for name, convert in converters.items():
+                    row[name] = convert(row[name])
+                for name, values in related.items():
+                    row[name] = values.get(row['id'], [])
+                rows.append({name: row.get(name) for name in fields})
+                row_ids.append(row['id'])
+            self.add_computed(rows, row_ids)
+            self._data = ReturnList(rows, serializer=self)
+        return self._data
+
+
+class TagListSerializer(ValuesListSerializer):
+    """
+    Fast read-only Tag list serializer
+    """
+
+    model_serializer = TagSerializers
+
+
+class IngredientListSerializer(ValuesListSerializer):
+    """
+    Fast read-only Ingredient list serializer
+    """
+
+    model_serializer = IngredientSerializer
+
+
+class RecipeListSerializer(ValuesListSerializer):
+    """
+    Fast read-only Recipe list serializer
+
+    With the 'servings' context entry the amounts and nutrition of the
+    recipes whose servings are known are scaled to it, and with 'system'
+    the amounts are converted to its units.
+    """
+
+    model_serializer = RecipeSerializer
+    many_to_many = ('ingredients', 'tags')
+    optional_fields = ('image', 'user')
+    computed_fields = ('amounts', 'nutrition')
+    write_only_fields = ('amounts',)
+    expandable = {
+        'ingredients': IngredientSerializer,
+        'tags': TagSerializers,
+    }
+
+    def add_computed(self, rows, ids):
+        servings = self.context.get('servings')
+        self.ratios = {}
+        if servings and {'amounts', 'nutrition'}.intersection(self.fields):
+            self.ratios = units.serving_ratios(ids, servings)
+        super().add_computed(rows, ids)
+        if servings and 'servings' in self.fields:
+            for row in rows:
+                if row['servings'] is not None:
+                    row['servings'] = servings
+
+    def amounts(self, ids):
+        return units.recipe_amounts(ids, self.ratios,
+                                    self.context.get('system'))
+
+    def nutrition(self, ids):
+        rollups = nutrition.recipe_rollups(ids)
+        for pk, ratio in self.ratios.items():
+            rollups[pk] = nutrition.scale_rollup(rollups[pk], ratio)
+        return rollups
+
+
+class RecipeSummaryListSerializer(RecipeListSerializer):
+    """
+    Recipe list serializer reading RecipeSummary rows, a single query
+    whatever the fields and expansions requested
+    """
+
+    relation_columns = {
+        'ingredients': ('ingredient_ids', 'ingredient_names'),
+        'tags': ('tag_ids', 'tag_names'),
+    }
+
+    @property
+    def data(self):
+        if self._data is None:
+            fields = self.fields
+            value_fields = [
+                f for f in fields
+                if f not in self.many_to_many and f not in self.computed_fields
+            ]
+            if 'id' not in value_fields:
+                value_fields.append('id')
+            converters = self.converters(value_fields)
+            columns = ['recipe_id' if f == 'id' else f for f in value_fields]
+            for name in self.many_to_many:
+                if name in fields:
+                    ids, names = self.relation_columns[name]
+                    columns += [ids, names] if name in self.expand else [ids]
+
+            rows, row_ids = [], []
+            for row in self.instance.values_list(*columns):
+                item = dict(zip(value_fields, row))
+                for name, convert in converters.items():
+                    item[name] = convert(item[name])
+                position = len(value_fields)
+                for name in self.many_to_many:
+                    if name not in fields:
+                        continue
+                    ids = row[position]
+                    position += 1
+                    if name in self.expand:
+                        item[name] = [
+                            {'id': i, 'name': n}
+                            for i, n in zip(ids, row[position])
+                        ]
+                        position += 1
+                    else:
+                        item[name] = ids
+                rows.append({name: item.get(name) for name in fields})
+                row_ids.append(item['id'])
+            self.add_computed(rows, row_ids)
+            self._data = ReturnList(rows, serializer=self)
+        return self._data
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """
@@ -53,6 +464,185 @@ class RecipeDetailSerializer(RecipeSerializer):
 
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializers(many=True, read_only=True)
+    amounts = serializers.SerializerMethodField()
+    nutrition = serializers.SerializerMethodField()
+
+    # Rendered only when named in the 'include' context entry, scaled
+    # and converted like RecipeListSerializer does
+    included_fields = ('amounts', 'nutrition')
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('nutrition',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        include = self.context.get('include', ())
+        for name in self.included_fields:
+            if name not in include:
+                self.fields.pop(name)
+
+    def ratio(self, recipe):
+        """Return the ratio scaling the recipe to the servings asked"""
+        servings = self.context.get('servings')
+        if servings and recipe.servings:
+            return servings / recipe.servings
+        return None
+
+    def to_representation(self, recipe):
+        data = super().to_representation(recipe)
+        if self.ratio(recipe) is not None:
+            data['servings'] = self.context['servings']
+        return data
+
+    def get_amounts(self, recipe):
+        ratio = self.ratio(recipe)
+        return units.recipe_amounts(
+            [recipe.pk], ratio and {recipe.pk: ratio},
+            self.context.get('system')
+        )[recipe.pk]
+
+    def get_nutrition(self, recipe):
+        rollup = nutrition.recipe_rollups([recipe.pk])[recipe.pk]
+        ratio = self.ratio(recipe)
+        return rollup if ratio is None else \
+            nutrition.scale_rollup(rollup, ratio)
+
+
+class RecipeUpdateSerializer(RecipeSerializer):
+    """
+    Recipe serializer for updates, also accepting the ids of tags and
+    ingredients to add or remove without resending the whole sets
+    """
+
+    relation_changes = {'tags': Tag, 'ingredients': Ingredient}
+
+    tags_add = serializers.ListField(
+        child=serializers.IntegerField(), write_only=True, required=False
+    )
+    tags_remove = serializers.ListField(
+        child=serializers.IntegerField(), write_only=True, required=False
+    )
+    ingredients_add = serializers.ListField(
+        child=serializers.IntegerField(), write_only=True, required=False
+    )
+    ingredients_remove = serializers.ListField(
+        child=serializers.IntegerField(), write_only=True, required=False
+    )
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'tags_add', 'tags_remove', 'ingredients_add',
+            'ingredients_remove',
+        )
+
+    def validate(self, attrs):
+        """Check the additions are the recipe owner's, in one query each"""
+        errors = {}
+        for name, model in self.relation_changes.items():
+            added = set(attrs.get(f'{name}_add', ()))
+            removed = set(attrs.get(f'{name}_remove', ()))
+            if name in attrs and (added or removed):
+                errors[name] = [
+                    f'Cannot be combined with {name}_add or {name}_remove.'
+                ]
+            elif added & removed:
+                errors[f'{name}_add'] = [
+                    f'Ids cannot be both added and removed: '
+                    f'{sorted(added & removed)}.'
+                ]
+            elif added:
+                found = set(model.objects.filter(
+                    user_id=self.instance.user_id, id__in=added
+                ).values_list('id', flat=True))
+                if found != added:
+                    errors[f'{name}_add'] = [
+                        f'Invalid ids: {sorted(added - found)}.'
+                    ]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def update(self, instance, validated_data):
+        """Add and remove only the links named, one statement each"""
+        changes = {
+            name: (validated_data.pop(f'{name}_add', ()),
+                   validated_data.pop(f'{name}_remove', ()))
+            for name in self.relation_changes
+        }
+        amounts = validated_data.pop('amounts', None)
+        with deferred_summaries():
+            # A request only changing links does not rewrite the recipe
+            if validated_data:
+                instance = super().update(instance, validated_data)
+            for name, (added, removed) in changes.items():
+                manager = getattr(instance, name)
+                if removed:
+                    manager.remove(*removed)
+                if added:
+                    manager.add(*added)
+            self.save_amounts(instance, amounts)
+        return instance
+
+
+class TagQuotaSerializer(serializers.Serializer):
+    """
+    A minimum number of meals of a plan carrying a tag
+    """
+
+    tag = serializers.IntegerField()
+    meals = serializers.IntegerField(min_value=1)
+
+
+class MealPlanSerializer(serializers.Serializer):
+    """
+    Constraints of a meal plan, prices and minutes are per meal or per
+    day and tags must be the user's
+    """
+
+    max_quotas = 10
+
+    days = serializers.IntegerField(min_value=1, max_value=31)
+    meals_per_day = serializers.IntegerField(min_value=1, max_value=6,
+                                             default=3)
+    max_time_minutes = serializers.IntegerField(min_value=1, required=False)
+    daily_time_minutes = serializers.IntegerField(min_value=1,
+                                                  required=False)
+    max_price = serializers.DecimalField(max_digits=5, decimal_places=2,
+                                         min_value=0, required=False)
+    daily_price = serializers.DecimalField(max_digits=7, decimal_places=2,
+                                           min_value=0, required=False)
+    exclude_tags = serializers.ListField(
+        child=serializers.IntegerField(), max_length=100, default=list
+    )
+    tag_quotas = serializers.ListField(
+        child=TagQuotaSerializer(), max_length=max_quotas, default=list
+    )
+    repeat_after_days = serializers.IntegerField(min_value=1, required=False,
+                                                 allow_null=True)
+    seed = serializers.IntegerField(min_value=0, max_value=2 ** 31 - 1,
+                                    required=False)
+
+    def validate(self, attrs):
+        """Check the tags are the user's in one query"""
+        errors = {}
+        quota_tags = [quota['tag'] for quota in attrs['tag_quotas']]
+        if len(set(quota_tags)) != len(quota_tags):
+            errors['tag_quotas'] = ['Each tag may have one quota.']
+        slots = attrs['days'] * attrs['meals_per_day']
+        if any(quota['meals'] > slots for quota in attrs['tag_quotas']):
+            errors['tag_quotas'] = [f'The plan only has {slots} meals.']
+
+        tags = set(quota_tags) | set(attrs['exclude_tags'])
+        found = set(Tag.objects.filter(
+            user=self.context['request'].user, id__in=tags
+        ).values_list('id', flat=True))
+        if found != tags:
+            errors['tags'] = [f'Invalid ids: {sorted(tags - found)}.']
+        if set(quota_tags) & set(attrs['exclude_tags']):
+            errors['exclude_tags'] = ['Cannot exclude a tag with a quota.']
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
@@ -64,3 +654,55 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'image',)
         read_only_fields = ('id',)
+
+
+class RecipeVersionSerializer(serializers.ModelSerializer):
+    """
+    Serialize the metadata of a recipe version
+    """
+
+    class Meta:
+        model = RecipeVersion
+        fields = ('number', 'checkpoint', 'changed', 'created')
+        read_only_fields = fields
+
+
+class CollectionSerializer(serializers.ModelSerializer):
+    """
+    Serialize a recipe collection
+    """
+
+    recipes = serializers.PrimaryKeyRelatedField(
+        many=True,
+        queryset=Recipe.objects.all()
+    )
+
+    class Meta:
+        model = Collection
+        fields = ('id', 'name', 'recipes')
+        read_only_fields = ('id',)
+
+    def validate_recipes(self, recipes):
+        """Only the owner's recipes can be collected"""
+        user = self.context['request'].user
+        if any(recipe.user_id != user.id for recipe in recipes):
+            raise serializers.ValidationError(
+                'Only your own recipes can be added to a collection.'
+            )
+        return recipes
+
+
+class CollectionMemberSerializer(serializers.ModelSerializer):
+    """
+    Serialize a user a collection is shared with
+    """
+
+    email = serializers.SlugRelatedField(
+        source='user',
+        slug_field='email',
+        queryset=get_user_model().objects.all()
+    )
+
+    class Meta:
+        model = CollectionMember
+        fields = ('email', 'level')
@@ -0,0 +1,233 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.benchmarks.seed import seed
+from core.models import Collection, CollectionMember, CollectionRecipe, \
+    Recipe
+
+COLLECTIONS_URL = reverse('recipe:collection-list')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def members_url(id):
+    """Return the url of the members of a collection"""
+
+    return reverse('recipe:collection-members', args=[id])
+
+
+def recipe_detail_url(id):
+    """Return the detail url of a recipe"""
+
+    return reverse('recipe:recipe-detail', args=[id])
+
+
+def sample_recipe(user, title='Recipe'):
+    """Create and return a sample recipe"""
+
+    return Recipe.objects.create(user=user, title=title, time_minutes=5,
+                                 price='5.00')
+
+
+class PublicCollectionsApiTests(TestCase):
+    """
+    Test the publicly available collections API
+    """
+
+    def test_login_required(self):
+        """Test that login is required for collections"""
+        res = APIClient().get(COLLECTIONS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateCollectionsApiTests(TestCase):
+    """
+    Test sharing recipes through collections
+    """
+
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user(
+            'owner@test.com',
+            'test123'
+        )
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.shared = sample_recipe(self.owner, 'Shared')
+        self.private = sample_recipe(self.owner, 'Private')
+        self.collection = Collection.objects.create(user=self.owner,
+                                                    name='Soups')
+        self.collection.recipes.add(self.shared)
+
+    def share(self, level=CollectionMember.READ):
+        CollectionMember.objects.create(collection=self.collection,
+                                        user=self.user, level=level)
+
+    def test_create_collection(self):
+        """Test creating a collection of own recipes"""
+        recipe = sample_recipe(self.user)
+
+        res = self.client.post(COLLECTIONS_URL,
+                               {'name': 'Mine', 'recipes': [recipe.id]})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        collection = Collection.objects.get(id=res.data['id'])
+        self.assertEqual(collection.user, self.user)
+        self.assertEqual(list(collection.recipes.all()), [recipe])
+
+    def test_collect_others_recipes_rejected(self):
+        """Test recipes of other users can not be collected"""
+        res = self.client.post(COLLECTIONS_URL,
+                               {'name': 'Mine', 'recipes': [self.shared.id]})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_not_shared_recipes_hidden(self):
+        """Test recipes are hidden until shared"""
+        self.assertEqual(self.client.get(RECIPE_URL).data, [])
+        res = self.client.get(recipe_detail_url(self.shared.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_read_share(self):
+        """Test read members see but can not change shared recipes"""
+        own = sample_recipe(self.user, 'Own')
+        self.share()
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual([r['title'] for r in res.data], ['Shared', 'Own'])
+        res = self.client.get(recipe_detail_url(self.shared.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.patch(recipe_detail_url(self.shared.id),
+                                {'title': 'Changed'})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        res = self.client.get(recipe_detail_url(self.private.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        res = self.client.get(recipe_detail_url(own.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_write_share(self):
+        """Test write members can change but not delete shared recipes"""
+        self.share(CollectionMember.WRITE)
+
+        res = self.client.patch(recipe_detail_url(self.shared.id),
+                                {'title': 'Changed'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.shared.refresh_from_db()
+        self.assertEqual(self.shared.title, 'Changed')
+
+        res = self.client.delete(recipe_detail_url(self.shared.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_manage_members(self):
+        """Test the owner shares and unshares a collection"""
+        self.client.force_authenticate(self.owner)
+
+        res = self.client.post(members_url(self.collection.id),
+                               {'email': 'test@test.com', 'level': 'write'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        res = self.client.post(members_url(self.collection.id),
+                               {'email': 'test@test.com', 'level': 'read'})
+        res = self.client.get(members_url(self.collection.id))
+        self.assertEqual(res.data, [{'email': 'test@test.com',
+                                     'level': 'read'}])
+
+        url = reverse('recipe:collection-remove-member',
+                      args=[self.collection.id, self.user.id])
+        res = self.client.delete(url)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(CollectionMember.objects.exists())
+
+    def test_members_managed_by_owner_only(self):
+        """Test members can read a collection but not share it"""
+        self.share(CollectionMember.WRITE)
+
+        res = self.client.get(COLLECTIONS_URL)
+        self.assertEqual(res.data, [{'id': self.collection.id,
+                                     'name': 'Soups',
+                                     'recipes': [self.shared.id]}])
+
+        res = self.client.post(members_url(self.collection.id),
+                               {'email': 'test@test.com', 'level': 'write'})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        res = self.client.delete(
+            reverse('recipe:collection-detail', args=[self.collection.id])
+        )
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class LargeMembershipTests(TestCase):
+    """
+    Test access checks stay a single query with many memberships
+    """
+
+    def setUp(self):
+        owners = seed(users=200, recipes=5, tags=2, ingredients=2,
+                      tags_per_recipe=1, ingredients_per_recipe=1)
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        Collection.objects.bulk_create(
+            Collection(user=owner, name='Shared') for owner in owners
+        )
+        collections = list(Collection.objects.order_by('id'))
+        CollectionRecipe.objects.bulk_create(
+            CollectionRecipe(collection=collection, recipe_id=recipe_id)
+            for collection in collections
+            for recipe_id in Recipe.objects.filter(
+                user_id=collection.user_id
+            ).values_list('id', flat=True)[:3]
+        )
+        # Every owner shares with everybody else too
+        CollectionMember.objects.bulk_create(
+            CollectionMember(collection=collection, user=member)
+            for collection in collections
+            for member in owners[:50] + [self.user]
+            if member.id != collection.user_id
+        )
+
+    def test_list_spans_shared_recipes_in_one_query(self):
+        """Test the list of own and shared recipes is one query"""
+        sample_recipe(self.user)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 200 * 3 + 1)
+
+    def test_retrieve_checks_access_in_one_query(self):
+        """Test retrieving a shared recipe does one access query"""
+        recipe = CollectionRecipe.objects.last().recipe
+
+        # The recipe, its ingredients and its tags
+        with self.assertNumQueries(3):
+            res = self.client.get(recipe_detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_filtered_list_of_shared_recipes(self):
+        """Test filtering spans shared recipes without duplicates"""
+        tags = list(Recipe.tags.through.objects.filter(
+            recipe__collections__isnull=False
+        ).values_list('tag_id', flat=True)[:20])
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                RECIPE_URL, {'tags': ','.join(map(str, tags))}
+            )
+
+        ids = [r['id'] for r in res.data]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertTrue(ids)
@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Follow, Recipe, Tag
+
+FEED_URL = reverse('recipe:recipe-feed')
+
+
+def publish_url(id):
+    """Return the url publishing a recipe"""
+
+    return reverse('recipe:recipe-publish', args=[id])
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+
+    defaults = {'title': 'Recipe', 'time_minutes': 5, 'price': '5.00'}
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PrivateFeedApiTests(TestCase):
+    """
+    Test publishing recipes and the feed of followed users
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'test123'
+        )
+        self.author = get_user_model().objects.create_user(
+            'author@test.com',
+            'test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Follow.objects.create(follower=self.user, followee=self.author)
+
+    def test_publish_recipe(self):
+        """Test publishing and withdrawing a recipe"""
+        recipe = sample_recipe(self.user)
+
+        res = self.client.post(publish_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertTrue(recipe.published)
+
+        self.client.delete(publish_url(recipe.id))
+        recipe.refresh_from_db()
+        self.assertFalse(recipe.published)
+
+    def test_publish_others_recipe_not_allowed(self):
+        """Test only the owner publishes a recipe"""
+        recipe = sample_recipe(self.author)
+
+        res = self.client.post(publish_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_feed(self):
+        """Test the feed lists published recipes of followed users"""
+        stranger = get_user_model().objects.create_user(
+            'stranger@test.com',
+            'test123'
+        )
+        tag = Tag.objects.create(user=self.author, name='Vegan')
+        first = sample_recipe(self.author, title='First', published=True)
+        first.tags.add(tag)
+        sample_recipe(self.author, title='Draft')
+        sample_recipe(stranger, title='Stranger', published=True)
+        second = sample_recipe(self.author, title='Second', published=True)
+
+        res = self.client.get(FEED_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['title'] for r in res.data['results']],
+                         ['Second', 'First'])
+        self.assertEqual(res.data['results'][1]['user'], self.author.id)
+        self.assertEqual(res.data['results'][1]['tags'], [tag.id])
+        self.assertIsNone(res.data['next'])
+
+        res = self.client.get(FEED_URL, {'size': 1})
+        self.assertEqual(res.data['next'], second.id)
+        res = self.client.get(FEED_URL, {'size': 1, 'before': second.id})
+        self.assertEqual(res.data['results'][0]['id'], first.id)
+
+    def test_feed_updated_when_author_publishes(self):
+        """Test a cached feed shows recipes published afterwards"""
+        recipe = sample_recipe(self.author, title='Later')
+        self.assertEqual(self.client.get(FEED_URL).data['results'], [])
+
+        self.client.force_authenticate(self.author)
+        self.client.post(publish_url(recipe.id))
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(FEED_URL, {'fields': 'title'})
+        self.assertEqual(res.data['results'], [{'title': 'Later'}])
+
+    def test_feed_invalid_params(self):
+        """Test invalid paging parameters are rejected"""
+        for params in ({'before': 'x'}, {'size': 0}, {'size': 1000}):
+            res = self.client.get(FEED_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -5,7 +5,7 @@ from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Ingredient
+from core.models import Ingredient, Recipe
 from recipe.serializers import IngredientSerializer
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
@@ -83,3 +83,47 @@ class PrivateIngredientApiTests(TestCase):
         res = self.client.post(INGREDIENTS_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_ingredient_existing_name(self):
+        """Creating an ingredient with the name of another reuses it"""
+        first = self.client.post(INGREDIENTS_URL, {'name': 'Salt'})
+        res = self.client.post(INGREDIENTS_URL, {'name': 'SALT'})
+        other = get_user_model().objects.create_user('other@test.com',
+                                                     'test123')
+        self.client.force_authenticate(other)
+        own = self.client.post(INGREDIENTS_URL, {'name': 'salt'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['id'], first.data['id'])
+        self.assertEqual(own.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Ingredient.objects.count(), 2)
+
+    def test_filter_assigned_ingredients(self):
+        """Only ingredients used by a recipe are listed with assigned_only"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        Ingredient.objects.create(user=self.user, name='Pepper')
+        recipe = Recipe.objects.create(user=self.user, title='Soup',
+                                       time_minutes=5, price='1.00')
+        recipe.ingredients.add(salt)
+
+        res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': salt.id, 'name': 'Salt'}])
+
+    def test_update_ingredient_data(self):
+        """Test nutrition and cost data is read and set on the detail"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        url = reverse('recipe:ingredient-detail', args=[salt.id])
+
+        res = self.client.patch(url, {'calories': 0, 'cost_per_kg': '1.50',
+                                      'grams_per_ml': 1.2})
+        invalid = self.client.patch(url, {'protein': -1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url).data, {
+            'id': salt.id, 'name': 'Salt', 'calories': 0.0, 'protein': None,
+            'fat': None, 'carbohydrates': None, 'cost_per_kg': '1.50',
+            'grams_per_ml': 1.2, 'grams_per_piece': None,
+        })
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
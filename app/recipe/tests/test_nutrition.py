@@ -0,0 +1,212 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import feed
+from core.models import Change, Follow, Ingredient, Recipe, \
+    RecipeIngredient
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(id):
+    return reverse('recipe:recipe-detail', args=[id])
+
+
+class RecipeNutritionApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('test@test.com',
+                                                         'test123')
+        self.client.force_authenticate(self.user)
+        self.rice = Ingredient.objects.create(
+            user=self.user, name='Rice', calories=130, protein=3, fat=0,
+            carbohydrates=28, cost_per_kg='4.00'
+        )
+        self.oil = Ingredient.objects.create(
+            user=self.user, name='Oil', calories=900, protein=0, fat=100,
+            carbohydrates=0, cost_per_kg='10.00', grams_per_ml=0.9
+        )
+
+    def create(self, amounts):
+        return self.client.post(RECIPE_URL, {
+            'title': 'Fried rice', 'time_minutes': 20, 'price': '3.00',
+            'tags': [], 'ingredients': [self.rice.id, self.oil.id],
+            'amounts': amounts,
+        }, format='json')
+
+    def test_create_with_amounts(self):
+        """Test quantities are stored with the recipe's ingredients"""
+        res = self.create([
+            {'ingredient': self.rice.id, 'quantity': '250', 'unit': 'g'},
+            {'ingredient': self.oil.id, 'quantity': '2', 'unit': 'tbsp'},
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('amounts', res.data)
+        links = RecipeIngredient.objects.filter(recipe_id=res.data['id'])
+        self.assertEqual(
+            sorted(links.values_list('ingredient__name', 'quantity',
+                                     'unit__code')),
+            [('Oil', 2, 'tbsp'), ('Rice', 250, 'g')]
+        )
+
+    def test_amounts_link_new_ingredients_at_once(self):
+        """Test amounts of unlinked ingredients are inserted together"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RECIPE_URL, {
+                'title': 'Fried rice', 'time_minutes': 20, 'price': '3.00',
+                'tags': [], 'ingredients': [],
+                'amounts': [
+                    {'ingredient': self.rice.id, 'quantity': '250',
+                     'unit': 'g'},
+                    {'ingredient': self.oil.id, 'quantity': '2',
+                     'unit': 'tbsp'},
+                ],
+            }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        def count(prefix):
+            return sum(query['sql'].startswith(prefix) for query in queries)
+
+        self.assertEqual(count('INSERT INTO "core_recipe_ingredients"'), 1)
+        self.assertEqual(count('DELETE FROM "core_recipesummary"'), 1)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.summary.ingredient_ids,
+                         sorted([self.rice.id, self.oil.id]))
+        self.rice.refresh_from_db()
+        self.assertEqual(self.rice.usage, 1)
+
+    def test_invalid_amounts_rejected(self):
+        """Test amounts need the user's ingredients and known units"""
+        other = get_user_model().objects.create_user('other@test.com',
+                                                     'test123')
+        foreign = Ingredient.objects.create(user=other, name='Salt')
+
+        for amount in (
+            {'ingredient': foreign.id, 'quantity': '1', 'unit': 'g'},
+            {'ingredient': self.rice.id, 'quantity': '1', 'unit': 'bushel'},
+            {'ingredient': self.rice.id, 'quantity': '-1', 'unit': 'g'},
+        ):
+            res = self.create([amount])
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('amounts', res.data)
+        res = self.create([{'ingredient': self.rice.id, 'unit': 'g'}] * 2)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_detail_includes_amounts_and_nutrition(self):
+        """Test amounts and rollups are only returned when included"""
+        recipe_id = self.create([
+            {'ingredient': self.rice.id, 'quantity': '500', 'unit': 'g'},
+            {'ingredient': self.oil.id, 'quantity': '10', 'unit': 'ml'},
+        ]).data['id']
+
+        plain = self.client.get(detail_url(recipe_id))
+        res = self.client.get(detail_url(recipe_id),
+                              {'include': 'amounts,nutrition'})
+
+        self.assertNotIn('nutrition', plain.data)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(res.data['amounts'],
+                                key=lambda item: item['ingredient']), [
+            {'ingredient': self.rice.id, 'quantity': '500.000', 'unit': 'g'},
+            {'ingredient': self.oil.id, 'quantity': '10.000', 'unit': 'ml'},
+        ])
+        self.assertEqual(res.data['nutrition'], {
+            'grams': 509.0, 'calories': 731.0, 'protein': 15.0, 'fat': 9.0,
+            'carbohydrates': 140.0, 'cost': '2.09', 'missing': 0,
+        })
+
+    def test_update_amounts_refreshes_nutrition(self):
+        """Test changing a quantity is reflected in the rollup"""
+        recipe_id = self.create([
+            {'ingredient': self.rice.id, 'quantity': '100', 'unit': 'g'},
+        ]).data['id']
+        url = detail_url(recipe_id)
+        self.client.get(url, {'include': 'nutrition'})
+
+        res = self.client.patch(url, {'amounts': [
+            {'ingredient': self.rice.id, 'quantity': '1', 'unit': 'kg'},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        nutrition = self.client.get(url, {'include': 'nutrition'}).data[
+            'nutrition'
+        ]
+        self.assertEqual(nutrition['grams'], 1000.0)
+        # The oil has no quantity
+        self.assertEqual(nutrition['missing'], 1)
+
+    def test_list_nutrition_field(self):
+        """Test rollups of a whole page are listed on request"""
+        self.create([
+            {'ingredient': self.rice.id, 'quantity': '100', 'unit': 'g'},
+        ])
+        self.create([])
+
+        res = self.client.get(RECIPE_URL, {'fields': 'title,nutrition'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(res.data[0]), ['title', 'nutrition'])
+        self.assertEqual(
+            sorted((item['nutrition']['grams'], item['nutrition']['missing'])
+                   for item in res.data),
+            [(0, 2), (100.0, 1)]
+        )
+
+    def test_amounts_update_logged_and_versioned(self):
+        """Test changing only quantities is logged, versioned and shown"""
+        recipe_id = self.create([
+            {'ingredient': self.rice.id, 'quantity': '100', 'unit': 'g'},
+        ]).data['id']
+        Recipe.objects.filter(id=recipe_id).update(published=True)
+        follower = get_user_model().objects.create_user('fan@test.com',
+                                                        'test123')
+        Follow.objects.create(follower=follower, followee=self.user)
+        versions = feed.author_versions([self.user.id])
+        changes = Change.objects.filter(kind=Change.RECIPE,
+                                        object_id=recipe_id)
+        logged = changes.count()
+
+        self.client.patch(detail_url(recipe_id), {'amounts': [
+            {'ingredient': self.rice.id, 'quantity': '1', 'unit': 'kg'},
+        ]}, format='json')
+
+        self.assertGreater(changes.count(), logged)
+        self.assertNotEqual(feed.author_versions([self.user.id]), versions)
+        versions = self.client.get(
+            reverse('recipe:recipe-versions', args=[recipe_id])
+        ).data
+        self.assertEqual(versions[0]['changed'], ['amounts'])
+
+    def test_restore_brings_back_amounts(self):
+        """Test restoring a version resets the quantities it had"""
+        recipe_id = self.create([
+            {'ingredient': self.rice.id, 'quantity': '100', 'unit': 'g'},
+        ]).data['id']
+        self.client.patch(detail_url(recipe_id),
+                          {'ingredients_remove': [self.rice.id]},
+                          format='json')
+
+        res = self.client.post(
+            reverse('recipe:recipe-restore-version', args=[recipe_id, 1])
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(RecipeIngredient.objects.filter(
+                recipe_id=recipe_id, quantity__isnull=False
+            ).values_list('ingredient_id', 'quantity', 'unit__code')),
+            [(self.rice.id, 100, 'g')]
+        )
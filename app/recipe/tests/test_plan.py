@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+PLAN_URL = reverse('recipe:recipe-plan')
+
+
+class PublicPlanApiTests(TestCase):
+    """
+    Test unauthenticated meal plan requests
+    """
+
+    def test_login_required(self):
+        """Test a plan requires authentication"""
+        res = APIClient().post(PLAN_URL, {'days': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivatePlanApiTests(TestCase):
+    """
+    Test planning meals from the user's recipes
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipes = []
+        for number in range(12):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe {number}',
+                time_minutes=10 + number * 5, price=f'{number + 1}.50'
+            )
+            if number % 3 == 0:
+                recipe.tags.add(self.vegan)
+            self.recipes.append(recipe)
+
+    def plan(self, **params):
+        return self.client.post(PLAN_URL, params, format='json')
+
+    def test_plan(self):
+        """Test a plan within the budgets, with the recipes rendered"""
+        res = self.plan(days=2, meals_per_day=2, daily_time_minutes=60,
+                        daily_price='10.00',
+                        tag_quotas=[{'tag': self.vegan.id, 'meals': 2}],
+                        seed=7)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['seed'], 7)
+        self.assertEqual(len(res.data['days']), 2)
+        recipes = {r['id']: r for r in res.data['recipes']}
+        for day in res.data['days']:
+            self.assertEqual(len(day['recipes']), 2)
+            self.assertLessEqual(day['time_minutes'], 60)
+            self.assertEqual(day['time_minutes'], sum(
+                recipes[pk]['time_minutes'] for pk in day['recipes']
+            ))
+            self.assertLessEqual(float(day['price']), 10)
+        vegan = [pk for day in res.data['days'] for pk in day['recipes']
+                 if self.vegan.id in recipes[pk]['tags']]
+        self.assertGreaterEqual(len(vegan), 2)
+
+    def test_seed_reproduces_plan(self):
+        """Test the seed of a response gives the same plan again"""
+        first = self.plan(days=3)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        again = self.plan(days=3, seed=first.data['seed'])
+        self.assertEqual(again.data['days'], first.data['days'])
+
+    def test_excluded_tags_and_per_meal_limits(self):
+        """Test recipes over the per meal limits or excluded are skipped"""
+        res = self.plan(days=1, meals_per_day=4, max_time_minutes=40,
+                        max_price='9.00', exclude_tags=[self.vegan.id])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(res.data['days'][0]['recipes']), [
+            self.recipes[1].id, self.recipes[2].id, self.recipes[4].id,
+            self.recipes[5].id
+        ])
+
+    def test_no_plan(self):
+        """Test constraints no plan meets are answered with 422"""
+        res = self.plan(days=7, meals_per_day=2, seed=3)
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(res.data['seed'], 3)
+
+    @override_settings(MEAL_PLAN_MAX_STEPS=5)
+    def test_search_capped(self):
+        """Test a search past its cap tells the client to relax it"""
+        res = self.plan(days=6, meals_per_day=2, daily_time_minutes=30)
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertIn('in time', res.data['detail'])
+
+    def test_invalid_constraints(self):
+        """Test other users' tags and oversized quotas are rejected"""
+        other = get_user_model().objects.create_user('other@test.com',
+                                                     'test123')
+        quick = Tag.objects.create(user=other, name='Quick')
+
+        res = self.plan(days=1, exclude_tags=[quick.id])
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+
+        res = self.plan(days=1, tag_quotas=[{'tag': self.vegan.id,
+                                             'meals': 4}])
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tag_quotas', res.data)
+
+        res = self.plan(days=40)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
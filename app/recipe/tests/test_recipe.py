@@ -1,14 +1,18 @@
+import re
 import tempfile
 
 from PIL import Image
 
 from os import path
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
 from core.models import Recipe, Tag, Ingredient
@@ -16,6 +20,9 @@ from core.models import Recipe, Tag, Ingredient
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPE_URL = reverse('recipe:recipe-list')
+LINK_WRITE = re.compile(
+    r'(INSERT|DELETE) .*?(?:INTO|FROM) "core_recipe_(tags|ingredients)"'
+)
 
 
 def image_url(id: int):
@@ -97,6 +104,107 @@ class PrivateRecipeApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_output_identical_to_model_serializer(self):
+        """Test the fast list path renders the same JSON bytes"""
+        for index in range(3):
+            recipe = sample_recipe(self.user, title=f'Recipe {index}',
+                                   price='12.5', link='https://x.com')
+            recipe.tags.add(sample_tag(self.user, name=f'B{index}'),
+                            sample_tag(self.user, name=f'A{index}'))
+            recipe.ingredients.add(
+                sample_ingredient(self.user, name=f'Salt {index}')
+            )
+        sample_recipe(self.user)
+
+        res = self.client.get(RECIPE_URL)
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        expected = JSONRenderer().render(
+            RecipeSerializer(recipes, many=True).data
+        )
+        self.assertEqual(res.content, expected)
+
+    def test_list_query_count_independent_of_rows(self):
+        """Test listing recipes does not run queries per recipe"""
+        for index in range(5):
+            recipe = sample_recipe(self.user)
+            recipe.tags.add(sample_tag(self.user, name=f'Tag {index}'))
+            recipe.ingredients.add(
+                sample_ingredient(self.user, name=f'Ingredient {index}')
+            )
+
+        with self.assertNumQueries(1):
+            self.client.get(RECIPE_URL)
+
+    def test_list_sparse_fields(self):
+        """Test only the requested fields are returned"""
+        recipe = sample_recipe(self.user, title='Soup')
+        recipe.tags.add(sample_tag(self.user))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, {'fields': 'title,image'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'title': 'Soup', 'image': None}])
+
+    def test_list_sparse_fields_image_url(self):
+        """Test images are rendered as absolute URLs"""
+        recipe = sample_recipe(self.user)
+        recipe.image = 'uploads/recipe/test.jpg'
+        recipe.save()
+
+        res = self.client.get(RECIPE_URL, {'fields': 'id,image'})
+
+        self.assertEqual(
+            res.data[0]['image'],
+            'http://testserver/media/uploads/recipe/test.jpg'
+        )
+
+    def test_list_sparse_fields_skip_unrequested_relations(self):
+        """Test relations left out of fields are not queried"""
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(sample_tag(self.user))
+        recipe.ingredients.add(sample_ingredient(self.user))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, {'fields': 'title,tags'})
+
+        self.assertEqual(list(res.data[0]), ['title', 'tags'])
+
+    def test_list_expand_relations(self):
+        """Test expanded relations match the detail representation"""
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(sample_tag(self.user, name='Vegan'),
+                        sample_tag(self.user, name='Dessert'))
+        recipe.ingredients.add(sample_ingredient(self.user))
+
+        res = self.client.get(RECIPE_URL, {'expand': 'ingredients,tags'})
+
+        detail = RecipeDetailSerializer(recipe).data
+        self.assertEqual(res.data[0]['tags'],
+                         sorted(detail['tags'], key=lambda t: t['id']))
+        self.assertEqual(res.data[0]['ingredients'], detail['ingredients'])
+
+    def test_list_unknown_fields(self):
+        """Test unknown sparse fields are rejected"""
+        res = self.client.get(RECIPE_URL, {'fields': 'title,secret'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECIPE_URL, {'expand': 'title'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_invalid_ids(self):
+        """Test filters with invalid or too many ids are rejected"""
+        for tags in ('1,x', '1.5', ','.join(map(str, range(101)))):
+            res = self.client.get(RECIPE_URL, {'tags': tags})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECIPE_URL, {'ingredients': 'a'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECIPE_URL, {'tags': '1, 2,'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_get_recipes_related_to_user(self):
         """
         Test that we are only recieving the recipes for the current
@@ -153,8 +261,8 @@ class PrivateRecipeApiTest(TestCase):
     def test_create_recipe_with_tags(self):
         """Create a recipe with tags"""
 
-        tag1 = sample_tag(user=self.user)
-        tag2 = sample_tag(user=self.user)
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
 
         payload = {
             'title': 'Test Recipe',
@@ -177,8 +285,8 @@ class PrivateRecipeApiTest(TestCase):
     def test_create_recipe_with_ingredients(self):
         """Test creating a recipe with ingredients"""
 
-        ingredient1 = sample_ingredient(user=self.user)
-        ingredient2 = sample_ingredient(user=self.user)
+        ingredient1 = sample_ingredient(user=self.user, name='Salt')
+        ingredient2 = sample_ingredient(user=self.user, name='Pepper')
 
         payload = {
             'title': 'Test Recipe',
@@ -246,8 +354,8 @@ class PrivateUploadImageApiTests(TestCase):
 
     def test_recipe_enpoint_filter_tags(self):
         """Filter recipies using Tags"""
-        tag1: Tag = sample_tag(user=self.user)
-        tag2: Tag = sample_tag(user=self.user)
+        tag1: Tag = sample_tag(user=self.user, name='Vegan')
+        tag2: Tag = sample_tag(user=self.user, name='Dessert')
         recipe1: Recipe = sample_recipe(user=self.user)
         recipe2: Recipe = sample_recipe(user=self.user)
         recipe1.tags.add(tag1)
@@ -266,8 +374,8 @@ class PrivateUploadImageApiTests(TestCase):
 
     def test_recipe_enpoint_filter_ingrediants(self):
         """Filter recipies using Ingredients"""
-        ingredient1: Ingredient = sample_tag(user=self.user)
-        ingredient2: Ingredient = sample_tag(user=self.user)
+        ingredient1: Ingredient = sample_tag(user=self.user, name='Salt')
+        ingredient2: Ingredient = sample_tag(user=self.user, name='Pepper')
         recipe1: Recipe = sample_recipe(user=self.user)
         recipe2: Recipe = sample_recipe(user=self.user)
         recipe1.tags.add(ingredient1)
@@ -284,3 +392,230 @@ class PrivateUploadImageApiTests(TestCase):
         self.assertIn(serializer1.data, res.data)
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer3.data, res.data)
+
+
+def versions_url(id):
+    """Return the url listing the versions of a recipe"""
+
+    return reverse('recipe:recipe-versions', args=[id])
+
+
+def restore_url(id, number):
+    """Return the url restoring a version of a recipe"""
+
+    return reverse('recipe:recipe-restore-version', args=[id, number])
+
+
+class PrivateRecipeVersionApiTests(TestCase):
+    """
+    Test the recipe history endpoints
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.client.force_authenticate(self.user)
+
+        res = self.client.post(RECIPE_URL, {
+            'title': 'Soup', 'price': 5.00, 'time_minutes': 5
+        })
+        self.recipe = Recipe.objects.get(pk=res.data['id'])
+
+    def test_updates_recorded_as_versions(self):
+        """Test creating and updating a recipe records versions"""
+        tag = sample_tag(self.user)
+        self.client.patch(detail_url(self.recipe.id),
+                          {'title': 'Stew', 'tags': [tag.id]})
+        self.client.patch(detail_url(self.recipe.id), {'title': 'Stew'})
+
+        res = self.client.get(versions_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([v['number'] for v in res.data], [2, 1])
+        self.assertEqual(res.data[0]['changed'], ['tags', 'title'])
+
+    def test_changes_outside_api_recorded(self):
+        """Test changes not made through the API get their own version"""
+        Recipe.objects.filter(id=self.recipe.id).update(link='x.com')
+
+        self.client.patch(detail_url(self.recipe.id), {'title': 'Stew'})
+
+        res = self.client.get(versions_url(self.recipe.id))
+        self.assertEqual([v['changed'] for v in res.data][:2],
+                         [['title'], ['link']])
+
+    def test_diff_versions(self):
+        """Test diffing a version against the latest"""
+        self.client.patch(detail_url(self.recipe.id), {'time_minutes': 9})
+
+        url = reverse('recipe:recipe-diff-versions', args=[self.recipe.id])
+        res = self.client.get(url, {'from': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'from': 1, 'to': 2,
+            'changes': {'time_minutes': {'from': 5, 'to': 9}},
+        })
+
+        res = self.client.get(url, {'from': 'one'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(url, {'from': 7})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_restore_version(self):
+        """Test restoring an earlier version"""
+        self.client.patch(detail_url(self.recipe.id), {'title': 'Stew'})
+
+        res = self.client.post(restore_url(self.recipe.id, 1))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'Soup')
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'Soup')
+        self.assertEqual(self.recipe.versions.count(), 3)
+
+        res = self.client.post(restore_url(self.recipe.id, 9))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_versions_of_other_users_hidden(self):
+        """Test the history of other users' recipes is not accessible"""
+        other = get_user_model().objects.create_user(
+            email='other@test.com',
+            password='test123'
+        )
+        recipe = sample_recipe(other)
+
+        res = self.client.get(versions_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        res = self.client.post(restore_url(recipe.id, 1))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PrivateRecipeDeleteApiTests(TestCase):
+    """
+    Test deleting recipes
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='test123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_delete_recipe_is_soft(self):
+        """Test deleting a recipe hides it without removing the row"""
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(sample_tag(self.user))
+
+        res = self.client.delete(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(RECIPE_URL).data, [])
+        res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        recipe = Recipe.all_objects.get(id=recipe.id)
+        self.assertIsNotNone(recipe.deleted_at)
+        self.assertEqual(recipe.tags.count(), 1)
+
+
+class PrivateRecipeLinkUpdateApiTests(TestCase):
+    """
+    Test adding and removing single tags and ingredients of a recipe
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = sample_tag(self.user, 'Vegan')
+        self.quick = sample_tag(self.user, 'Quick')
+
+    def recipe_with_ingredients(self, count, prefix='Ingredient'):
+        recipe = sample_recipe(self.user)
+        recipe.ingredients.add(*(
+            sample_ingredient(self.user, f'{prefix} {i}')
+            for i in range(count)
+        ))
+        recipe.tags.add(self.vegan)
+        return recipe
+
+    def patch(self, recipe, payload):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(detail_url(recipe.id), payload,
+                                    format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, [query['sql'] for query in queries]
+
+    def test_add_and_remove_tags(self):
+        """Test adding and removing tags leaves the other links alone"""
+        recipe = self.recipe_with_ingredients(2)
+
+        res, _ = self.patch(recipe, {'tags_add': [self.quick.id],
+                                     'tags_remove': [self.vegan.id]})
+
+        self.assertEqual(res.data['tags'], [self.quick.id])
+        self.assertEqual(len(res.data['ingredients']), 2)
+        self.assertNotIn('tags_add', res.data)
+
+    def test_link_statements_independent_of_set_size(self):
+        """Test one bulk statement per change, whatever the recipe size"""
+        small = self.recipe_with_ingredients(5, 'Small')
+        large = self.recipe_with_ingredients(60, 'Large')
+        salt = sample_ingredient(self.user, 'Salt')
+        small.ingredients.add(salt)
+        large.ingredients.add(salt)
+        payload = {'tags_add': [self.quick.id],
+                   'ingredients_remove': [salt.id]}
+
+        with self.assertNumQueries(34):
+            _, small_queries = self.patch(small, payload)
+        _, large_queries = self.patch(large, payload)
+
+        self.assertEqual(len(large_queries), len(small_queries))
+        # The recipe row itself is left alone
+        self.assertFalse([
+            sql for sql in large_queries
+            if sql.startswith('UPDATE "core_recipe" ')
+        ])
+        link_writes = [
+            match.groups() for match in map(LINK_WRITE.match, large_queries)
+            if match
+        ]
+        self.assertEqual(link_writes, [('INSERT', 'tags'),
+                                       ('DELETE', 'ingredients')])
+        self.assertEqual(large.ingredients.count(), 60)
+        self.assertEqual(large.tags.count(), 2)
+
+    def test_add_other_users_tag(self):
+        """Test only the owner's tags can be added"""
+        recipe = self.recipe_with_ingredients(1)
+        other = get_user_model().objects.create_user('other@test.com',
+                                                     'test123')
+        tag = sample_tag(other, 'Vegan')
+
+        res = self.client.patch(detail_url(recipe.id),
+                                {'tags_add': [tag.id]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags_add', res.data)
+
+    def test_add_combined_with_set(self):
+        """Test the whole set and changes to it are exclusive"""
+        recipe = self.recipe_with_ingredients(1)
+
+        res = self.client.patch(detail_url(recipe.id), {
+            'tags': [self.vegan.id], 'tags_add': [self.quick.id]
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(res.data), ['tags'])
@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Unit
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(id):
+    return reverse('recipe:recipe-detail', args=[id])
+
+
+class RecipeScalingApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('test@test.com',
+                                                         'test123')
+        self.client.force_authenticate(self.user)
+        self.rice = Ingredient.objects.create(
+            user=self.user, name='Rice', calories=130, protein=3, fat=0,
+            carbohydrates=28, cost_per_kg='4.00'
+        )
+        self.recipe = self.sample_recipe('Rice', servings=2)
+
+    def sample_recipe(self, title, servings=None):
+        recipe = Recipe.objects.create(user=self.user, title=title,
+                                       time_minutes=20, price='3.00',
+                                       servings=servings)
+        recipe.ingredients.add(self.rice, through_defaults={
+            'quantity': '1', 'unit': Unit.objects.get(code='cup'),
+        })
+        return recipe
+
+    def test_retrieve_scaled_to_metric(self):
+        """Test a recipe is scaled to servings in metric units"""
+        res = self.client.get(detail_url(self.recipe.id),
+                              {'servings': 6, 'units': 'metric'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['servings'], 6)
+        self.assertEqual(res.data['amounts'], [
+            {'ingredient': self.rice.id, 'quantity': '709.765', 'unit': 'ml'},
+        ])
+
+    def test_retrieve_nutrition_scaled(self):
+        """Test nutrition totals follow the servings asked"""
+        self.recipe.ingredients.through.objects.update(
+            unit=Unit.objects.get(code='kg')
+        )
+        res = self.client.get(detail_url(self.recipe.id),
+                              {'servings': 1, 'include': 'nutrition'})
+
+        self.assertEqual(res.data['amounts'][0]['quantity'], '0.500')
+        self.assertEqual(res.data['nutrition']['grams'], 500.0)
+        self.assertEqual(res.data['nutrition']['calories'], 650.0)
+        self.assertEqual(res.data['nutrition']['cost'], '2.00')
+
+    def test_unknown_servings_not_scaled(self):
+        """Test recipes without servings are only converted"""
+        recipe = self.sample_recipe('Pilaf')
+
+        res = self.client.get(detail_url(recipe.id),
+                              {'servings': 6, 'units': 'us'})
+
+        self.assertIsNone(res.data['servings'])
+        self.assertEqual(res.data['amounts'][0]['quantity'], '1.000')
+        self.assertEqual(res.data['amounts'][0]['unit'], 'cup')
+
+    def test_invalid_scale_rejected(self):
+        """Test servings and units must be valid"""
+        for params in ({'servings': 0}, {'servings': 'six'},
+                       {'units': 'imperial'}):
+            res = self.client.get(detail_url(self.recipe.id), params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_servings_validated(self):
+        """Test a recipe's servings are set and must be positive"""
+        url = detail_url(self.recipe.id)
+
+        res = self.client.patch(url, {'servings': 3})
+        invalid = self.client.patch(url, {'servings': 0})
+
+        self.assertEqual(res.data['servings'], 3)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.summary.servings, 3)
+
+    def test_list_scaled(self):
+        """Test a whole list is scaled and converted in one query more"""
+        pilaf = self.sample_recipe('Pilaf')
+        self.sample_recipe('Risotto', servings=4)
+        params = {'fields': 'id,servings,amounts', 'servings': 4,
+                  'units': 'metric'}
+        self.client.get(RECIPE_URL, params)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['servings'], item['amounts'][0]['quantity'])
+             for item in res.data],
+            [(4, '473.176'), (None, '236.588'), (4, '236.588')]
+        )
+        self.assertEqual(res.data[1]['id'], pilaf.id)
@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+SYNC_URL = reverse('recipe:sync')
+
+
+class PrivateSyncApiTests(TestCase):
+    """
+    Test syncing recipes, tags and ingredients through the change log
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.soup = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price='4.50'
+        )
+        self.soup.tags.add(self.vegan)
+
+    def sync(self, **params):
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_full_sync(self):
+        """Test syncing without a token returns everything"""
+        other = get_user_model().objects.create_user('other@test.com',
+                                                     'test123')
+        Tag.objects.create(user=other, name='Quick')
+
+        data = self.sync()
+
+        self.assertEqual(data['tags'], [{'id': self.vegan.id,
+                                         'name': 'Vegan'}])
+        self.assertEqual(data['ingredients'], [{'id': self.salt.id,
+                                                'name': 'Salt'}])
+        self.assertEqual(len(data['recipes']), 1)
+        self.assertEqual(data['recipes'][0]['tags'], [self.vegan.id])
+        self.assertFalse(data['more'])
+
+    def test_changes_since_token(self):
+        """Test only the changes after the token are returned"""
+        token = self.sync()['next']
+        self.soup.title = 'Stew'
+        self.soup.save()
+        salt_id = self.salt.id
+        self.salt.delete()
+        quick = Tag.objects.create(user=self.user, name='Quick')
+
+        data = self.sync(since=token)
+
+        self.assertEqual([r['title'] for r in data['recipes']], ['Stew'])
+        self.assertEqual(data['tags'], [{'id': quick.id, 'name': 'Quick'}])
+        self.assertEqual(data['deleted']['ingredients'], [salt_id])
+        self.assertEqual(self.sync(since=data['next'])['recipes'], [])
+
+    def test_deleted_recipe_tombstone(self):
+        """Test a soft deleted recipe is reported deleted"""
+        token = self.sync()['next']
+        self.soup.soft_delete()
+
+        data = self.sync(since=token)
+
+        self.assertEqual(data['recipes'], [])
+        self.assertEqual(data['deleted']['recipes'], [self.soup.id])
+
+    def test_paginated(self):
+        """Test following the next tokens returns every change once"""
+        for index in range(5):
+            Tag.objects.create(user=self.user, name=f'Tag {index}')
+
+        data = self.sync(size=2)
+        names = [tag['name'] for tag in data['tags']]
+        while data['more']:
+            data = self.sync(since=data['next'], size=2)
+            names += [tag['name'] for tag in data['tags']]
+
+        self.assertEqual(sorted(names),
+                         sorted(['Vegan'] + [f'Tag {i}' for i in range(5)]))
+
+    def test_invalid_token(self):
+        """Test malformed and expired tokens are refused"""
+        res = self.client.get(SYNC_URL, {'since': 'abc'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(SYNC_URL, {'since': '1.0'})
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
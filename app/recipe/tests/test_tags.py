@@ -5,7 +5,7 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Tag
+from core.models import Recipe, Tag
 from recipe.serializers import TagSerializers
 
 TAGS_URL = reverse('recipe:tag-list')
@@ -88,3 +88,38 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.post(TAGS_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_tag_existing_name(self):
+        """Test creating a tag differing only in case or spacing reuses it"""
+        first = self.client.post(TAGS_URL, {'name': 'Vegan'})
+        res = self.client.post(TAGS_URL, {'name': ' vegan  '})
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['id'], first.data['id'])
+        self.assertEqual(res.data['name'], 'Vegan')
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_filter_assigned_tags_by_usage(self):
+        """Test listing only the assigned tags, most used first"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        Tag.objects.create(user=self.user, name='Unused')
+        for title in ('Soup', 'Stew'):
+            recipe = Recipe.objects.create(user=self.user, title=title,
+                                           time_minutes=5, price='1.00')
+            recipe.tags.add(quick)
+        recipe.tags.add(vegan)
+
+        res = self.client.get(TAGS_URL,
+                              {'assigned_only': 1, 'ordering': '-usage'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['name'] for tag in res.data],
+                         ['Quick', 'Vegan'])
+
+    def test_invalid_ordering(self):
+        """Test an unknown ordering is rejected"""
+        res = self.client.get(TAGS_URL, {'ordering': 'user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -9,8 +9,10 @@ router = DefaultRouter()
 router.register('tags', views.TagViewSet)
 router.register('ingredients', views.IngredientsViewSet)
 router.register('recipe', views.RecipeViewSet)
+router.register('collections', views.CollectionViewSet)
 
 app_name = 'recipe'
 urlpatterns = [
+    path('sync/', views.SyncView.as_view(), name='sync'),
     path('', include(router.urls))
 ]
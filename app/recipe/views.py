@@ -1,15 +1,31 @@
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404
 from rest_framework import viewsets, mixins, status
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from core.models import Tag, Ingredient, Recipe
+from core import feed, history, planner, sync
+from core.db_router import ReplicaReadMixin
+from core.idempotency import IdempotencyMixin
+from core.metrics import SerializationTimingMixin
+from core.summaries import deferred_summaries
+from core.models import Tag, Ingredient, Recipe, RecipeSummary, \
+    Unit, Collection, CollectionMember, CollectionRecipe, normalize_name
 
 from recipe import serializers
 
 
-class GenericVIew(viewsets.GenericViewSet,
+class GenericVIew(SerializationTimingMixin,
+                  ReplicaReadMixin,
+                  viewsets.GenericViewSet,
                   mixins.ListModelMixin,
                   mixins.CreateModelMixin):
     """
@@ -19,33 +35,91 @@ class GenericVIew(viewsets.GenericViewSet,
     permission_classes = (IsAuthenticated,)
     authentication_classes = (TokenAuthentication,)
 
+    list_serializer_class = None
+
+    orderings = {
+        'name': ('name',),
+        '-name': ('-name',),
+        'usage': ('usage', 'name'),
+        '-usage': ('-usage', 'name'),
+    }
+
     def get_queryset(self):
-        """Return only the tags related to current auth user"""
-        return self.queryset.filter(user=self.request.user).order_by('-name')
+        """
+        Return only the objects of the current auth user, optionally
+        only those assigned to a recipe and ordered by usage
+        """
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.request.query_params.get('assigned_only', '0') not in \
+                ('', '0', 'false'):
+            queryset = queryset.filter(usage__gt=0)
+
+        ordering = self.request.query_params.get('ordering', '-name')
+        if ordering not in self.orderings:
+            raise ValidationError(
+                {'ordering': [f'Expected one of {", ".join(self.orderings)}.']}
+            )
+        return queryset.order_by(*self.orderings[ordering])
+
+    def get_serializer_class(self):
+        """Return the fast read-only serializer for list requests"""
+        # The browsable API renders its forms with a cloned POST request
+        if self.action == 'list' and self.request.method == 'GET':
+            return self.list_serializer_class
+
+        return self.serializer_class
+
+    def create(self, request, *args, **kwargs):
+        """Answer 200 instead of 201 when the name already exists"""
+        response = super().create(request, *args, **kwargs)
+        if not self.created:
+            response.status_code = status.HTTP_200_OK
+        return response
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        """Reuse the existing object with the same normalized name"""
+        name = serializer.validated_data['name']
+        serializer.instance, self.created = \
+            self.queryset.model.objects.get_or_create(
+                user=self.request.user,
+                normalized_name=normalize_name(name),
+                defaults={'name': name}
+            )
 
 
-class TagViewSet(GenericVIew):
+class TagViewSet(IdempotencyMixin, GenericVIew):
     """
     Manage tags in a database
     """
 
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializers
+    list_serializer_class = serializers.TagListSerializer
 
 
-class IngredientsViewSet(GenericVIew):
+class IngredientsViewSet(IdempotencyMixin, GenericVIew,
+                         mixins.RetrieveModelMixin,
+                         mixins.UpdateModelMixin):
     """
-    Manage ingredients in a database
+    Manage ingredients in a database, with their nutrition and cost
     """
 
     serializer_class = serializers.IngredientSerializer
+    list_serializer_class = serializers.IngredientListSerializer
     queryset = Ingredient.objects.all()
 
+    def get_serializer_class(self):
+        """Return the serializer with the nutrition data for one object"""
+        if self.action in ('retrieve', 'update', 'partial_update'):
+            return serializers.IngredientDataSerializer
+
+        return super().get_serializer_class()
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(IdempotencyMixin,
+                    SerializationTimingMixin,
+                    ReplicaReadMixin,
+                    viewsets.ModelViewSet):
     """
     Manage the Recipe endpoint
     """
@@ -54,40 +128,333 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAuthenticated,)
     authentication_classes = (TokenAuthentication,)
 
-    def _params_to_ids(self, params: str):
-        return [int(id_str) for id_str in params.split(',')]
+    # Actions collection members need write access for, only the owner
+    # can delete
+    write_actions = ('update', 'partial_update', 'upload_image',
+                     'restore_version')
+    owner_actions = ('destroy', 'publish')
+
+    feed_fields = ('id', 'user', 'title', 'time_minutes', 'price', 'link',
+                   'image', 'ingredients', 'tags')
+    feed_max_size = 100
+    max_filter_ids = 100
+    max_servings = 1000
+
+    def get_throttle_cost(self, request):
+        """Filtered lists cost more than plain requests"""
+        costs = settings.THROTTLE_COSTS
+        cost = costs.get(self.action, 1)
+        if self.action == 'list' and (request.query_params.get('tags') or
+                                      request.query_params.get('ingredients')):
+            cost = max(cost, costs['filter'])
+        return cost
+
+    def _params_to_ids(self, param: str):
+        """Parse a capped comma separated list of ids"""
+        values = self.request.query_params.get(param, '').split(',')
+        try:
+            ids = {int(value) for value in values if value.strip()}
+        except ValueError:
+            raise ValidationError(
+                {param: ['Expected a comma separated list of ids.']}
+            )
+        if len(ids) > self.max_filter_ids:
+            raise ValidationError(
+                {param: [f'At most {self.max_filter_ids} ids are allowed.']}
+            )
+        return sorted(ids)
+
+    def _params_to_fields(self, param: str, allowed):
+        """Parse a comma separated list of field names"""
+        names = [
+            name.strip()
+            for name in self.request.query_params.get(param, '').split(',')
+            if name.strip()
+        ]
+        invalid = [name for name in names if name not in allowed]
+        if invalid:
+            raise ValidationError(
+                {param: [f'Unknown field: {name}' for name in invalid]}
+            )
+        return names
+
+    def _params_to_scale(self):
+        """
+        Parse the servings to scale recipes to and the system of units to
+        convert their amounts to
+        """
+        scale = {}
+        if 'servings' in self.request.query_params:
+            servings = self._params_to_int('servings')
+            if not 0 < servings <= self.max_servings:
+                raise ValidationError({'servings': [
+                    f'Must be between 1 and {self.max_servings}.'
+                ]})
+            scale['servings'] = servings
+        if 'units' in self.request.query_params:
+            system = self.request.query_params['units']
+            if system not in dict(Unit.SYSTEMS):
+                raise ValidationError({'units': [
+                    f'Expected one of: {", ".join(dict(Unit.SYSTEMS))}.'
+                ]})
+            scale['system'] = system
+        return scale
+
+    def get_serializer_context(self):
+        """
+        Add the requested sparse fieldset to list requests, the optional
+        fields to detail requests, and the servings and units amounts
+        are scaled and converted to to both. Scaling a detail includes
+        its amounts.
+        """
+        context = super().get_serializer_context()
+        serializer_class = self.get_serializer_class()
+
+        if issubclass(serializer_class, serializers.RecipeListSerializer):
+            context['fields'] = self._params_to_fields(
+                'fields', serializer_class.allowed_fields()
+            )
+            context['expand'] = self._params_to_fields(
+                'expand', serializer_class.expandable
+            )
+            context.update(self._params_to_scale())
+        elif serializer_class is serializers.RecipeDetailSerializer:
+            context['include'] = self._params_to_fields(
+                'include', serializer_class.included_fields
+            )
+            scale = self._params_to_scale()
+            if scale and 'amounts' not in context['include']:
+                context['include'].append('amounts')
+            context.update(scale)
+
+        return context
 
     def get_queryset(self):
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
 
-        queryset = self.queryset
+        user = self.request.user
+        if self.action in self.owner_actions:
+            queryset = self.queryset.filter(user=user)
+        else:
+            queryset = self.queryset.accessible_to(
+                user, write=self.action in self.write_actions
+            )
 
         if tags:
-            tag_ids = self._params_to_ids(tags)
+            tag_ids = self._params_to_ids('tags')
             queryset = queryset.filter(tags__id__in=tag_ids)
 
         if ingredients:
-            ingredient_ids = self._params_to_ids(ingredients)
+            ingredient_ids = self._params_to_ids('ingredients')
             queryset = queryset.filter(ingredients__id__in=ingredient_ids)
 
-        return queryset.filter(user=self.request.user).order_by('id')
+        queryset = queryset.order_by('id')
+
+        if self.get_serializer_class() is \
+                serializers.RecipeSummaryListSerializer:
+            if tags or ingredients:
+                summaries = RecipeSummary.objects.filter(
+                    recipe_id__in=queryset.values('id')
+                )
+            else:
+                summaries = RecipeSummary.objects.filter(
+                    Q(user=user) |
+                    Q(recipe_id__in=CollectionRecipe.objects.shared_with(user))
+                )
+            return summaries.order_by('recipe_id')
+
+        return queryset
 
     def get_serializer_class(self):
         """Return the Detail Serializer if the action is retrieve"""
 
-        if self.action == 'retrieve':
+        if self.action == 'list' and self.request.method == 'GET' or \
+                self.action == 'feed':
+            return serializers.RecipeSummaryListSerializer
+
+        elif self.action == 'retrieve':
             return serializers.RecipeDetailSerializer
 
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
 
+        elif self.action == 'versions':
+            return serializers.RecipeVersionSerializer
+
+        elif self.action in ('update', 'partial_update'):
+            return serializers.RecipeUpdateSerializer
+
+        elif self.action == 'plan':
+            return serializers.MealPlanSerializer
+
         return serializers.RecipeSerializer
 
+    def _params_to_int(self, param: str, default=None):
+        """Parse an integer from the query string"""
+        value = self.request.query_params.get(param, default)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValidationError({param: ['A valid integer is required.']})
+
     def perform_create(self, serializer):
         """Save a model with user as current auth user"""
 
-        serializer.save(user=self.request.user)
+        with transaction.atomic(), sync.deferred_changes():
+            recipe = serializer.save(user=self.request.user)
+            history.record_version(recipe)
+
+    def perform_update(self, serializer):
+        """Save the changes as a new version of the recipe"""
+
+        with transaction.atomic(), sync.deferred_changes():
+            # Records changes made outside the API, e.g. in the admin
+            history.record_version(serializer.instance)
+            recipe = serializer.save()
+            history.record_version(recipe)
+
+    def perform_destroy(self, instance):
+        """Soft delete, purge_deleted_recipes removes the rows later"""
+
+        instance.soft_delete()
+
+    @action(methods=['POST', 'DELETE'], detail=True)
+    def publish(self, request, pk=None):
+        """Publish the recipe to the feeds of its followers, or withdraw it"""
+
+        recipe = self.get_object()
+        recipe.published = request.method == 'POST'
+        recipe.save(update_fields=['published'])
+
+        return Response({'published': recipe.published})
+
+    @action(methods=['GET'], detail=False)
+    def feed(self, request):
+        """Newest published recipes of the users being followed"""
+
+        before = None
+        if 'before' in request.query_params:
+            before = self._params_to_int('before')
+        size = self._params_to_int('size', 20)
+        if not 0 < size <= self.feed_max_size:
+            raise ValidationError({'size': [
+                f'Must be between 1 and {self.feed_max_size}.'
+            ]})
+
+        context = self.get_serializer_context()
+        context['fields'] = context['fields'] or self.feed_fields
+
+        def render(ids):
+            summaries = RecipeSummary.objects.filter(
+                recipe_id__in=ids
+            ).order_by('-recipe_id')
+            serializer_class = self.get_serializer_class()
+            return list(serializer_class(summaries, context=context).data)
+
+        variant = ','.join(context['fields']) + '|' + \
+            ','.join(sorted(context['expand'])) + \
+            f'|{context.get("servings")}|{context.get("system")}'
+        return Response(feed.cached_feed_page(
+            request.user, before, size, render, variant
+        ))
+
+    @action(methods=['POST'], detail=False)
+    def plan(self, request):
+        """Plan days of meals from the user's recipes within budgets"""
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        seed = params.get('seed', random.randrange(2 ** 31))
+        quotas = params['tag_quotas']
+        daily_price = params.get('daily_price')
+
+        candidates = planner.load_candidates(
+            request.user, params.get('max_time_minutes'),
+            params.get('max_price'), params['exclude_tags'],
+            [quota['tag'] for quota in quotas]
+        )
+        try:
+            days = planner.plan_meals(
+                candidates, params['days'], params['meals_per_day'],
+                daily_time=params.get('daily_time_minutes'),
+                daily_price=None if daily_price is None
+                else int(daily_price * 100),
+                quotas=[quota['meals'] for quota in quotas],
+                repeat_after_days=params.get('repeat_after_days'),
+                seed=seed,
+                time_limit=settings.MEAL_PLAN_TIME_LIMIT_MS / 1000,
+                max_steps=settings.MEAL_PLAN_MAX_STEPS,
+            )
+        except planner.PlanNotFound as error:
+            if error.timed_out:
+                detail = ('No plan was found in time, relax the '
+                          'constraints or try another seed.')
+            else:
+                detail = 'No plan meets the constraints.'
+            return Response({'detail': detail, 'seed': seed},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        positions = {pk: i for i, pk in enumerate(candidates.ids)}
+        plan = []
+        for ids in days:
+            cents = sum(candidates.prices[positions[pk]] for pk in ids)
+            plan.append({
+                'recipes': ids,
+                'time_minutes': sum(candidates.times[positions[pk]]
+                                    for pk in ids),
+                'price': f'{cents // 100}.{cents % 100:02d}',
+            })
+        recipes = serializers.RecipeSummaryListSerializer(
+            RecipeSummary.objects.filter(
+                recipe_id__in={pk for ids in days for pk in ids}
+            ).order_by('recipe_id'), context={'request': request}
+        )
+        return Response({'seed': seed, 'days': plan,
+                         'recipes': recipes.data})
+
+    @action(methods=['GET'], detail=True)
+    def versions(self, request, pk=None):
+        """List the saved versions of the recipe, newest first"""
+
+        recipe = self.get_object()
+        versions = recipe.versions.order_by('-number')
+        serializer = self.get_serializer(versions, many=True)
+
+        return Response(serializer.data)
+
+    @action(methods=['GET'], detail=True, url_path='versions/diff')
+    def diff_versions(self, request, pk=None):
+        """Show the changes between two versions of the recipe"""
+
+        recipe = self.get_object()
+        first = self._params_to_int('from')
+        second = self._params_to_int(
+            'to', history.latest_version(recipe.id)
+        )
+        changes = history.diff_versions(recipe.id, first, second)
+        if changes is None:
+            raise Http404
+
+        return Response({'from': first, 'to': second, 'changes': changes})
+
+    @action(methods=['POST'], detail=True,
+            url_path=r'versions/(?P<number>[0-9]+)/restore')
+    def restore_version(self, request, pk=None, number=None):
+        """Restore the recipe to an earlier version"""
+
+        recipe = self.get_object()
+        state = history.version_state(recipe.id, int(number))
+        if state is None:
+            raise Http404
+
+        history.restore_state(recipe, state)
+        serializer = serializers.RecipeDetailSerializer(
+            recipe, context=self.get_serializer_context()
+        )
+
+        return Response(serializer.data)
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
@@ -97,7 +464,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic(), sync.deferred_changes(), \
+                    deferred_summaries():
+                history.record_version(recipe)
+                serializer.save()
+                history.record_version(recipe)
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -107,3 +478,135 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class CollectionViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
+    """
+    Manage recipe collections and who they are shared with
+    """
+
+    queryset = Collection.objects.all()
+    serializer_class = serializers.CollectionSerializer
+    permission_classes = (IsAuthenticated,)
+    authentication_classes = (TokenAuthentication,)
+
+    def get_queryset(self):
+        """Owned collections, and for reading the shared ones too"""
+        user = self.request.user
+        queryset = self.queryset.filter(user=user)
+        if self.action in ('list', 'retrieve'):
+            queryset = self.queryset.filter(
+                Q(user=user) |
+                Q(id__in=CollectionMember.objects.filter(
+                    user=user
+                ).values('collection_id'))
+            )
+        return queryset.prefetch_related('recipes').order_by('id')
+
+    def get_serializer_class(self):
+        if self.action in ('members', 'remove_member'):
+            return serializers.CollectionMemberSerializer
+
+        return self.serializer_class
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @action(methods=['GET', 'POST'], detail=True)
+    def members(self, request, pk=None):
+        """List the members of a collection, or share it with a user"""
+
+        collection = self.get_object()
+        if request.method == 'GET':
+            members = collection.members.select_related('user').order_by(
+                'user__email'
+            )
+            return Response(self.get_serializer(members, many=True).data)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if serializer.validated_data['user'] == collection.user:
+            raise ValidationError(
+                {'email': ['The owner already has access.']}
+            )
+        CollectionMember.objects.update_or_create(
+            collection=collection,
+            user=serializer.validated_data['user'],
+            defaults={'level': serializer.validated_data['level']}
+        )
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(methods=['DELETE'], detail=True,
+            url_path=r'members/(?P<user_id>[0-9]+)')
+    def remove_member(self, request, pk=None, user_id=None):
+        """Stop sharing a collection with a user"""
+
+        collection = self.get_object()
+        deleted, _ = collection.members.filter(user_id=user_id).delete()
+        if not deleted:
+            raise Http404
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SyncView(APIView):
+    """
+    Changes of the user's recipes, tags and ingredients since a sync
+    token, for offline clients. Without since everything is returned.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    authentication_classes = (TokenAuthentication,)
+
+    max_size = 1000
+
+    def get(self, request):
+        since = 0
+        if 'since' in request.query_params:
+            try:
+                since = sync.parse_token(request.query_params['since'])
+            except sync.TokenExpired:
+                return Response(
+                    {'detail': 'The token expired, sync without since.'},
+                    status=status.HTTP_410_GONE
+                )
+            except ValueError:
+                raise ValidationError({'since': ['Invalid sync token.']})
+        try:
+            size = int(request.query_params.get('size', self.max_size))
+        except ValueError:
+            size = 0
+        if not 0 < size <= self.max_size:
+            raise ValidationError({'size': [
+                f'Must be between 1 and {self.max_size}.'
+            ]})
+
+        changes, last_id, more = sync.changes_since(request.user, since,
+                                                    size)
+        user = request.user
+        context = {'request': request}
+        return Response({
+            'recipes': serializers.RecipeSummaryListSerializer(
+                RecipeSummary.objects.filter(
+                    user=user, recipe_id__in=changes['recipe']['changed']
+                ).order_by('recipe_id'), context=context
+            ).data,
+            'tags': serializers.TagListSerializer(
+                Tag.objects.filter(
+                    user=user, id__in=changes['tag']['changed']
+                ).order_by('id'), context=context
+            ).data,
+            'ingredients': serializers.IngredientListSerializer(
+                Ingredient.objects.filter(
+                    user=user, id__in=changes['ingredient']['changed']
+                ).order_by('id'), context=context
+            ).data,
+            'deleted': {
+                'recipes': changes['recipe']['deleted'],
+                'tags': changes['tag']['deleted'],
+                'ingredients': changes['ingredient']['deleted'],
+            },
+            'next': sync.make_token(last_id),
+            'more': more,
+        })
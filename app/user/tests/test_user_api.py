@@ -5,6 +5,8 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.models import AccountDeletion, Follow
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME = reverse('user:me')
@@ -156,3 +158,38 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertEqual(self.user.email, payload['email'])
         self.assertTrue(self.user.check_password(payload['password']))
+
+    def test_delete_account_queued(self):
+        """Test deleting the account deactivates it and queues the data"""
+        res = self.client.delete(ME)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertTrue(AccountDeletion.objects.filter(
+            user=self.user
+        ).exists())
+
+    def test_follow_user(self):
+        """Test following and unfollowing another user"""
+        other = create_user(email='other@test.com', password='password')
+        url = reverse('user:follow', args=[other.id])
+
+        res = self.client.post(url)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        res = self.client.post(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(Follow.objects.filter(follower=self.user,
+                                              followee=other).exists())
+
+        res = self.client.delete(url)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_invalid_user(self):
+        """Test following yourself or unknown users fails"""
+        res = self.client.post(reverse('user:follow', args=[self.user.id]))
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(reverse('user:follow', args=[999]))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
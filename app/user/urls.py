@@ -8,5 +8,6 @@ app_name = 'user'
 urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
-    path('me', views.UpdateUserView.as_view(), name='me')
+    path('me', views.UpdateUserView.as_view(), name='me'),
+    path('follow/<int:pk>', views.FollowView.as_view(), name='follow'),
 ]
@@ -1,7 +1,15 @@
-from rest_framework import generics, permissions, authentication
+from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, permissions, authentication, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.settings import api_settings
 
+from core.models import Follow
+from core.purge import request_account_deletion
+
 from user.serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -16,8 +24,8 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class UpdateUserView(generics.RetrieveUpdateAPIView):
-    """Update a user properties"""
+class UpdateUserView(generics.RetrieveUpdateDestroyAPIView):
+    """Update a user properties or delete the account"""
     serializer_class = UserSerializer
     permission_classes = (permissions.IsAuthenticated, )
     authentication_classes = (authentication.TokenAuthentication, )
@@ -25,3 +33,29 @@ class UpdateUserView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         """Retrieve and return authenticated user"""
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        """Queue the account for deletion, the data is removed later"""
+        request_account_deletion(self.get_object())
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+
+class FollowView(APIView):
+    """Follow or unfollow the published recipes of a user"""
+    permission_classes = (permissions.IsAuthenticated, )
+    authentication_classes = (authentication.TokenAuthentication, )
+
+    def post(self, request, pk):
+        followee = get_object_or_404(get_user_model(), pk=pk,
+                                     is_active=True)
+        if followee == request.user:
+            raise ValidationError('You can not follow yourself.')
+        _, created = Follow.objects.get_or_create(follower=request.user,
+                                                  followee=followee)
+        return Response(
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    def delete(self, request, pk):
+        Follow.objects.filter(follower=request.user, followee_id=pk).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)